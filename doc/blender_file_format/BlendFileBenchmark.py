@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+
+# ***** BEGIN GPL LICENSE BLOCK *****
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ***** END GPL LICENCE BLOCK *****
+
+######################################################
+#
+#    Description:
+#        Benchmarks for BlendFileReader.py on synthetic blend files.
+#        The synthetic files only contain a minimal DNA catalog and
+#        fileblocks filled with zeros, they are not loadable by blender.
+#
+#    Startup:
+#        python3 BlendFileBenchmark.py [options]
+#
+######################################################
+
+import os
+import sys
+import time
+import random
+import struct
+import getopt
+import tempfile
+
+import logging
+log = logging.getLogger("BlendFileBenchmark")
+
+import BlendFileReader
+
+
+# basic types, in the order blender writes them in the DNA
+BASIC_TYPES = (
+    ("char", 1),
+    ("uchar", 1),
+    ("short", 2),
+    ("ushort", 2),
+    ("int", 4),
+    ("long", 4),
+    ("ulong", 4),
+    ("float", 4),
+    ("double", 8),
+    ("int64_t", 8),
+    ("uint64_t", 8),
+    ("void", 0),
+    )
+
+
+class SyntheticBlendFile:
+    '''
+    Writes a synthetic blendfile with a DNA catalog made of the structures
+    added with AddStruct.
+
+    SyntheticBlendFile.Handle       (file handle)
+    SyntheticBlendFile.PointerSize  (int)
+    SyntheticBlendFile.StructPre    (str)
+    '''
+
+    def __init__(self, handle, pointer_size=8, little_endian=True, version=275):
+        self.Handle = handle
+        self.PointerSize = pointer_size
+        self.StructPre = "<" if little_endian else ">"
+        self.Types = [name for name, size in BASIC_TYPES]
+        self.TypeSizes = [size for name, size in BASIC_TYPES]
+        self.Names = []
+        self.Structs = []
+        self.NextAddress = 0x100000
+        pointer = "Q" if pointer_size == 8 else "I"
+        self.BlockHeaderStruct = struct.Struct(self.StructPre + "4sI" + pointer + "II")
+
+        handle.write(b"BLENDER")
+        handle.write(b"-" if pointer_size == 8 else b"_")
+        handle.write(b"v" if little_endian else b"V")
+        handle.write(str(version).encode())
+
+    def FieldSize(self, type, name):
+        '''
+        Returns the size of a field, following the DNA rules
+        '''
+        count = 1
+        rest = name
+        while "[" in rest:
+            start = rest.index("[")
+            end = rest.index("]")
+            count *= int(rest[start + 1:end])
+            rest = rest[end + 1:]
+        if "*" in name:
+            return self.PointerSize * count
+        return self.TypeSizes[self.Types.index(type)] * count
+
+    def AddStruct(self, type, fields):
+        '''
+        Adds a structure to the DNA catalog and returns its SDNA index.
+        fields is a sequence of (type, name) pairs, eg: ("float", "co[3]")
+        '''
+        # register the type first, structures may point to themselves
+        type_index = len(self.Types)
+        self.Types.append(type)
+        self.TypeSizes.append(0)
+
+        size = 0
+        field_indices = []
+        for field_type, field_name in fields:
+            size += self.FieldSize(field_type, field_name)
+            if field_name not in self.Names:
+                self.Names.append(field_name)
+            field_indices.append((self.Types.index(field_type), self.Names.index(field_name)))
+
+        self.TypeSizes[type_index] = size
+        self.Structs.append((type_index, field_indices))
+        return len(self.Structs) - 1
+
+    def StructSize(self, sdna_index):
+        return self.TypeSizes[self.Structs[sdna_index][0]]
+
+    def NewAddress(self):
+        address = self.NextAddress
+        self.NextAddress += 0x40
+        return address
+
+    def WriteBlock(self, code, data, sdna_index=0, count=1, old_address=None):
+        '''
+        Writes a fileblock and returns its old address
+        '''
+        if old_address is None:
+            old_address = self.NewAddress()
+        code = code.encode().ljust(4, b"\0")
+        self.Handle.write(self.BlockHeaderStruct.pack(code, len(data), old_address, sdna_index, count))
+        self.Handle.write(data)
+        return old_address
+
+    def DNAData(self):
+        pre = self.StructPre
+        chunks = [b"SDNA", b"NAME", struct.pack(pre + "I", len(self.Names))]
+        chunks.extend(name.encode() + b"\0" for name in self.Names)
+        chunks.append(b"")
+
+        def align(chunks):
+            size = sum(len(chunk) for chunk in chunks)
+            chunks.append(b"\0" * (-size % 4))
+
+        align(chunks)
+        chunks.extend((b"TYPE", struct.pack(pre + "I", len(self.Types))))
+        chunks.extend(type.encode() + b"\0" for type in self.Types)
+        align(chunks)
+        chunks.append(b"TLEN")
+        chunks.extend(struct.pack(pre + "H", size) for size in self.TypeSizes)
+        align(chunks)
+        chunks.extend((b"STRC", struct.pack(pre + "I", len(self.Structs))))
+        for type_index, fields in self.Structs:
+            chunks.append(struct.pack(pre + "HH", type_index, len(fields)))
+            for field_type, field_name in fields:
+                chunks.append(struct.pack(pre + "HH", field_type, field_name))
+        align(chunks)
+        return b"".join(chunks)
+
+    def Finish(self):
+        '''
+        Writes the DNA1 and ENDB fileblocks
+        '''
+        self.WriteBlock("DNA1", self.DNAData(), old_address=0)
+        self.WriteBlock("ENDB", b"", old_address=0)
+
+
+def write_synthetic_blocks(filename, size, seed=0):
+    '''
+    Writes a synthetic blendfile of about size bytes made of many small
+    fileblocks, like a production file with lots of datablocks.
+    '''
+    random.seed(seed)
+    zeros = bytes(1 << 20)
+    with open(filename, "wb") as handle:
+        blend = SyntheticBlendFile(handle)
+        blend.AddStruct("Link", (("Link", "*next"), ("Link", "*prev")))
+        written = 0
+        while written < size:
+            # mostly small blocks with an occasional large array,
+            # blender keeps all fileblocks 4 bytes aligned
+            if random.random() < 0.01:
+                length = random.randint(1 << 16, 1 << 20) & ~3
+            else:
+                length = random.randint(16, 2048) & ~3
+            blend.WriteBlock("DATA", zeros[:length])
+            written += length + blend.BlockHeaderStruct.size
+        blend.Finish()
+
+
+def write_synthetic_mesh(filename, totvert, seed=0):
+    '''
+    Writes a synthetic blendfile with one grid mesh of about totvert vertices,
+    with MVert, MLoop and MPoly structures like blender 2.7x writes them.
+    '''
+    import array
+
+    random.seed(seed)
+    side = max(2, int(totvert ** 0.5))
+    totvert = side * side
+    totpoly = (side - 1) * (side - 1)
+    totloop = totpoly * 4
+
+    with open(filename, "wb") as handle:
+        blend = SyntheticBlendFile(handle)
+        blend.AddStruct("Link", (("Link", "*next"), ("Link", "*prev")))
+        blend.AddStruct("ID", (("void", "*next"), ("void", "*prev"), ("char", "name[66]"), ("short", "flag"),
+                                     ("int", "pad")))
+        mvert = blend.AddStruct("MVert", (("float", "co[3]"), ("short", "no[3]"), ("char", "flag"), ("char", "bweight")))
+        mloop = blend.AddStruct("MLoop", (("int", "v"), ("int", "e")))
+        mpoly = blend.AddStruct("MPoly", (("int", "loopstart"), ("int", "totloop"), ("short", "mat_nr"),
+                                          ("char", "flag"), ("char", "pad")))
+        mesh = blend.AddStruct("Mesh", (("ID", "id"), ("MPoly", "*mpoly"), ("MLoop", "*mloop"),
+                                        ("MVert", "*mvert"), ("int", "totvert"), ("int", "totloop"),
+                                        ("int", "totpoly"), ("int", "pad")))
+
+        addresses = [blend.NewAddress() for i in range(3)]
+        blend.WriteBlock("ME", struct.pack("<QQ66shi3Q4i", 0, 0, b"MEGrid", 0, 0, addresses[0], addresses[1],
+                                           addresses[2], totvert, totloop, totpoly, 0), mesh)
+
+        vert = struct.Struct("<3f3hbb")
+        blend.WriteBlock("DATA", b"".join(vert.pack(x, y, random.random(), 0, 0, 32767, 0, 0)
+                                          for y in range(side) for x in range(side)),
+                         mvert, totvert, addresses[2])
+
+        loops = array.array("i")
+        for y in range(side - 1):
+            for x in range(side - 1):
+                v = y * side + x
+                loops.extend((v, 0, v + 1, 0, v + side + 1, 0, v + side, 0))
+        if sys.byteorder != "little":
+            loops.byteswap()
+        blend.WriteBlock("DATA", loops.tobytes(), mloop, totloop, addresses[1])
+
+        poly = struct.Struct("<iihbb")
+        blend.WriteBlock("DATA", b"".join(poly.pack(p * 4, 4, 0, 0, 0) for p in range(totpoly)),
+                         mpoly, totpoly, addresses[0])
+        blend.Finish()
+    return totvert
+
+
+def benchmark_mesh(filename, totvert):
+    '''
+    Times BlendFileMeshExport on a synthetic grid mesh, in vertices/second
+    '''
+    import shutil
+    import BlendFileMeshExport
+
+    log.info("writing synthetic mesh: {0}".format(filename))
+    totvert = write_synthetic_mesh(filename, totvert)
+
+    output = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        exported = BlendFileMeshExport.export_meshes(filename, output)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(output)
+
+    if exported != totvert:
+        log.error("vertex count mismatch {0} != {1}".format(exported, totvert))
+    print("mesh: {0} vertices".format(totvert))
+    print("  BlendFileMeshExport: {0:8.3f} s  {1:10.1f} Mverts/s".format(elapsed, totvert / elapsed / 1e6))
+
+
+def benchmark_reader(filename):
+    '''
+    Times the handle based BlendFile against the memory mapped BlendFileMap
+    '''
+    size = os.path.getsize(filename)
+
+    start = time.perf_counter()
+    handle = BlendFileReader.openBlendFile(filename)
+    blendfile = BlendFileReader.BlendFile(handle)
+    handle.close()
+    time_handle = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mapping = BlendFileReader.openBlendFileMapped(filename)
+    blendmap = BlendFileReader.BlendFileMap(mapping)
+    time_mapped = time.perf_counter() - start
+
+    if len(blendmap) != len(blendfile.Blocks):
+        log.error("block count mismatch {0} != {1}".format(len(blendmap), len(blendfile.Blocks)))
+    blendmap.close()
+
+    megabytes = size / (1024.0 * 1024.0)
+    print("file: {0} ({1:.1f} MB, {2} blocks)".format(filename, megabytes, len(blendfile.Blocks)))
+    print("  BlendFile:    {0:8.3f} s  {1:10.1f} MB/s".format(time_handle, megabytes / time_handle))
+    print("  BlendFileMap: {0:8.3f} s  {1:10.1f} MB/s".format(time_mapped, megabytes / time_mapped))
+
+
+def usage():
+    print("\nUsage: \n\tpython3 BlendFileBenchmark.py [options] [file.blend]")
+    print("Options:")
+    print("\t--size=MB        size of the generated synthetic file (default 2048)")
+    print("\t--keep           don't delete the generated synthetic file")
+    print("\t--mesh=VERTS     benchmark BlendFileMeshExport on a generated mesh instead")
+    print("Without a file argument a synthetic file is generated in the temp directory.\n")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "h", ["size=", "keep", "mesh=", "help"])
+    except getopt.GetoptError as err:
+        print(err)
+        usage()
+        sys.exit(2)
+
+    size = 2048
+    keep = False
+    mesh = 0
+    for opt, value in opts:
+        if opt == "--size":
+            size = int(value)
+        elif opt == "--mesh":
+            mesh = int(value)
+        elif opt == "--keep":
+            keep = True
+        elif opt in ("-h", "--help"):
+            usage()
+            return
+
+    if args:
+        for filename in args:
+            benchmark_reader(filename)
+        return
+
+    handle, filename = tempfile.mkstemp(suffix=".blend")
+    os.close(handle)
+    try:
+        if mesh:
+            benchmark_mesh(filename, mesh)
+            return
+        log.info("writing {0} MB synthetic blend file: {1}".format(size, filename))
+        write_synthetic_blocks(filename, size * 1024 * 1024)
+        benchmark_reader(filename)
+    finally:
+        if not keep:
+            os.remove(filename)
+
+
+if __name__ == '__main__':
+    main()
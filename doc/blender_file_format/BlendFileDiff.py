@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+
+# ***** BEGIN GPL LICENSE BLOCK *****
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ***** END GPL LICENCE BLOCK *****
+
+######################################################
+#
+#    Description:
+#        Hashes the datablocks of a blend file into a manifest, and compares
+#        the manifests of two blend files to find the datablocks which
+#        changed between two saves.
+#
+#        Pointers are replaced by the code and name of the fileblock they
+#        point to before hashing, so addresses changing between saves are
+#        not reported as changes. Every ID fileblock is hashed together with
+#        the DATA fileblocks written after it.
+#
+#        Fileblocks are read in chunks, the memory used grows with the number
+#        of fileblocks (not their size): the normalized value of the old
+#        address of every fileblock is kept in memory.
+#
+#    Startup:
+#        python3 BlendFileDiff.py [options] file.blend [other.blend]
+#        python3 BlendFileDiff.py [options] --diff a.manifest b.manifest
+#
+######################################################
+
+import os
+import sys
+import json
+import time
+import getopt
+import hashlib
+
+import logging
+log = logging.getLogger("BlendFileDiff")
+
+import BlendFileReader
+
+# size of the reads when hashing, rounded to whole structures
+CHUNK_SIZE = 1024 * 1024
+
+# fileblocks which aren't datablocks
+SKIP_CODES = ("DNA1", "SDNA", "ENDB")
+
+
+class BlendFileHasher:
+    '''
+    Hashes the datablocks of a blendfile, see Manifest()
+
+    - BlendFileHasher.Header     (BlendFileHeader instance)
+    - BlendFileHasher.Catalog    (DNACatalog instance)
+    - BlendFileHasher.Targets    (dict of {old address: bytes}, normalized pointer values,
+                                  one for every fileblock)
+    - BlendFileHasher.BytesRead  (int)
+    '''
+
+    def __init__(self, handle):
+        self.Handle = handle
+        handle.seek(0, os.SEEK_SET)
+        self.Header = header = BlendFileReader.BlendFileHeader(handle)
+        pointer = "Q" if header.PointerSize == 8 else "I"
+        self.BlockHeaderStruct = BlendFileReader.CompiledStruct(header.StructPre + "4sI" + pointer + "II")
+        self.PointerStruct = BlendFileReader.CompiledStruct(header.StructPre + pointer)
+        self.Catalog = None
+        self.Targets = {}
+        self.BytesRead = 0
+        self._scanTargets()
+
+    def _blockHeaders(self):
+        '''
+        Yields (code, size, old address, SDNA index, count, file offset) of
+        all fileblocks, the handle is positioned at the start of each payload
+        '''
+        handle = self.Handle
+        handle.seek(12, os.SEEK_SET)
+        header_size = self.BlockHeaderStruct.size
+        while True:
+            data = handle.read(header_size)
+            if len(data) < 8:
+                return
+            if len(data) < header_size:
+                # truncated "ENDB" fileblock header
+                code, size, old, sdna, count = data[0:4], 0, 0, 0, 0
+            else:
+                code, size, old, sdna, count = self.BlockHeaderStruct.unpack(data)
+            code = code.decode().strip("\0 ")
+            if code == "ENDB":
+                return
+            offset = handle.tell()
+            yield code, size, old, sdna, count, offset
+            handle.seek(offset + size, os.SEEK_SET)
+
+    def _idName(self, sdna, offset):
+        '''
+        Returns the name of the ID fileblock at offset, None for other fileblocks
+        '''
+        structure = self.Catalog.Structs[sdna]
+        layout = structure.FieldLayout(self.Header).get("id.name")
+        if layout is None:
+            return None
+        self.Handle.seek(offset + layout.Offset, os.SEEK_SET)
+        return layout.Decode(self.Handle.read(layout.Size))
+
+    def _scanTargets(self):
+        '''
+        First pass over the fileblock headers, reads the DNA catalog and
+        gives every old address a value which doesn't change between saves
+        '''
+        blocks = []
+        for code, size, old, sdna, count, offset in self._blockHeaders():
+            if code in ("DNA1", "SDNA"):
+                self.Handle.seek(offset, os.SEEK_SET)
+                self.Catalog = BlendFileReader.DNACatalog(self.Header, self.Handle)
+            elif old:
+                blocks.append((old, code, sdna, offset))
+
+        for old, code, sdna, offset in blocks:
+            name = self._idName(sdna, offset) if len(code) == 2 else None
+            target = "{0}:{1}".format(code, name if name is not None else self.Catalog.Structs[sdna].Type.Name)
+            self.Targets[old] = hashlib.sha1(target.encode()).digest()[:self.Header.PointerSize]
+
+    def _normalize(self, data, pointers, structSize):
+        '''
+        Replaces the pointers of every structure in data by their target value
+        '''
+        data = bytearray(data)
+        targets = self.Targets
+        unpack_from = self.PointerStruct.unpack_from
+        pointerSize = self.Header.PointerSize
+        unresolved = b"\xff" * pointerSize
+        for start in range(0, len(data) - structSize + 1, structSize):
+            for pointer in pointers:
+                offset = start + pointer
+                address = unpack_from(data, offset)[0]
+                if address:
+                    data[offset:offset + pointerSize] = targets.get(address, unresolved)
+        return data
+
+    def _normalizeWords(self, data):
+        '''
+        Replaces the pointer sized words of data which are old addresses of
+        fileblocks by their target value, used for raw pointer arrays
+        '''
+        data = bytearray(data)
+        targets = self.Targets
+        unpack_from = self.PointerStruct.unpack_from
+        pointerSize = self.Header.PointerSize
+        for offset in range(0, len(data) - pointerSize + 1, pointerSize):
+            target = targets.get(unpack_from(data, offset)[0])
+            if target is not None:
+                data[offset:offset + pointerSize] = target
+        return data
+
+    def _hashBlock(self, hasher, code, size, sdna, count):
+        hasher.update(code.encode())
+        hasher.update(self.Catalog.Structs[sdna].Type.Name.encode())
+
+        structure = self.Catalog.Structs[sdna]
+        structSize = structure.Type.Size
+        pointers = structure.PointerOffsets(self.Header)
+        # raw data (eg: arrays of floats) is written with SDNA index 0
+        if not structSize or structSize * count != size:
+            pointers = ()
+
+        # Raw pointer arrays (eg: the materials of a mesh) are also written
+        # with SDNA index 0, words which are old addresses are replaced.
+        pointerSize = self.Header.PointerSize
+        isWords = (sdna == 0 and size % pointerSize == 0)
+
+        chunkSize = CHUNK_SIZE
+        if isWords:
+            pointers = ()
+            chunkSize -= chunkSize % pointerSize
+        elif pointers:
+            chunkSize = max(structSize, chunkSize - chunkSize % structSize)
+
+        left = size
+        while left > 0:
+            data = self.Handle.read(min(left, chunkSize))
+            if not data:
+                break
+            left -= len(data)
+            self.BytesRead += len(data)
+            if isWords:
+                data = self._normalizeWords(data)
+            elif pointers:
+                data = self._normalize(data, pointers, structSize)
+            hasher.update(data)
+
+    def Manifest(self):
+        '''
+        Returns a list of manifest records, one for every datablock:
+        {"id", "type", "code", "hash", "size", "blocks"}
+        '''
+        manifest = []
+        record = None
+        hasher = None
+
+        def finish():
+            if record is not None:
+                record["hash"] = hasher.hexdigest()
+                manifest.append(record)
+
+        for code, size, old, sdna, count, offset in self._blockHeaders():
+            if code in SKIP_CODES:
+                continue
+
+            # DATA fileblocks belong to the last ID fileblock
+            if code != "DATA" or record is None:
+                name = self._idName(sdna, offset) if len(code) == 2 else None
+                finish()
+                hasher = hashlib.sha1()
+                record = {
+                    "id": name if name is not None else code,
+                    "type": self.Catalog.Structs[sdna].Type.Name if name is not None else code,
+                    "code": code,
+                    "size": 0,
+                    "blocks": 0,
+                    }
+                self.Handle.seek(offset, os.SEEK_SET)
+
+            record["size"] += size
+            record["blocks"] += 1
+            self._hashBlock(hasher, code, size, sdna, count)
+
+        finish()
+        return manifest
+
+
+def write_manifest(filename, output):
+    '''
+    Writes the manifest of a blendfile as JSON lines, returns the records
+    '''
+    start = time.perf_counter()
+    handle = BlendFileReader.openBlendFile(filename)
+    try:
+        hasher = BlendFileHasher(handle)
+        manifest = hasher.Manifest()
+    finally:
+        handle.close()
+    elapsed = time.perf_counter() - start
+
+    for record in manifest:
+        output.write(json.dumps(record, sort_keys=True) + "\n")
+
+    megabytes = hasher.BytesRead / (1024.0 * 1024.0)
+    log.info("{0}: {1} datablocks, {2:.1f} MB in {3:.3f} s, {4:.1f} MB/s".format(
+        filename, len(manifest), megabytes, elapsed, megabytes / max(elapsed, 1e-9)))
+    return manifest
+
+
+def read_manifest(filename):
+    with open(filename, "r") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def diff_manifests(old, new):
+    '''
+    Compares two manifests by datablock type and name,
+    returns a dict of {"added", "removed", "changed", "unchanged": [(type, id)]}
+    '''
+    def index(manifest):
+        return {(record["type"], record["id"]): record["hash"] for record in manifest}
+
+    old = index(old)
+    new = index(new)
+
+    result = {"added": [], "removed": [], "changed": [], "unchanged": []}
+    for key in sorted(set(old) | set(new)):
+        if key not in old:
+            result["added"].append(key)
+        elif key not in new:
+            result["removed"].append(key)
+        elif old[key] != new[key]:
+            result["changed"].append(key)
+        else:
+            result["unchanged"].append(key)
+    return result
+
+
+def print_diff(result, verbose=False):
+    for state in ("added", "removed", "changed"):
+        for type, id in result[state]:
+            print("{0:8} {1:16} {2}".format(state, type, id))
+    if verbose:
+        for type, id in result["unchanged"]:
+            print("{0:8} {1:16} {2}".format("same", type, id))
+    print("{0} added, {1} removed, {2} changed, {3} unchanged".format(
+        *(len(result[state]) for state in ("added", "removed", "changed", "unchanged"))))
+
+
+def usage():
+    print("\nUsage: \n\tpython3 BlendFileDiff.py [options] file.blend [other.blend]")
+    print("\tpython3 BlendFileDiff.py [options] --diff old.manifest new.manifest")
+    print("Options:")
+    print("\t--output=FILE    write the manifest of file.blend to FILE (default: stdout)")
+    print("\t--diff           compare two manifests written with --output")
+    print("\t--verbose        also list the unchanged datablocks")
+    print("With two blend files their manifests are compared.\n")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "h", ["output=", "diff", "verbose", "help"])
+    except getopt.GetoptError as err:
+        print(err)
+        usage()
+        sys.exit(2)
+
+    output = None
+    diff = False
+    verbose = False
+    for opt, value in opts:
+        if opt == "--output":
+            output = value
+        elif opt == "--diff":
+            diff = True
+        elif opt == "--verbose":
+            verbose = True
+        elif opt in ("-h", "--help"):
+            usage()
+            return
+
+    if diff and len(args) == 2:
+        print_diff(diff_manifests(read_manifest(args[0]), read_manifest(args[1])), verbose)
+    elif len(args) == 2:
+        with open(os.devnull, "w") as devnull:
+            old = write_manifest(args[0], devnull)
+            new = write_manifest(args[1], devnull)
+        print_diff(diff_manifests(old, new), verbose)
+    elif len(args) == 1:
+        if output:
+            with open(output, "w") as handle:
+                write_manifest(args[0], handle)
+        else:
+            write_manifest(args[0], sys.stdout)
+    else:
+        usage()
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# ***** BEGIN GPL LICENSE BLOCK *****
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ***** END GPL LICENCE BLOCK *****
+
+######################################################
+#
+#    Description:
+#        Tests BlendFileDiff.py on synthetic blend files
+#        (see BlendFileBenchmark.SyntheticBlendFile).
+#
+#    Startup:
+#        python3 BlendFileDiffTest.py [-v]
+#
+######################################################
+
+import os
+import struct
+import shutil
+import tempfile
+import unittest
+
+import BlendFileDiff
+import BlendFileReader
+from BlendFileBenchmark import SyntheticBlendFile
+
+
+def write_material_file(filename, base_address, color=1.0):
+    '''
+    Writes a mesh using a material through a raw pointer array (an 8 byte
+    DATA fileblock with SDNA index 0, as blender writes "me->mat"),
+    all old addresses start at base_address.
+    '''
+    with open(filename, "wb") as handle:
+        blend = SyntheticBlendFile(handle)
+        blend.NextAddress = base_address
+        blend.AddStruct("Link", (("Link", "*next"), ("Link", "*prev")))
+        blend.AddStruct("ID", (("void", "*next"), ("void", "*prev"), ("char", "name[66]"), ("short", "flag"),
+                               ("int", "pad")))
+        material = blend.AddStruct("Material", (("ID", "id"), ("float", "r"), ("int", "pad")))
+        mesh = blend.AddStruct("Mesh", (("ID", "id"), ("Material", "**mat"), ("short", "totcol"),
+                                        ("short", "pad[3]")))
+
+        id_struct = struct.Struct("<QQ66shi")
+        mat_array = blend.NewAddress()
+        material_address = blend.NewAddress()
+
+        blend.WriteBlock("ME", id_struct.pack(0, 0, b"MEMesh", 0, 0) + struct.pack("<Qh6x", mat_array, 1), mesh)
+        blend.WriteBlock("DATA", struct.pack("<Q", material_address), 0, 1, mat_array)
+        blend.WriteBlock("MA", id_struct.pack(0, 0, b"MAMaterial", 0, 0) + struct.pack("<fi", color, 0),
+                         material, 1, material_address)
+        blend.Finish()
+
+
+def manifest(filename):
+    handle = BlendFileReader.openBlendFile(filename)
+    try:
+        return BlendFileDiff.BlendFileHasher(handle).Manifest()
+    finally:
+        handle.close()
+
+
+class BlendFileDiffTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def diff(self, old_args, new_args):
+        old = os.path.join(self.directory, "old.blend")
+        new = os.path.join(self.directory, "new.blend")
+        write_material_file(old, *old_args)
+        write_material_file(new, *new_args)
+        return BlendFileDiff.diff_manifests(manifest(old), manifest(new))
+
+    def test_moved_addresses(self):
+        # only the old addresses differ between both files
+        result = self.diff((0x100000, ), (0x7f0000, ))
+        self.assertEqual(result["changed"], [])
+        self.assertEqual(result["added"], [])
+        self.assertEqual(result["removed"], [])
+        self.assertEqual(len(result["unchanged"]), 2)
+
+    def test_changed_material(self):
+        result = self.diff((0x100000, 1.0), (0x7f0000, 0.5))
+        self.assertEqual(result["changed"], [("Material", "MAMaterial")])
+
+
+if __name__ == '__main__':
+    unittest.main()
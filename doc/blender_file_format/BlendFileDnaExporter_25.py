@@ -40,6 +40,7 @@
 #    Output:
 #        dna.html
 #        dna.css (will only be created when not existing)
+#        dna.json (only with --dna-json)
 #
 #    Startup:
 #        ./blender -P BlendFileDnaExporter.py
@@ -79,10 +80,15 @@ class DNACatalogHTML:
     def __init__(self, catalog, bpy_module = None):
         self.Catalog = catalog
         self.bpy = bpy_module
+        self.Layouts = {}
     
     def WriteToHTML(self, handle):
+        '''
+        Write the html documentation of all structures to the handle,
+        the html is written piece by piece instead of building it in memory
+        '''
             
-        dna_html_template = """
+        dna_html_header_template = """
             <!DOCTYPE html PUBLIC -//W3C//DTD HTML 4.01 Transitional//EN http://www.w3.org/TR/html4/loose.dtd>
             <html>
             <head>
@@ -99,152 +105,128 @@ class DNACatalogHTML:
                 Build revision: <a href="https://svn.blender.org/svnroot/bf-blender/!svn/bc/${revision}/trunk/">${revision}</a><br/>
                 File format reference: <a href="mystery_of_the_blend.html">The mystery of the blend</a> by Jeroen Bakker<br/>
                 <h1>Index of blender structures</h1>
-                <ul class=multicolumn>
-                    ${structs_list}
-                </ul>
-                ${structs_content}
-            </body>
-            </html>"""
+                <ul class=multicolumn>"""
         
         header = self.Catalog.Header
-        bpy = self.bpy
-        
-        # ${version} and ${revision}
-        if bpy:
-            version = '.'.join(map(str, bpy.app.version))
-            revision = bpy.app.build_hash
-        else:
-            version = str(header.Version)
-            revision = 'Unknown'
         
-        # ${bitness}
-        if header.PointerSize == 8:
-            bitness = '64 bit'
-        else:
-            bitness = '32 bit'
+        d = dict(
+            version = self.Version(), 
+            revision = self.Revision(), 
+            bitness = '{0} bit'.format(header.PointerSize * 8), 
+            endianness = header.LittleEndianness and 'Little endianness' or 'Big endianness'
+        )
 
-        # ${endianness}
-        if header.LittleEndianness:
-            endianess= 'Little endianness'
-        else:
-            endianess= 'Big endianness'
+        handle.write(self.indent(Template(dna_html_header_template).substitute(d), 0).lstrip('\n'))
         
-        # ${structs_list}
+        # index
         log.debug("Creating structs index")
-        structs_list = ''
         list_item = '<li class="multicolumn">({0}) <a href="#{1}">{1}</a></li>\n'
-        structureIndex = 0
-        for structure in self.Catalog.Structs:
-            structs_list += list_item.format(structureIndex, structure.Type.Name)
-            structureIndex+=1
+        for structureIndex, structure in enumerate(self.Catalog.Structs):
+            handle.write(list_item.format(structureIndex, structure.Type.Name))
+        handle.write('</ul>\n\n')
 
-        # ${structs_content}
+        # content
         log.debug("Creating structs content")
-        structs_content = ''
         for structure in self.Catalog.Structs:
             log.debug(structure.Type.Name)
-            structs_content += self.Structure(structure)
+            self.WriteStructure(handle, structure)
            
-        d = dict(
-            version = version, 
-            revision = revision, 
-            bitness = bitness, 
-            endianness = endianess, 
-            structs_list = structs_list, 
-            structs_content = structs_content
-        )
+        handle.write('</body>\n</html>\n')
 
-        dna_html = Template(dna_html_template).substitute(d)
-        dna_html = self.format(dna_html)
-        handle.write(dna_html)
+    def Version(self):
+        if self.bpy:
+            return '.'.join(map(str, self.bpy.app.version))
+        return str(self.Catalog.Header.Version)
+
+    def Revision(self):
+        if self.bpy:
+            return self.bpy.app.build_hash
+        return 'Unknown'
     
-    def Structure(self, structure):
-        struct_table_template = """
-            <table><a name="${struct_name}"></a>
-                <caption><a href="#${struct_name}">${struct_name}</a></caption>
-                <thead>
-                    <tr>
-                        <th>reference</th>
-                        <th>structure</th>
-                        <th>type</th>
-                        <th>name</th>
-                        <th>offset</th>
-                        <th>size</th>
-                    </tr>
-                </thead>
-                <tbody>
-                ${fields}
-                </tbody>
-            </table>
-            <label>Total size: ${size} bytes</label><br/>
-            <label>(<a href="#top">top</a>)</label><br/>"""
-        
-        d = dict(
-            struct_name = structure.Type.Name, 
-            fields = self.StructureFields(structure, None, 0), 
-            size = str(structure.Type.Size)
-        )
-        
-        struct_table = Template(struct_table_template).substitute(d)
-        return struct_table
+    def WriteStructure(self, handle, structure):
+        struct_table_header_template = (
+            '<table>\n'
+            '<a name="${struct_name}"></a>\n'
+            '<caption><a href="#${struct_name}">${struct_name}</a></caption>\n'
+            '<thead>\n'
+            '  <tr><th>reference</th><th>structure</th><th>type</th><th>name</th><th>offset</th><th>size</th></tr>\n'
+            '</thead>\n'
+            '<tbody>\n')
+
+        struct_table_footer_template = (
+            '</tbody>\n'
+            '</table>\n'
+            '<label>Total size: {0} bytes</label><br/>\n'
+            '<label>(<a href="#top">top</a>)</label><br/>\n')
+
+        structure_field_template = (
+            '  <tr><td>{0}</td><td>{1}</td><td>{2}</td><td>{3}</td><td>{4}</td><td>{5}</td></tr>\n')
+
+        handle.write(Template(struct_table_header_template).substitute(struct_name = structure.Type.Name))
+
+        for reference, owner, type, name, offset, size in self.StructureLayout(structure):
+            # nested structures link to their own table
+            if owner is not structure:
+                struct = '<a href="#{0}">{0}</a>'.format(owner.Type.Name)
+            else:
+                struct = owner.Type.Name
+            handle.write(structure_field_template.format(reference, struct, type, name, offset, size))
+
+        handle.write(struct_table_footer_template.format(structure.Type.Size))
         
-    def StructureFields(self, structure, parentReference, offset):
-        fields = ''
+    def StructureLayout(self, structure):
+        '''
+        Returns the flattened fields of a structure, nested structures included, as
+        a list of (reference, owner structure, type, name, offset, size) tuples.
+        The layout of every structure is computed once and reused when nested.
+        '''
+        layout = self.Layouts.get(structure)
+        if layout is not None:
+            return layout
+
+        layout = []
+        header = self.Catalog.Header
+        offset = 0
         for field in structure.Fields:
-            fields += self.StructureField(field, structure, parentReference, offset)
-            offset += field.Size(self.Catalog.Header)
-        return fields
-        
-    def StructureField(self, field, structure, parentReference, offset):
-        structure_field_template = """
-            <tr>
-                <td>${reference}</td>
-                <td>${struct}</td>
-                <td>${type}</td>
-                <td>${name}</td>
-                <td>${offset}</td>
-                <td>${size}</td>
-            </tr>"""
-        
-        if field.Type.Structure is None or field.Name.IsPointer():
+            reference = field.Name.AsReference(None)
+            size = field.Size(header)
+            if field.Type.Structure is None or field.Name.IsPointer():
+                layout.append((reference, structure, field.Type.Name, field.Name.Name, offset, size))
+            else:
+                for nested in self.StructureLayout(field.Type.Structure):
+                    layout.append((reference + '.' + nested[0], nested[1], nested[2], nested[3], offset + nested[4], nested[5]))
+            offset += size
 
-            # ${reference}
-            reference = field.Name.AsReference(parentReference)
+        self.Layouts[structure] = layout
+        return layout
 
-            # ${struct}
-            if parentReference is not None:
-                struct = '<a href="#{0}">{0}</a>'.format(structure.Type.Name)
-            else:
-                struct = structure.Type.Name
-            
-            # ${type}
-            type = field.Type.Name
-            
-            # ${name}
-            name = field.Name.Name
-            
-            # ${offset}
-            # offset already set
-            
-            # ${size}
-            size = field.Size(self.Catalog.Header)
-        
-            d = dict(
-                reference = reference, 
-                struct = struct, 
-                type = type, 
-                name = name, 
-                offset = offset, 
-                size = size
+    def WriteToJSON(self, handle):
+        '''
+        Write the layout of all structures as JSON to the handle,
+        so tools can look up field offsets without parsing a blend file
+        '''
+        import json
+
+        header = self.Catalog.Header
+        structs = {}
+        for structureIndex, structure in enumerate(self.Catalog.Structs):
+            structs[structure.Type.Name] = dict(
+                index = structureIndex,
+                size = structure.Type.Size,
+                fields = [
+                    dict(reference = reference, struct = owner.Type.Name, type = type, name = name, offset = offset, size = size)
+                    for reference, owner, type, name, offset, size in self.StructureLayout(structure)
+                ]
             )
-            
-            structure_field = Template(structure_field_template).substitute(d)
-        
-        elif field.Type.Structure is not None:
-            reference = field.Name.AsReference(parentReference)
-            structure_field = self.StructureFields(field.Type.Structure, reference, offset) 
 
-        return structure_field
+        d = dict(
+            version = self.Version(),
+            revision = self.Revision(),
+            pointer_size = header.PointerSize,
+            little_endian = header.LittleEndianness,
+            structs = structs
+        )
+        json.dump(d, handle, indent = 1, sort_keys = True)
 
     def indent(self, input, dent, startswith = ''):
         output = ''
@@ -260,22 +242,6 @@ class DNACatalogHTML:
                 output += ' '* dent + line + '\n'
         return output
     
-    def format(self, input):
-        diff = {
-            '\n<!DOCTYPE':'<!DOCTYPE', 
-            '\n</ul>'    :'</ul>', 
-            '<a name'         :'\n<a name', 
-            '<tr>\n'     :'<tr>', 
-            '<tr>'       :'  <tr>', 
-            '</th>\n'    :'</th>', 
-            '</td>\n'    :'</td>', 
-            '<tbody>\n'  :'<tbody>'
-        }
-        output = self.indent(input, 0)
-        for key, value in diff.items():
-            output = output.replace(key, value)
-        return output
-
     def WriteToCSS(self, handle):
         '''
         Write the Cascading stylesheet template to the handle
@@ -385,6 +351,7 @@ def usage():
     print("\t--dna-debug:           sets the logging level to DEBUG (lots of additional info)")
     print("\t--dna-versioned        saves version informations in the html and blend filenames")
     print("\t--dna-overwrite-css    overwrite dna.css, useful when modifying css in the script")
+    print("\t--dna-json             also saves the structure layouts as json, to be loaded by other tools")
     print("Examples:")
     print("\tdefault:       % blender2.5 --background -noaudio --python BlendFileDnaExporter_25.py")
     print("\twith options:  % blender2.5 --background -noaudio --python BlendFileDnaExporter_25.py -- --dna-keep-blend --dna-debug\n")
@@ -411,6 +378,7 @@ def main():
         Path_Blend = os.path.join(dir, filename + '.blend') # temporary blend file
         Path_HTML  = os.path.join(dir, filename + '.html')  # output html file
         Path_CSS   = os.path.join(dir, 'dna.css')           # output css file
+        Path_JSON  = os.path.join(dir, filename + '.json')  # output json layout index
 
         # create a blend file for dna parsing
         if not os.path.exists(Path_Blend):
@@ -456,6 +424,13 @@ def main():
         catalog.WriteToHTML(handleHTML)
         handleHTML.close()
 
+        # machine readable layout index, at explicit request
+        if '--dna-json' in sys.argv:
+            log.info("   export sdna layout to json file: %r" % Path_JSON)
+            handleJSON = open(Path_JSON, "w")
+            catalog.WriteToJSON(handleJSON)
+            handleJSON.close()
+
         # only write the css when doesn't exist or at explicit request
         if not os.path.exists(Path_CSS) or '--dna-overwrite-css' in sys.argv:
             handleCSS = open(Path_CSS, "w")
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+# ***** BEGIN GPL LICENSE BLOCK *****
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ***** END GPL LICENCE BLOCK *****
+
+######################################################
+#
+#    Description:
+#        Exports the vertex positions and the polygon/loop topology of all
+#        meshes in a blend file to numpy .npz (or .npy) files, without
+#        running blender.
+#
+#        The MVert, MLoop and MPoly arrays are decoded with numpy structured
+#        dtypes built from the DNA catalog of the file, directly from the
+#        memory mapped fileblocks.
+#
+#        Columns written per mesh:
+#            co              (float32, totvert x 3)
+#            loop_v, loop_e  (int32, totloop)
+#            poly_loopstart  (int32, totpoly)
+#            poly_totloop    (int32, totpoly)
+#
+#    Startup:
+#        python3 BlendFileMeshExport.py [options] file.blend
+#
+######################################################
+
+import os
+import sys
+import getopt
+
+import numpy
+
+import logging
+log = logging.getLogger("BlendFileMeshExport")
+
+import BlendFileReader
+
+# numpy types of the basic DNA types, single chars are flags, char arrays strings
+NUMPY_TYPES = {
+    'char': "i1",
+    'uchar': "u1",
+    'short': "i2",
+    'ushort': "u2",
+    'int': "i4",
+    'long': "i4",
+    'ulong': "u4",
+    'float': "f4",
+    'double': "f8",
+    'int64_t': "i8",
+    'uint64_t': "u8",
+    }
+
+# (column, structure array pointer in Mesh, field of the structure)
+MESH_COLUMNS = (
+    ("co", "mvert", "co"),
+    ("loop_v", "mloop", "v"),
+    ("loop_e", "mloop", "e"),
+    ("poly_loopstart", "mpoly", "loopstart"),
+    ("poly_totloop", "mpoly", "totloop"),
+    )
+
+
+# numpy dtypes of DNA structures, see DNADtype()
+DTYPES = {}
+
+
+def DNADtype(structure, header):
+    '''
+    Returns the numpy structured dtype of a DNA structure,
+    fields with the same names, offsets and item size as in the file
+    '''
+    key = (structure.Type.Name, structure.Type.Size, header.PointerSize, header.StructPre)
+    dtype = DTYPES.get(key)
+    if dtype is not None:
+        return dtype
+
+    byteorder = header.StructPre
+    names = []
+    formats = []
+    offsets = []
+    offset = 0
+    for field in structure.Fields:
+        size = field.Size(header)
+        count = field.Name.ArraySize()
+        if field.Name.IsPointer() or field.Name.IsMethodPointer():
+            format = numpy.dtype(byteorder + ("u8" if header.PointerSize == 8 else "u4"))
+        elif field.Type.Name == "char" and count > 1:
+            format = numpy.dtype("S{0}".format(count))
+            count = 1
+        elif field.Type.Structure is not None:
+            format = DNADtype(field.Type.Structure, header)
+        elif field.Type.Name in NUMPY_TYPES:
+            format = numpy.dtype(byteorder + NUMPY_TYPES[field.Type.Name])
+        else:
+            format = None
+
+        if format is not None and size:
+            names.append(field.Name.ShortName())
+            formats.append(format if count == 1 else (format, (count,)))
+            offsets.append(offset)
+        offset += size
+
+    dtype = DTYPES[key] = numpy.dtype({
+        "names": names,
+        "formats": formats,
+        "offsets": offsets,
+        "itemsize": structure.Type.Size,
+        })
+    return dtype
+
+
+def structure_array(blendmap, address, structure):
+    '''
+    Returns the array of structures at an old address as a numpy record array
+    sharing memory with the mapping, None for null or unresolved pointers
+    '''
+    if not address:
+        return None
+    resolved = blendmap.Resolve(address)
+    if resolved is None:
+        return None
+    index, offset = resolved
+    dtype = DNADtype(structure, blendmap.Header)
+    count = (blendmap.FileOffsets[index] + blendmap.Sizes[index] - offset) // dtype.itemsize
+    return numpy.frombuffer(blendmap.Mapping, dtype=dtype, count=count, offset=offset)
+
+
+def mesh_columns(blendmap, mesh):
+    '''
+    Returns a dict of {column: numpy array} of a Mesh BlendObject
+    '''
+    catalog = blendmap.Catalog
+    structures = {structure.Type.Name: structure for structure in catalog.Structs}
+    pointer_types = {"mvert": "MVert", "mloop": "MLoop", "mpoly": "MPoly"}
+
+    arrays = {}
+    columns = {}
+    for column, pointer, field in MESH_COLUMNS:
+        if pointer not in arrays:
+            arrays[pointer] = structure_array(blendmap, mesh.Get(pointer), structures[pointer_types[pointer]])
+        array = arrays[pointer]
+        if array is None:
+            continue
+        values = array[field]
+        # native byte order & packed, as written by numpy.save
+        columns[column] = numpy.ascontiguousarray(values, dtype=values.dtype.newbyteorder("="))
+    return columns
+
+
+def export_meshes(filename, output, use_npy=False):
+    '''
+    Writes the columns of every mesh in filename to output/<mesh name>.npz,
+    or to output/<mesh name>/<column>.npy, returns the number of vertices
+    '''
+    mapping = BlendFileReader.openBlendFileMapped(filename)
+    blendmap = BlendFileReader.BlendFileMap(mapping)
+    totvert = 0
+    try:
+        for mesh in blendmap.Objects("ME"):
+            name = mesh.Get("id.name")[2:]
+            columns = mesh_columns(blendmap, mesh)
+            if "co" in columns:
+                totvert += len(columns["co"])
+
+            safe_name = "".join(c if c.isalnum() or c in "._-" else "_" for c in name)
+            if use_npy:
+                directory = os.path.join(output, safe_name)
+                if not os.path.isdir(directory):
+                    os.makedirs(directory)
+                for column, values in columns.items():
+                    numpy.save(os.path.join(directory, column + ".npy"), values)
+            else:
+                numpy.savez(os.path.join(output, safe_name + ".npz"), **columns)
+            log.debug("exported mesh {0}".format(name))
+    finally:
+        blendmap.close()
+    return totvert
+
+
+def usage():
+    print("\nUsage: \n\tpython3 BlendFileMeshExport.py [options] file.blend")
+    print("Options:")
+    print("\t--output=DIR     directory to write the files to (default: current directory)")
+    print("\t--npy            write one .npy file per column instead of one .npz file per mesh\n")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "h", ["output=", "npy", "help"])
+    except getopt.GetoptError as err:
+        print(err)
+        usage()
+        sys.exit(2)
+
+    output = "."
+    use_npy = False
+    for opt, value in opts:
+        if opt == "--output":
+            output = value
+        elif opt == "--npy":
+            use_npy = True
+        elif opt in ("-h", "--help"):
+            usage()
+            return
+
+    if len(args) != 1:
+        usage()
+        sys.exit(2)
+
+    if not os.path.isdir(output):
+        os.makedirs(output)
+    totvert = export_meshes(args[0], output, use_npy)
+    log.info("exported {0} vertices".format(totvert))
+
+
+if __name__ == '__main__':
+    main()
@@ -23,7 +23,13 @@
 ######################################################
 
 import os
+import json
+import mmap
+import bisect
+import collections
+import array
 import struct
+import io
 import gzip
 import tempfile
 
@@ -41,41 +47,83 @@ def ReadString(handle, length):
     '''
     if length != 0:
         return handle.read(length).decode()
-    else:
-        # length == 0 means we want a zero terminating string
-        result = ""
-        s = ReadString(handle, 1)
-        while s!="\0":
-            result += s
-            s = ReadString(handle, 1)
+    elif hasattr(handle, "find"):
+        # memory mapped file, search the terminator instead of reading for it
+        start = handle.tell()
+        end = handle.find(b"\0", start)
+        if end == -1:
+            return handle.read().decode()
+        result = handle.read(end - start).decode()
+        handle.seek(1, os.SEEK_CUR)
         return result
+    else:
+        # length == 0 means we want a zero terminating string,
+        # read ahead in small chunks and seek back after the terminator
+        result = b""
+        while True:
+            chunk = handle.read(64)
+            index = chunk.find(b"\0")
+            if index != -1:
+                result += chunk[:index]
+                handle.seek(index + 1 - len(chunk), os.SEEK_CUR)
+                break
+            if not chunk:
+                break
+            result += chunk
+        return result.decode()
+
+
+# struct type characters used by Read()
+READ_TYPES = {
+    'ushort': "H",  # unsigned short
+    'short': "h",   # short
+    'uint': "I",    # unsigned int
+    'int': "i",     # int
+    'float': "f",   # float
+    'ulong': "Q",   # unsigned long
+    }
+
+# struct type characters of the basic DNA types, used by DNAField.Format()
+FIELD_TYPES = {
+    'uchar': "B",
+    'short': "h",
+    'ushort': "H",
+    'int': "i",
+    'long': "i",
+    'ulong': "I",
+    'float': "f",
+    'double': "d",
+    'int64_t': "q",
+    'uint64_t': "Q",
+    }
+
+# compiled struct.Struct instances, keyed by their format
+STRUCTS = {}
+
+
+def CompiledStruct(format):
+    '''
+    Returns a struct.Struct for the given format, compiling it only once
+    '''
+    compiled = STRUCTS.get(format)
+    if compiled is None:
+        compiled = STRUCTS[format] = struct.Struct(format)
+    return compiled
 
 
 def Read(type, handle, fileheader):
     '''
     Reads the chosen type from a file handle
     '''
-    def unpacked_bytes(type_char, size):
-        return struct.unpack(fileheader.StructPre + type_char, handle.read(size))[0]
-    
-    if type == 'ushort':
-        return unpacked_bytes("H", 2)   # unsigned short
-    elif type == 'short':
-        return unpacked_bytes("h", 2)   # short
-    elif type == 'uint':
-        return unpacked_bytes("I", 4)   # unsigned int
-    elif type == 'int':
-        return unpacked_bytes("i", 4)   # int
-    elif type == 'float':
-        return unpacked_bytes("f", 4)   # float
-    elif type == 'ulong':
-        return unpacked_bytes("Q", 8)   # unsigned long
-    elif type == 'pointer':
+    if type == 'pointer':
         # The pointersize is given by the header (BlendFileHeader).
         if fileheader.PointerSize == 4:
-            return Read('uint', handle, fileheader)
+            type = 'uint'
         if fileheader.PointerSize == 8:
-            return Read('ulong', handle, fileheader)
+            type = 'ulong'
+
+    compiled = CompiledStruct(fileheader.StructPre + READ_TYPES[type])
+    return compiled.unpack(handle.read(compiled.size))[0]
 
 
 def openBlendFile(filename):
@@ -83,8 +131,8 @@ def openBlendFile(filename):
     Open a filename, determine if the file is compressed and returns a handle
     '''
     handle = open(filename, 'rb')
-    magic = ReadString(handle, 7)
-    if magic in ("BLENDER", "BULLETf"):
+    magic = handle.read(7)
+    if magic in (b"BLENDER", b"BULLETf"):
         log.debug("normal blendfile detected")
         handle.seek(0, os.SEEK_SET)
         return handle
@@ -105,6 +153,18 @@ def openBlendFile(filename):
         return handle
 
 
+def openBlendFileMapped(filename):
+    '''
+    Open a filename like openBlendFile, but returns a read-only memory map of
+    the (decompressed) blendfile. Use it together with BlendFileMap
+    '''
+    handle = openBlendFile(filename)
+    try:
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        handle.close()
+
+
 def Align(handle):
     '''
     Aligns the filehandle on 4 bytes
@@ -147,6 +207,13 @@ class BlendFile:
         
         # appending last fileblock, "ENDB"
         self.Blocks.append(fileblock)
+
+    def GetAll(self, handle, code, path):
+        '''
+        Decodes the field at path of all fileblocks with the given code,
+        returns a list with a value for every fileblock
+        '''
+        return [block.Get(handle, path) for block in self.Blocks if block.Header.Code == code]
     
     # seems unused?
     """
@@ -159,6 +226,460 @@ class BlendFile:
     """
 
 
+class BlendFileMap:
+    '''
+    Indexes all fileblocks of a memory mapped blendfile (see
+    openBlendFileMapped) in a single pass. The index is stored column wise in
+    arrays, one item per fileblock, and block payloads are exposed as
+    memoryview slices of the mapping so nothing is copied until decoded.
+
+    - BlendFileMap.Header        (BlendFileHeader instance)
+    - BlendFileMap.Catalog       (DNACatalog instance)
+    - BlendFileMap.Codes         (list of str)
+    - BlendFileMap.Sizes         (array of int)
+    - BlendFileMap.OldAddresses  (array of int)
+    - BlendFileMap.SDNAIndices   (array of int)
+    - BlendFileMap.Counts        (array of int)
+    - BlendFileMap.FileOffsets   (array of int, file pointer of datablock)
+    - BlendFileMap.AddressIndex  (dict of {old address: fileblock index})
+    - BlendFileMap.Cache         (LRUCache of decoded structures)
+    '''
+
+    def __init__(self, mapping, cacheSize=4096):
+        log.debug("indexing mapped blend-file")
+        self.Mapping = mapping
+        self.View = memoryview(mapping)
+
+        mapping.seek(0, os.SEEK_SET)
+        self.Header = BlendFileHeader(mapping)
+        header = self.Header
+        pointer = "Q" if header.PointerSize == 8 else "I"
+        self.BlockHeaderStruct = CompiledStruct(header.StructPre + "4sI" + pointer + "II")
+
+        self.Codes = []
+        self.Sizes = array.array('Q')
+        self.OldAddresses = array.array('Q')
+        self.SDNAIndices = array.array('I')
+        self.Counts = array.array('I')
+        self.FileOffsets = array.array('Q')
+        self.AddressIndex = {}
+        self.Catalog = None
+        self.Cache = LRUCache(cacheSize)
+        self._sortedAddresses = None
+
+        self._index(mapping.tell())
+
+        dna_index = self.FindBlock("DNA1")
+        if dna_index is None:
+            dna_index = self.FindBlock("SDNA")
+        if dna_index is not None:
+            mapping.seek(self.FileOffsets[dna_index], os.SEEK_SET)
+            self.Catalog = DNACatalog(header, mapping)
+
+    def _index(self, offset):
+        unpack_from = self.BlockHeaderStruct.unpack_from
+        header_size = self.BlockHeaderStruct.size
+        end = len(self.Mapping)
+
+        # decode every distinct code only once
+        code_names = {}
+
+        codes_append = self.Codes.append
+        sizes_append = self.Sizes.append
+        addresses_append = self.OldAddresses.append
+        sdna_append = self.SDNAIndices.append
+        counts_append = self.Counts.append
+        offsets_append = self.FileOffsets.append
+        address_index = self.AddressIndex
+
+        while offset + 8 <= end:
+            if offset + header_size <= end:
+                code, size, old, sdna, count = unpack_from(self.Mapping, offset)
+            else:
+                # truncated "ENDB" block header, only code and size are present
+                code, size = CompiledStruct(self.Header.StructPre + "4sI").unpack_from(self.Mapping, offset)
+                old = sdna = count = 0
+
+            name = code_names.get(code)
+            if name is None:
+                name = code_names[code] = code.decode().strip("\0 ")
+
+            if old:
+                address_index[old] = len(self.Codes)
+
+            offset += header_size
+            codes_append(name)
+            sizes_append(size)
+            addresses_append(old)
+            sdna_append(sdna)
+            counts_append(count)
+            offsets_append(min(offset, end))
+
+            if name == "ENDB":
+                break
+            offset += size
+
+        log.debug("indexed #{0} fileblocks".format(len(self.Codes)))
+
+    def __len__(self):
+        return len(self.Codes)
+
+    def FindBlock(self, code):
+        '''
+        Returns the index of the first fileblock with the given code, or None
+        '''
+        try:
+            return self.Codes.index(code)
+        except ValueError:
+            return None
+
+    def FindBlocks(self, code):
+        '''
+        Returns the indices of all fileblocks with the given code
+        '''
+        return [index for index, name in enumerate(self.Codes) if name == code]
+
+    def BlockHeader(self, index):
+        '''
+        Returns a FileBlockHeader for the fileblock at index
+        '''
+        self.Mapping.seek(self.FileOffsets[index] - self.BlockHeaderStruct.size, os.SEEK_SET)
+        return FileBlockHeader(self.Mapping, self.Header)
+
+    def Payload(self, index):
+        '''
+        Returns the data of the fileblock at index as a memoryview (no copy)
+        '''
+        offset = self.FileOffsets[index]
+        return self.View[offset:offset + self.Sizes[index]]
+
+    def Get(self, index, path):
+        '''
+        Decodes the field at path (eg: "id.name") of the fileblock at index
+        '''
+        dnaStruct = self.Catalog.Structs[self.SDNAIndices[index]]
+        layout = dnaStruct.FieldLayout(self.Header).get(path)
+        if layout is None:
+            log.debug("error did not find "+path)
+            return None
+        return layout.Decode(self.Mapping, self.FileOffsets[index] + layout.Offset)
+
+    def GetAll(self, code, path):
+        '''
+        Decodes the field at path of all fileblocks with the given code,
+        returns a list with a value for every fileblock
+        '''
+        structs = self.Catalog.Structs
+        layouts = {}
+        result = []
+        for index in self.FindBlocks(code):
+            sdnaIndex = self.SDNAIndices[index]
+            if sdnaIndex in layouts:
+                layout = layouts[sdnaIndex]
+            else:
+                layout = layouts[sdnaIndex] = structs[sdnaIndex].FieldLayout(self.Header).get(path)
+            if layout is None:
+                result.append(None)
+            else:
+                result.append(layout.Decode(self.Mapping, self.FileOffsets[index] + layout.Offset))
+        return result
+
+    def Resolve(self, address):
+        '''
+        Returns (fileblock index, file offset) of an old address,
+        or None when no fileblock contains the address
+        '''
+        index = self.AddressIndex.get(address)
+        if index is not None:
+            return index, self.FileOffsets[index]
+
+        # pointers in the middle of a fileblock, eg: to an item of an array
+        if self._sortedAddresses is None:
+            self._sortedAddresses = sorted(self.AddressIndex.items())
+        position = bisect.bisect_right(self._sortedAddresses, (address, len(self.Codes))) - 1
+        if position < 0:
+            return None
+        old, index = self._sortedAddresses[position]
+        if address >= old + self.Sizes[index]:
+            return None
+        return index, self.FileOffsets[index] + address - old
+
+    def Object(self, index, item=0):
+        '''
+        Returns a BlendObject of the fileblock at index, item is the index in
+        fileblocks containing an array of structures
+        '''
+        structure = self.Catalog.Structs[self.SDNAIndices[index]]
+        offset = self.FileOffsets[index] + item * structure.Type.Size
+        return BlendObject(self, index, offset, structure)
+
+    def Objects(self, code):
+        '''
+        Returns a BlendObject for every fileblock with the given code
+        '''
+        return [self.Object(index) for index in self.FindBlocks(code)]
+
+    def ObjectAt(self, address, structure=None):
+        '''
+        Returns a BlendObject of the structure at an old address, or None.
+        Without a structure the SDNA index of the fileblock is used.
+        '''
+        resolved = self.Resolve(address)
+        if resolved is None:
+            return None
+        index, offset = resolved
+        if structure is None:
+            structure = self.Catalog.Structs[self.SDNAIndices[index]]
+        return BlendObject(self, index, offset, structure)
+
+    def close(self):
+        self.Cache.clear()
+        self.View.release()
+        self.Mapping.close()
+
+
+class BlendFileIndex:
+    '''
+    Random access to the fileblocks of a blendfile through a sidecar index
+    file (filename + ".idx"), which is written on first use and reused as long
+    as the size and modification time of the blendfile are unchanged.
+    Fileblocks are read with os.pread, so many threads can share one instance.
+    Compressed blendfiles are decompressed to a temporary file once per instance.
+
+    - BlendFileIndex.Header   (BlendFileHeader instance)
+    - BlendFileIndex.Blocks   (list of (code, ID name, file offset, size, SDNA index, count))
+    - BlendFileIndex.Catalog  (DNACatalog instance, read on first access)
+    '''
+
+    VERSION = 1
+
+    def __init__(self, filename, indexFilename=None):
+        self.Filename = filename
+        self.IndexFilename = indexFilename or filename + ".idx"
+        self.Handle = openBlendFile(filename)
+        self.FileDescriptor = self.Handle.fileno()
+        self.Header = BlendFileHeader(self.Handle)
+        self._catalog = None
+
+        stat = os.stat(filename)
+        self.Blocks = self._load(stat)
+        if self.Blocks is None:
+            self.Blocks = self._build()
+            self._save(stat)
+
+        self.Names = {}
+        for blockIndex, block in enumerate(self.Blocks):
+            if block[1] is not None:
+                self.Names.setdefault((block[0], block[1]), blockIndex)
+
+    def _load(self, stat):
+        try:
+            with open(self.IndexFilename, "r") as handle:
+                index = json.load(handle)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if (index.get("version") != self.VERSION or
+                index.get("size") != stat.st_size or
+                index.get("mtime") != stat.st_mtime):
+            log.debug("outdated index "+self.IndexFilename)
+            return None
+        return [tuple(block) for block in index["blocks"]]
+
+    def _save(self, stat):
+        index = {
+            "version": self.VERSION,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "blocks": self.Blocks,
+            }
+        try:
+            with open(self.IndexFilename + ".tmp", "w") as handle:
+                json.dump(index, handle)
+            os.replace(self.IndexFilename + ".tmp", self.IndexFilename)
+        except (IOError, OSError):
+            log.warning("can't write index "+self.IndexFilename)
+
+    def _build(self):
+        log.debug("building index "+self.IndexFilename)
+        mapping = mmap.mmap(self.FileDescriptor, 0, access=mmap.ACCESS_READ)
+        blendmap = BlendFileMap(mapping)
+        self._catalog = blendmap.Catalog
+        try:
+            blocks = []
+            for blockIndex, code in enumerate(blendmap.Codes):
+                name = None
+                # only ID fileblocks have a two letter code
+                if len(code) == 2:
+                    name = blendmap.Get(blockIndex, "id.name")
+                blocks.append((code, name, blendmap.FileOffsets[blockIndex], blendmap.Sizes[blockIndex],
+                               blendmap.SDNAIndices[blockIndex], blendmap.Counts[blockIndex]))
+            return blocks
+        finally:
+            blendmap.close()
+
+    @property
+    def Catalog(self):
+        if self._catalog is None:
+            for code, name, offset, size, sdnaIndex, count in self.Blocks:
+                if code in ("DNA1", "SDNA"):
+                    self._catalog = DNACatalog(self.Header, io.BytesIO(os.pread(self.FileDescriptor, size, offset)))
+                    break
+        return self._catalog
+
+    def Find(self, code, name=None):
+        '''
+        Returns the index of the first fileblock with the given code, or of the
+        ID fileblock with the given name (with or without code prefix), or None
+        '''
+        if name is None:
+            for blockIndex, block in enumerate(self.Blocks):
+                if block[0] == code:
+                    return blockIndex
+            return None
+        if not name.startswith(code):
+            name = code + name
+        return self.Names.get((code, name))
+
+    def FindAll(self, code):
+        return [blockIndex for blockIndex, block in enumerate(self.Blocks) if block[0] == code]
+
+    def Read(self, blockIndex):
+        '''
+        Returns the data of the fileblock at blockIndex
+        '''
+        code, name, offset, size, sdnaIndex, count = self.Blocks[blockIndex]
+        return os.pread(self.FileDescriptor, size, offset)
+
+    def Get(self, blockIndex, path):
+        '''
+        Decodes the field at path (eg: "id.name") of the fileblock at blockIndex
+        '''
+        code, name, offset, size, sdnaIndex, count = self.Blocks[blockIndex]
+        layout = self.Catalog.Structs[sdnaIndex].FieldLayout(self.Header).get(path)
+        if layout is None:
+            log.debug("error did not find "+path)
+            return None
+        return layout.Decode(os.pread(self.FileDescriptor, layout.Size, offset + layout.Offset))
+
+    def close(self):
+        self.Handle.close()
+
+
+class LRUCache(collections.OrderedDict):
+    '''
+    LRUCache is a dict holding at most MaxSize items,
+    the least recently used items are dropped first.
+    '''
+
+    def __init__(self, maxSize):
+        collections.OrderedDict.__init__(self)
+        self.MaxSize = maxSize
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return collections.OrderedDict.__getitem__(self, key)
+
+    def __setitem__(self, key, value):
+        collections.OrderedDict.__setitem__(self, key, value)
+        self.move_to_end(key)
+        while len(self) > self.MaxSize:
+            self.popitem(last=False)
+
+
+class BlendObject:
+    '''
+    BlendObject is a lazy view of a structure stored in a BlendFileMap.
+    Fields are decoded on first access and kept in the LRU cache of the file,
+    nested structures are returned as BlendObjects too.
+
+    BlendObject.File    (BlendFileMap)
+    BlendObject.Index   (int, fileblock index)
+    BlendObject.Offset  (int, file offset of the structure)
+    BlendObject.Struct  (DNAStructure)
+
+    Fields can also be read as attributes: ob.id.name
+    '''
+
+    __slots__ = ("File", "Index", "Offset", "Struct")
+
+    def __init__(self, blendmap, index, offset, structure):
+        self.File = blendmap
+        self.Index = index
+        self.Offset = offset
+        self.Struct = structure
+
+    def __repr__(self):
+        return "<BlendObject {0} @{1}>".format(self.Struct.Type.Name, self.Offset)
+
+    def __eq__(self, other):
+        return (isinstance(other, BlendObject) and self.Offset == other.Offset and
+                self.Struct is other.Struct)
+
+    def __hash__(self):
+        return hash((self.Offset, self.Struct.Type.Name))
+
+    def __getattr__(self, name):
+        if self.Struct.FieldLayout(self.File.Header).get(name) is None:
+            raise AttributeError(name)
+        return self.Get(name)
+
+    def Fields(self):
+        return [field.Name.ShortName() for field in self.Struct.Fields]
+
+    def Get(self, path):
+        '''
+        Decodes the field at path (eg: "id.name"),
+        pointers are returned as old addresses (see Deref)
+        '''
+        key = (self.Offset, self.Struct.Type.Name)
+        values = self.File.Cache.get(key)
+        if values is None:
+            values = self.File.Cache[key] = {}
+        elif path in values:
+            return values[path]
+
+        layout = self.Struct.FieldLayout(self.File.Header).get(path)
+        if layout is None:
+            log.debug("error did not find "+path)
+            return None
+
+        field = layout.Field
+        if layout.Struct is None and field.Type.Structure is not None:
+            value = BlendObject(self.File, self.Index, self.Offset + layout.Offset, field.Type.Structure)
+        else:
+            value = layout.Decode(self.File.Mapping, self.Offset + layout.Offset)
+        values[path] = value
+        return value
+
+    def Deref(self, path):
+        '''
+        Returns the BlendObject the pointer at path points to, or None
+        '''
+        address = self.Get(path)
+        if not address:
+            return None
+        field = self.Struct.FieldLayout(self.File.Header)[path].Field
+        return self.File.ObjectAt(address, field.Type.Structure)
+
+    def ListBase(self, path):
+        '''
+        Yields the BlendObjects of the ListBase at path by following the
+        "first" and "next" pointers
+        '''
+        address = self.Get(path + ".first")
+        visited = set()
+        while address and address not in visited:
+            visited.add(address)
+            item = self.File.ObjectAt(address)
+            if item is None:
+                break
+            yield item
+            address = item.Get("next")
+
+
 class BlendFileHeader:
     '''
     BlendFileHeader allocates the first 12 bytes of a blend file.
@@ -234,7 +755,7 @@ class FileBlockHeader:
     '''
     
     def __init__(self, handle, fileheader):
-        self.Code = ReadString(handle, 4).strip()
+        self.Code = ReadString(handle, 4).strip("\0 ")
         if self.Code != "ENDB":
             self.Size = Read('uint', handle, fileheader)
             self.OldAddress = Read('pointer', handle, fileheader)
@@ -317,6 +838,14 @@ class DNACatalog:
                 fName = self.Names[fNameIndex]
                 structure.Fields.append(DNAField(fType, fName))
 
+    def Compile(self):
+        '''
+        Compiles the field layouts of all structures at once,
+        otherwise they are compiled on first access
+        '''
+        for structure in self.Structs:
+            structure.FieldLayout(self.Header)
+
 
 class DNAName:
     '''
@@ -393,22 +922,60 @@ class DNAStructure:
         self.Type = aType
         self.Type.Structure = self
         self.Fields=[]
-        
-    def GetField(self, header, handle, path):
-        splitted = path.partition(".")
-        name = splitted[0]
-        rest = splitted[2]
-        offset = 0;
+        self.Layout=None
+        self.Pointers=None
+
+    def FieldLayout(self, header):
+        '''
+        Returns a dict of {reference: DNAFieldLayout} for every field of the
+        structure, nested structures included (eg: "id.name").
+        The dict is compiled on first access only.
+        '''
+        if self.Layout is None:
+            self.Layout = {}
+            self.CompileLayout(header, self.Layout, None, 0)
+        return self.Layout
+
+    def CompileLayout(self, header, layout, parent, offset):
         for field in self.Fields:
-            if field.Name.ShortName() == name:
-                log.debug("found "+name+"@"+str(offset))
-                handle.seek(offset, os.SEEK_CUR)
-                return field.DecodeField(header, handle, rest)
-            else:
-                offset += field.Size(header)
+            reference = field.Name.AsReference(parent)
+            size = field.Size(header)
+            layout[reference] = DNAFieldLayout(field, offset, size, field.Format(header))
+            structure = field.Type.Structure
+            if structure is not None and not field.Name.IsPointer():
+                # only the first item of arrays of structures is referenced
+                structure.CompileLayout(header, layout, reference, offset)
+            offset += size
 
-        log.debug("error did not find "+path)
-        return None
+    def PointerOffsets(self, header):
+        '''
+        Returns the byte offsets of all pointers in the structure, including
+        the pointers in nested structures and in arrays of structures
+        '''
+        if self.Pointers is None:
+            self.Pointers = []
+            offset = 0
+            for field in self.Fields:
+                size = field.Size(header)
+                if field.Name.IsPointer() or field.Name.IsMethodPointer():
+                    self.Pointers.extend(range(offset, offset + size, header.PointerSize))
+                elif field.Type.Structure is not None:
+                    nested = field.Type.Structure.PointerOffsets(header)
+                    for item in range(field.Name.ArraySize()):
+                        itemOffset = offset + item * field.Type.Size
+                        self.Pointers.extend(itemOffset + pointer for pointer in nested)
+                offset += size
+        return self.Pointers
+
+    def GetField(self, header, handle, path):
+        layout = self.FieldLayout(header).get(path)
+        if layout is None:
+            log.debug("error did not find "+path)
+            return None
+
+        log.debug("found "+path+"@"+str(layout.Offset))
+        handle.seek(layout.Offset, os.SEEK_CUR)
+        return layout.Decode(handle.read(layout.Size))
 
 
 class DNAField:
@@ -429,18 +996,52 @@ class DNAField:
         else:
             return self.Type.Size*self.Name.ArraySize()
 
-    def DecodeField(self, header, handle, path):
-        if path == "":
-            if self.Name.IsPointer():
-                return Read('pointer', handle, header)
-            if self.Type.Name=="int":
-                return Read('int', handle, header)
-            if self.Type.Name=="short":
-                return Read('short', handle, header)
-            if self.Type.Name=="float":
-                return Read('float', handle, header)
-            if self.Type.Name=="char":
-                return ReadString(handle, self.Name.ArraySize())
+    def Format(self, header):
+        '''
+        Returns the struct format of the field, None for structures
+        '''
+        count = self.Name.ArraySize()
+        if self.Name.IsPointer() or self.Name.IsMethodPointer():
+            type_char = "Q" if header.PointerSize == 8 else "I"
+        elif self.Type.Name == "char":
+            # char arrays are strings
+            return CompiledStruct("{0}s".format(count))
         else:
-            return self.Type.Structure.GetField(header, handle, path)
+            type_char = FIELD_TYPES.get(self.Type.Name)
+            if type_char is None:
+                return None
+            if self.Type.Size == 8 and self.Type.Name in ("long", "ulong"):
+                type_char = type_char == "i" and "q" or "Q"
+        return CompiledStruct("{0}{1}{2}".format(header.StructPre, count, type_char))
+
+
+class DNAFieldLayout:
+    '''
+    DNAFieldLayout is the compiled position of a (nested) field in a structure
+
+    Field = DNAField
+    Offset = int (from the start of the outer structure)
+    Size = int
+    Struct = struct.Struct (None for structures)
+    '''
+
+    def __init__(self, aField, aOffset, aSize, aStruct):
+        self.Field = aField
+        self.Offset = aOffset
+        self.Size = aSize
+        self.Struct = aStruct
 
+    def Decode(self, buffer, offset=0):
+        '''
+        Decodes the field found at offset in a buffer,
+        arrays are returned as tuples
+        '''
+        if self.Struct is None:
+            return None
+        values = self.Struct.unpack_from(buffer, offset)
+        if len(values) != 1:
+            return values
+        value = values[0]
+        if isinstance(value, bytes):
+            return value.partition(b"\0")[0].decode(errors="replace")
+        return value
@@ -31,6 +31,18 @@ with the following contents:
 TryExec=blender-thumbnailer.py
 Exec=blender-thumbnailer.py %u %o
 MimeType=application/x-blender;
+
+The blend_file_scan module from blender's scripts/modules directory is used to
+read the thumbnail, it's found next to this script or in the python path.
+
+Thumbnails are cached in ${XDG_CACHE_HOME}/blender-thumbnailer/, keyed on the
+file path and checked against the file size and modification time stored in the
+png (Thumb::Size and Thumb::MTime, as in the freedesktop thumbnail spec).
+The least recently used thumbnails, and those of deleted files, are removed once
+the cache holds more than THUMB_CACHE_MAX_FILES, options:
+
+--compress-level=<0-9>  zlib compression level of the png
+--no-cache              don't use the thumbnail cache
 """
 
 import struct
@@ -84,108 +96,337 @@ def open_wrapper_get():
         return open_local_url
 
 
+def blend_file_scan_import():
+    """ import the blend_file_scan module, shared with blend_render_info,
+        from the python path or the blender installation next to this script
+    """
+    try:
+        import blend_file_scan
+    except ImportError:
+        import os
+        import sys
+        import glob
+
+        script_dir = os.path.dirname(os.path.realpath(__file__))
+        for pattern in (
+                # source tree: release/bin
+                os.path.join(script_dir, "..", "scripts", "modules"),
+                # portable install: blender/2.75/scripts/modules
+                os.path.join(script_dir, "*", "scripts", "modules"),
+                # system install: bin/../share/blender/2.75/scripts/modules
+                os.path.join(script_dir, "..", "share", "blender", "*", "scripts", "modules"),
+                ):
+            for path in glob.glob(pattern):
+                if os.path.exists(os.path.join(path, "blend_file_scan.py")):
+                    sys.path.append(path)
+                    import blend_file_scan
+                    return blend_file_scan
+        raise
+    return blend_file_scan
+
+
 def blend_extract_thumb(path):
-    import os
     open_wrapper = open_wrapper_get()
+    blend_file_scan = blend_file_scan_import()
 
-    # def MAKE_ID(tag): ord(tag[0])<<24 | ord(tag[1])<<16 | ord(tag[2])<<8 | ord(tag[3])
-    REND = 1145980242  # MAKE_ID(b'REND')
-    TEST = 1414743380  # MAKE_ID(b'TEST')
-
-    blendfile = open_wrapper(path, 'rb')
+    head, blocks = blend_file_scan.read_blocks(path, (b'TEST', ), open_wrapper)
 
-    head = blendfile.read(12)
+    if head is None:
+        return None, 0, 0
 
-    if head[0:2] == b'\x1f\x8b':  # gzip magic
-        import gzip
-        blendfile.close()
-        blendfile = gzip.GzipFile('', 'rb', 0, open_wrapper(path, 'rb'))
-        head = blendfile.read(12)
+    # blender pre 2.5 had no thumbs
+    if head.version[0:2] <= b'24':
+        return None, 0, 0
 
-    if not head.startswith(b'BLENDER'):
-        blendfile.close()
+    if not blocks:
         return None, 0, 0
 
-    is_64_bit = (head[7] == b'-'[0])
+    code, data = blocks[0]
+    int_endian_pair = '>ii' if head.is_big_endian else '<ii'
 
-    # true for PPC, false for X86
-    is_big_endian = (head[8] == b'V'[0])
+    try:
+        x, y = struct.unpack(int_endian_pair, data[0:8])  # 8 == sizeof(int) * 2
+    except struct.error:
+        return None, 0, 0
 
-    # blender pre 2.5 had no thumbs
-    if head[9:11] <= b'24':
+    image_buffer = data[8:]
+
+    if len(image_buffer) != x * y * 4:
         return None, 0, 0
 
-    sizeof_bhead = 24 if is_64_bit else 20
-    int_endian_pair = '>ii' if is_big_endian else '<ii'
+    return image_buffer, x, y
+
+
+# zlib level used for the thumbnails, 9 is several times slower for little gain
+PNG_COMPRESS_LEVEL_DEFAULT = 1
 
-    while True:
-        bhead = blendfile.read(sizeof_bhead)
 
-        if len(bhead) < sizeof_bhead:
-            return None, 0, 0
+def png_rows(buf, width, height):
+    """ return the png image data of an RGBA buffer (before compression),
+        the vertical line order is reversed and each line starts with a null byte
+    """
+    # rows are copied from a memoryview into one buffer,
+    # joining slices of buf copies each row twice
+    width_byte_4 = width * 4
+    raw_data = bytearray((width_byte_4 + 1) * height)
+    buf_view = memoryview(buf)
+    for span, row in zip(range(1, len(raw_data), width_byte_4 + 1),
+                         range((height - 1) * width_byte_4, -1, -width_byte_4)):
+        raw_data[span:span + width_byte_4] = buf_view[row:row + width_byte_4]
+    return raw_data
 
-        code, length = struct.unpack(int_endian_pair, bhead[0:8])  # 8 == sizeof(int) * 2
 
-        if code == REND:
-            blendfile.seek(length, os.SEEK_CUR)
-        else:
+def write_png(buf, width, height, compress_level=PNG_COMPRESS_LEVEL_DEFAULT, text=()):
+    """ return the png of an RGBA buffer, text is a sequence of (keyword, value)
+        bytes pairs written as tEXt chunks before the image data
+    """
+    import zlib
+
+    raw_data = png_rows(buf, width, height)
+
+    def png_pack(png_tag, data):
+        chunk_head = png_tag + data
+        return struct.pack("!I", len(data)) + chunk_head + struct.pack("!I", 0xFFFFFFFF & zlib.crc32(chunk_head))
+
+    return b"".join(
+        [b'\x89PNG\r\n\x1a\n',
+         png_pack(b'IHDR', struct.pack("!2I5B", width, height, 8, 6, 0, 0, 0))] +
+        [png_pack(b'tEXt', keyword + b'\x00' + value) for keyword, value in text] +
+        [png_pack(b'IDAT', zlib.compress(raw_data, compress_level)),
+         png_pack(b'IEND', b'')])
+
+
+def png_read_text(png):
+    """ return the tEXt chunks before the image data of a png as a dict,
+        png may only be the start of the file
+    """
+    text = {}
+    offset = 8  # png signature
+    while offset + 8 <= len(png):
+        length, png_tag = struct.unpack("!I4s", png[offset:offset + 8])
+        if png_tag == b'IDAT' or offset + length + 12 > len(png):
             break
+        if png_tag == b'tEXt':
+            keyword, _, value = png[offset + 8:offset + 8 + length].partition(b'\x00')
+            text[keyword] = value
+        offset += length + 12
+    return text
 
-    if code != TEST:
-        return None, 0, 0
 
+# thumbnails kept in the cache, past this old entries are removed
+THUMB_CACHE_MAX_FILES = 4096
+
+# bytes of a cached png read to find its tEXt chunks
+THUMB_CACHE_TEXT_SIZE = 4096
+
+
+def url_path(url):
+    """ return the local path of url, None for remote files
+    """
     try:
-        x, y = struct.unpack(int_endian_pair, blendfile.read(8))  # 8 == sizeof(int) * 2
-    except struct.error:
-        return None, 0, 0
+        # Python 3
+        from urllib.parse import urlparse, unquote
+    except ImportError:
+        # Python 2
+        from urlparse import urlparse
+        from urllib import unquote
 
-    length -= 8  # sizeof(int) * 2
+    o = urlparse(url)
+    if o.scheme == '':
+        return o.path
+    elif o.scheme == 'file':
+        return unquote(o.path)
+    return None
 
-    if length != x * y * 4:
-        return None, 0, 0
 
-    image_buffer = blendfile.read(length)
+def thumb_text(path, st):
+    """ return the tEXt chunks identifying the version of path a thumbnail is made from
+    """
+    try:
+        # Python 3
+        from urllib.request import pathname2url
+    except ImportError:
+        # Python 2
+        from urllib import pathname2url
 
-    if len(image_buffer) != length:
-        return None, 0, 0
+    uri = "file://" + pathname2url(path)
+    return (
+        (b'Thumb::URI', uri.encode("utf-8")),
+        (b'Thumb::MTime', ("%d" % int(st.st_mtime)).encode("ascii")),
+        (b'Thumb::Size', ("%d" % st.st_size).encode("ascii")),
+    )
 
-    return image_buffer, x, y
 
+def thumb_cache_dir():
+    import os
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_dir, "blender-thumbnailer")
 
-def write_png(buf, width, height):
-    import zlib
 
-    # reverse the vertical line order and add null bytes at the start
-    width_byte_4 = width * 4
-    raw_data = b"".join(b'\x00' + buf[span:span + width_byte_4] for span in range((height - 1) * width * 4, -1, - width_byte_4))
+def thumb_cache_path(url):
+    """ return (cache_path, text) for the cached thumbnail of a local file,
+        keyed on its path, text identifies the current version of the file (see thumb_text),
+        None for remote files
+    """
+    import os
+    import hashlib
 
-    def png_pack(png_tag, data):
-        chunk_head = png_tag + data
-        return struct.pack("!I", len(data)) + chunk_head + struct.pack("!I", 0xFFFFFFFF & zlib.crc32(chunk_head))
+    path = url_path(url)
+    if path is None:
+        return None
 
-    return b"".join([
-        b'\x89PNG\r\n\x1a\n',
-        png_pack(b'IHDR', struct.pack("!2I5B", width, height, 8, 6, 0, 0, 0)),
-        png_pack(b'IDAT', zlib.compress(raw_data, 9)),
-        png_pack(b'IEND', b'')])
+    path = os.path.abspath(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
 
+    cache_path = os.path.join(thumb_cache_dir(), hashlib.sha1(path.encode("utf-8")).hexdigest() + ".png")
+    return cache_path, thumb_text(path, st)
 
-def main():
-    import sys
 
-    if len(sys.argv) < 3:
-        print("Expected 2 arguments <input.blend> <output.png>")
-    else:
-        file_in = sys.argv[-2]
+def thumb_cache_read(cache_path, text):
+    """ return the cached png when it was made from the same version of the file, else None
+    """
+    import os
+
+    try:
+        f = open(cache_path, "rb")
+        png = f.read()
+        f.close()
+    except (IOError, OSError):
+        return None
+
+    png_text = png_read_text(png[:THUMB_CACHE_TEXT_SIZE])
+    if any(png_text.get(keyword) != value for keyword, value in text):
+        return None
+
+    # the modification time of the entry is its last use, see thumb_cache_prune
+    try:
+        os.utime(cache_path, None)
+    except OSError:
+        pass
+    return png
 
-        buf, width, height = blend_extract_thumb(file_in)
 
-        if buf:
-            file_out = sys.argv[-1]
+def thumb_cache_prune(cache_dir, max_files=THUMB_CACHE_MAX_FILES):
+    """ when there are more than max_files thumbnails, remove those of deleted or changed files,
+        then the least recently used ones until a quarter of max_files is free
+    """
+    import os
 
-            f = open(file_out, "wb")
-            f.write(write_png(buf, width, height))
+    try:
+        names = [name for name in os.listdir(cache_dir) if name.endswith(".png")]
+    except OSError:
+        return
+    if len(names) <= max_files:
+        return
+
+    entries = []
+    for name in names:
+        cache_path = os.path.join(cache_dir, name)
+        try:
+            f = open(cache_path, "rb")
+            png_text = png_read_text(f.read(THUMB_CACHE_TEXT_SIZE))
             f.close()
+            cache_mtime = os.stat(cache_path).st_mtime
+        except (IOError, OSError):
+            continue
+
+        is_valid = False
+        uri = png_text.get(b'Thumb::URI')
+        path = url_path(uri.decode("utf-8")) if uri is not None else None
+        if path is not None:
+            try:
+                text = thumb_text(path, os.stat(path))
+            except OSError:
+                pass
+            else:
+                is_valid = all(png_text.get(keyword) == value for keyword, value in text)
+
+        if is_valid:
+            entries.append((cache_mtime, cache_path))
+        else:
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+
+    entries.sort()
+    for cache_mtime, cache_path in entries[:max(0, len(entries) - (max_files * 3) // 4)]:
+        try:
+            os.remove(cache_path)
+        except OSError:
+            pass
+
+
+def thumb_cache_write(cache_path, png):
+    import os
+
+    cache_dir = os.path.dirname(cache_path)
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        # write to a temporary file first, other thumbnailers may read the cache
+        cache_path_tmp = "%s.%d.tmp" % (cache_path, os.getpid())
+        f = open(cache_path_tmp, "wb")
+        f.write(png)
+        f.close()
+        # replaces the thumbnail of a previous version of the file
+        os.rename(cache_path_tmp, cache_path)
+    except (IOError, OSError):
+        return
+
+    thumb_cache_prune(cache_dir)
+
+
+def thumbnail(file_in, file_out, compress_level=PNG_COMPRESS_LEVEL_DEFAULT, use_cache=True):
+    """ write the thumbnail of file_in as png to file_out,
+        returns False when file_in has no thumbnail
+    """
+    cache = thumb_cache_path(file_in) if use_cache else None
+
+    png = None
+    if cache is not None:
+        cache_path, text = cache
+        png = thumb_cache_read(cache_path, text)
+
+    if not png:
+        buf, width, height = blend_extract_thumb(file_in)
+        if not buf:
+            return False
+
+        if cache is not None:
+            png = write_png(buf, width, height, compress_level, text)
+            thumb_cache_write(cache_path, png)
+        else:
+            png = write_png(buf, width, height, compress_level)
+
+    f = open(file_out, "wb")
+    f.write(png)
+    f.close()
+    return True
+
+
+def main():
+    import sys
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = [arg for arg in sys.argv[1:] if arg.startswith("--")]
+
+    compress_level = PNG_COMPRESS_LEVEL_DEFAULT
+    use_cache = True
+    for option in options:
+        if option.startswith("--compress-level="):
+            compress_level = int(option.split("=", 1)[1])
+        elif option == "--no-cache":
+            use_cache = False
+
+    if len(args) < 2:
+        print("Expected 2 arguments <input.blend> <output.png>")
+        print("Options: --compress-level=<0-9> (default %d), --no-cache" % PNG_COMPRESS_LEVEL_DEFAULT)
+    else:
+        thumbnail(args[-2], args[-1], compress_level, use_cache)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Reads the file blocks blender writes at the start of a .blend file
+(render info and thumbnail) without running from inside blender.
+
+Used by blend_render_info and blender-thumbnailer.py,
+this module runs with python 2.7 and 3.x.
+
+Only the leading blocks are read, the scan stops as soon as the wanted codes
+have been seen, or at the first block which isn't one of HEADER_CODES.
+Uncompressed local files are memory mapped, compressed files are decompressed
+as a stream, never seeking backwards.
+
+Benchmark over a directory tree (files/second):
+
+    python blend_file_scan.py --benchmark /path/to/files
+"""
+
+__all__ = (
+    "BlendHead",
+    "HEADER_CODES",
+    "read_blocks",
+    "iter_blend_paths",
+    )
+
+import struct
+from collections import namedtuple
+
+# This struct wont change according to Ton.
+# Note that the size differs on 32/64bit
+#
+# typedef struct BHead {
+#     int code, len;
+#     void *old;
+#     int SDNAnr, nr;
+# } BHead;
+
+# blocks written before any ID data, see 'write_global' & 'write_renderinfo'
+HEADER_CODES = (b'REND', b'TEST')
+
+# chunk size used when skipping over compressed data
+SKIP_CHUNK_SIZE = 64 * 1024
+
+BlendHead = namedtuple("BlendHead", ("is_64_bit", "is_big_endian", "version"))
+
+
+def _open_stream(path, open_wrapper):
+    """
+    Returns (stream, head, is_compressed) where stream is positioned after the
+    12 byte file header, stream is a memory map when possible.
+    """
+    blendfile = open_wrapper(path, 'rb')
+    head = blendfile.read(12)
+
+    if head[0:2] == b'\x1f\x8b':  # gzip magic
+        import gzip
+        blendfile.close()
+        blendfile = gzip.GzipFile('', 'rb', 0, open_wrapper(path, 'rb'))
+        head = blendfile.read(12)
+        return blendfile, head, True
+
+    try:
+        fileno = blendfile.fileno()
+    except (AttributeError, IOError, OSError, ValueError):
+        return blendfile, head, False
+
+    import mmap
+    try:
+        mapping = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (EnvironmentError, ValueError):
+        return blendfile, head, False
+
+    blendfile.close()
+    mapping.seek(len(head))
+    return mapping, head, False
+
+
+def _skip(stream, length, is_compressed):
+    """
+    Skips length bytes of stream,
+    returns False when the stream ends first (truncated files).
+    """
+    if not is_compressed:
+        try:
+            stream.seek(length, 1)
+        except (ValueError, IOError, OSError):
+            # memory maps can't seek past their end
+            return False
+        return True
+
+    # read instead of seeking, gzip seeks decompress the data anyway
+    while length > 0:
+        data = stream.read(min(length, SKIP_CHUNK_SIZE))
+        if not data:
+            return False
+        length -= len(data)
+    return True
+
+
+def read_blocks(path, codes, open_wrapper=open):
+    """
+    Reads the header blocks of a blend file.
+
+    :arg path: File path or url understood by open_wrapper.
+    :type path: string
+    :arg codes: Block codes to return, eg: (b'REND', ).
+    :type codes: sequence of bytes
+    :arg open_wrapper: Function used to open the file.
+    :return: (head, blocks), head is a :class:`BlendHead` or None when this isn't a blend file,
+       blocks is a list of (code, data) pairs in file order.
+    :rtype: tuple
+    """
+    stream, head, is_compressed = _open_stream(path, open_wrapper)
+    try:
+        if len(head) != 12 or not head.startswith(b'BLENDER'):
+            return None, []
+
+        blend_head = BlendHead(
+                is_64_bit=(head[7:8] == b'-'),
+                # true for PPC, false for X86
+                is_big_endian=(head[8:9] == b'V'),
+                version=head[9:12],
+                )
+
+        sizeof_bhead = 24 if blend_head.is_64_bit else 20
+        unpack_length = struct.Struct('>i' if blend_head.is_big_endian else '<i').unpack
+
+        codes = frozenset(codes)
+        seen = set()
+        blocks = []
+
+        while True:
+            bhead = stream.read(sizeof_bhead)
+            if len(bhead) < sizeof_bhead:
+                break
+
+            code = bhead[0:4]
+            if code not in HEADER_CODES:
+                break
+
+            length = unpack_length(bhead[4:8])[0]
+
+            if code in codes:
+                data = stream.read(length)
+                if len(data) != length:
+                    break
+                blocks.append((code, data))
+                seen.add(code)
+            elif seen.issuperset(codes):
+                # all wanted blocks are read
+                break
+            elif not _skip(stream, length, is_compressed):
+                break
+
+        return blend_head, blocks
+    finally:
+        stream.close()
+
+
+def iter_blend_paths(paths):
+    """
+    Yields the .blend files in paths, directories are walked recursively.
+    """
+    import os
+
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(".blend"):
+                        yield os.path.join(dirpath, filename)
+        else:
+            yield path
+
+
+def benchmark(paths, codes=HEADER_CODES):
+    import time
+
+    files = list(iter_blend_paths(paths))
+    time_start = time.time()
+    blocks_total = 0
+    for path in files:
+        blocks_total += len(read_blocks(path, codes)[1])
+    time_total = time.time() - time_start
+
+    print("%d files, %d blocks in %.3f sec, %.1f files/sec" %
+          (len(files), blocks_total, time_total, len(files) / max(time_total, 1e-9)))
+
+
+def main():
+    import sys
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Read the header blocks of .blend files.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="time scanning all files, in files/second")
+    parser.add_argument("--code", action="append", dest="codes",
+                        help="block code to read, can be given multiple times (default: REND and TEST)")
+    parser.add_argument("paths", nargs="+", help=".blend files or directories")
+    args = parser.parse_args(sys.argv[1:])
+
+    codes = tuple(code.encode("ascii") for code in args.codes) if args.codes else HEADER_CODES
+
+    if args.benchmark:
+        benchmark(args.paths, codes)
+        return
+
+    for path in iter_blend_paths(args.paths):
+        head, blocks = read_blocks(path, codes)
+        if head is None:
+            print("not a blend file: %s" % path)
+            continue
+        for code, data in blocks:
+            print("%s %s %d" % (path, code.decode("ascii"), len(data)))
+
+
+if __name__ == '__main__':
+    main()
@@ -22,78 +22,195 @@
 
 # This module can get render info without running from inside blender.
 #
-# This struct wont change according to Ton.
-# Note that the size differs on 32/64bit
+# The REND blocks are read with blend_file_scan,
+# this struct wont change according to Ton.
 #
-# typedef struct BHead {
-#     int code, len;
-#     void *old;
-#     int SDNAnr, nr;
-# } BHead;
+# struct RenderInfo {
+#     int sfra, efra;
+#     char scene_name[64];
+# };
 
 
-def read_blend_rend_chunk(path):
-
+def _read_rend_scenes(path):
+    """
+    Return the (start_frame, end_frame, scene_name) of every scene,
+    None when path isn't a blend file.
+    """
     import struct
+    from blend_file_scan import read_blocks
+
+    head, blocks = read_blocks(path, (b'REND', ))
 
-    blendfile = open(path, "rb")
+    if head is None:
+        return None
+
+    scenes = []
 
-    head = blendfile.read(7)
+    for code, data in blocks:
+        # Now we want the scene name, start and end frame. this is 32bites long
+        start_frame, end_frame = struct.unpack('>2i' if head.is_big_endian else '<2i', data[0:8])
+
+        scene_name = data[8:72]
+
+        scene_name = scene_name[:scene_name.index(b'\0')]
 
-    if head[0:2] == b'\x1f\x8b':  # gzip magic
-        import gzip
-        blendfile.close()
-        blendfile = gzip.open(path, "rb")
-        head = blendfile.read(7)
+        try:
+            scene_name = str(scene_name, "utf8")
+        except TypeError:
+            pass
+
+        scenes.append((start_frame, end_frame, scene_name))
+
+    return scenes
 
-    if head != b'BLENDER':
+
+def read_blend_rend_chunk(path):
+    scenes = _read_rend_scenes(path)
+
+    if scenes is None:
         print("not a blend file:", path)
-        blendfile.close()
         return []
 
-    is_64_bit = (blendfile.read(1) == b'-')
+    return scenes
 
-    # true for PPC, false for X86
-    is_big_endian = (blendfile.read(1) == b'V')
 
-    # Now read the bhead chunk!!!
-    blendfile.read(3)  # skip the version
+# ---------------------------------------------------------------------------
+# Batch mode
+#
+# Probes whole directory trees with a thread pool (the time is spent waiting
+# on file systems such as NFS, not in python) and writes one JSON record per
+# line. Results are cached on disk keyed on (path, size, mtime),
+# so rescans only read files which changed.
 
-    scenes = []
+BATCH_THREADS_DEFAULT = 32
 
-    sizeof_bhead = 24 if is_64_bit else 20
+# files queued per thread, bounds the memory used by pending records
+BATCH_QUEUE_PER_THREAD = 4
 
-    while blendfile.read(4) == b'REND':
-        sizeof_bhead_left = sizeof_bhead - 4
 
-        struct.unpack('>i' if is_big_endian else '<i', blendfile.read(4))[0]
-        sizeof_bhead_left -= 4
+def _load_cache(cache_path):
+    import json
 
-        # We don't care about the rest of the bhead struct
-        blendfile.read(sizeof_bhead_left)
+    try:
+        with open(cache_path, "r") as fh:
+            cache = json.load(fh)
+    except (IOError, OSError, ValueError):
+        return {}
 
-        # Now we want the scene name, start and end frame. this is 32bites long
-        start_frame, end_frame = struct.unpack('>2i' if is_big_endian else '<2i', blendfile.read(8))
+    return cache if isinstance(cache, dict) else {}
 
-        scene_name = blendfile.read(64)
 
-        scene_name = scene_name[:scene_name.index(b'\0')]
+def _save_cache(cache_path, cache):
+    import os
+    import json
 
-        try:
-            scene_name = str(scene_name, "utf8")
-        except TypeError:
-            pass
+    cache_path_tmp = cache_path + ".tmp"
+    with open(cache_path_tmp, "w") as fh:
+        json.dump(cache, fh)
+    os.replace(cache_path_tmp, cache_path)
 
-        scenes.append((start_frame, end_frame, scene_name))
 
-    blendfile.close()
+def read_blend_rend_record(path, cache=None):
+    """
+    Return a dict with the path, size, mtime and scenes of a blend file,
+    the scenes are None when path isn't a blend file.
 
-    return scenes
+    :arg cache: Optional dict of previous records by path,
+       reused when the size and mtime of the file are unchanged.
+    """
+    import os
+    import zlib
+    import struct
+
+    try:
+        st = os.stat(path)
+    except OSError as ex:
+        return {"path": path, "error": str(ex)}
+
+    if cache is not None:
+        record = cache.get(path)
+        if (record is not None and
+                record.get("size") == st.st_size and
+                record.get("mtime") == st.st_mtime):
+            return record
+
+    try:
+        scenes = _read_rend_scenes(path)
+    except (IOError, OSError, EOFError, ValueError, struct.error, zlib.error) as ex:
+        # corrupt files are reported in the record, the batch continues
+        return {"path": path, "size": st.st_size, "mtime": st.st_mtime, "error": str(ex)}
+
+    if scenes is not None:
+        scenes = [
+            {"name": scene_name, "frame_start": start_frame, "frame_end": end_frame}
+            for start_frame, end_frame, scene_name in scenes
+        ]
+
+    return {"path": path, "size": st.st_size, "mtime": st.st_mtime, "scenes": scenes}
+
+
+def batch(paths, output, threads=BATCH_THREADS_DEFAULT, cache_path=None):
+    """
+    Write JSON Lines records (see :func:`read_blend_rend_record`) for all blend files in paths,
+    directories are walked recursively.
+
+    :arg output: File object the records are written to.
+    :arg threads: Number of files probed at once.
+    :arg cache_path: Optional JSON file caching the records between runs.
+    """
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+    from blend_file_scan import iter_blend_paths
+
+    cache = _load_cache(cache_path) if cache_path else None
+    cache_next = {}
+
+    def write_record(record):
+        output.write(json.dumps(record, sort_keys=True) + "\n")
+        if "error" not in record:
+            cache_next[record["path"]] = record
+
+    # 'executor.map' would submit every path up front,
+    # keep a bounded queue of futures instead (written in path order).
+    from collections import deque
+    queue_size = max(1, threads) * BATCH_QUEUE_PER_THREAD
+    futures = deque()
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for path in iter_blend_paths(paths):
+            if len(futures) == queue_size:
+                write_record(futures.popleft().result())
+            futures.append(executor.submit(read_blend_rend_record, path, cache))
+
+        while futures:
+            write_record(futures.popleft().result())
+
+    # files which are gone are dropped from the cache
+    if cache_path:
+        _save_cache(cache_path, cache_next)
 
 
 def main():
+    import os
     import sys
-    for arg in sys.argv[1:]:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+            description="Print the frame range and name of all scenes in .blend files.")
+    parser.add_argument("--batch", action="store_true",
+                        help="walk directories and write one JSON record per file")
+    parser.add_argument("--threads", type=int, default=BATCH_THREADS_DEFAULT,
+                        help="number of files probed at once in batch mode (default: %(default)d)")
+    parser.add_argument("--cache", metavar="FILE",
+                        help="JSON file reusing records of unchanged files in batch mode")
+    parser.add_argument("paths", nargs="*", help=".blend files (or directories in batch mode)")
+    args = parser.parse_args(sys.argv[1:])
+
+    if args.batch or any(os.path.isdir(path) for path in args.paths):
+        batch(args.paths, sys.stdout, threads=args.threads, cache_path=args.cache)
+        return
+
+    for arg in args.paths:
         if arg.lower().endswith('.blend'):
             for value in read_blend_rend_chunk(arg):
                 print("%d %d %s" % value)
@@ -29,5 +29,6 @@ __all__ = (
     "image_utils",
     "keyconfig_utils",
     "mesh_utils",
+    "uv_pack",
     "view3d_utils",
     )
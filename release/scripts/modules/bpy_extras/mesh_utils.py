@@ -21,15 +21,54 @@
 __all__ = (
     "mesh_linked_uv_islands",
     "mesh_linked_tessfaces",
+    "edge_face_count_array",
     "edge_face_count_dict",
     "edge_face_count",
     "edge_loops_from_tessfaces",
     "edge_loops_from_edges",
     "ngon_tessellate",
+    "ngon_tessellate_batch",
     "face_random_points",
+    "mesh_random_points",
     )
 
 
+def _disjoint_set_find(parent, i):
+    # path halving, every visited element skips to its grandparent
+    while parent[i] != i:
+        parent[i] = i = parent[parent[i]]
+    return i
+
+
+def _disjoint_set_union(parent, i, j):
+    i = _disjoint_set_find(parent, i)
+    j = _disjoint_set_find(parent, j)
+    # the smallest index is the root, so groups are sorted by their root
+    if i < j:
+        parent[j] = i
+    elif j < i:
+        parent[i] = j
+
+
+def _disjoint_set_groups(parent):
+    """
+    :return: lists of the indices of each set,
+       in the order of their lowest index.
+    :rtype: list
+    """
+    find = _disjoint_set_find
+    groups = []
+    group_of_root = [None] * len(parent)
+    for i in range(len(parent)):
+        root = find(parent, i)
+        if root == i:
+            group = group_of_root[i] = [i]
+            groups.append(group)
+        else:
+            group_of_root[root].append(i)
+    return groups
+
+
 def mesh_linked_uv_islands(mesh):
     """
     Splits the mesh into connected polygons, use this for seperating cubes from
@@ -40,54 +79,32 @@ def mesh_linked_uv_islands(mesh):
     :return: lists of lists containing polygon indices
     :rtype: list
     """
-    uv_loops = [luv.uv[:] for luv in mesh.uv_layers.active.data]
-    poly_loops = [poly.loop_indices for poly in mesh.polygons]
-    luv_hash = {}
-    luv_hash_get = luv_hash.get
-    luv_hash_ls = [None] * len(uv_loops)
-    for pi, poly_indices in enumerate(poly_loops):
-        for li in poly_indices:
-            uv = uv_loops[li]
-            uv_hub = luv_hash_get(uv)
-            if uv_hub is None:
-                uv_hub = luv_hash[uv] = [pi]
-            else:
-                uv_hub.append(pi)
-            luv_hash_ls[li] = uv_hub
-
-    poly_islands = []
-
-    # 0 = none, 1 = added, 2 = searched
-    poly_tag = [0] * len(poly_loops)
-
-    while True:
-        poly_index = -1
-        for i in range(len(poly_loops)):
-            if poly_tag[i] == 0:
-                poly_index = i
-                break
-
-        if poly_index != -1:
-            island = [poly_index]
-            poly_tag[poly_index] = 1
-            poly_islands.append(island)
-        else:
-            break  # we're done
-
-        added = True
-        while added:
-            added = False
-            for poly_index in island[:]:
-                if poly_tag[poly_index] == 1:
-                    for li in poly_loops[poly_index]:
-                        for poly_index_shared in luv_hash_ls[li]:
-                            if poly_tag[poly_index_shared] == 0:
-                                added = True
-                                poly_tag[poly_index_shared] = 1
-                                island.append(poly_index_shared)
-                    poly_tag[poly_index] = 2
-
-    return poly_islands
+    import array
+
+    polygons = mesh.polygons
+    nbr_polys = len(polygons)
+
+    uv_array = array.array('f', [0.0] * 2) * len(mesh.loops)
+    mesh.uv_layers.active.data.foreach_get("uv", uv_array)
+    loop_starts = array.array('i', [0]) * nbr_polys
+    polygons.foreach_get("loop_start", loop_starts)
+    loop_totals = array.array('i', [0]) * nbr_polys
+    polygons.foreach_get("loop_total", loop_totals)
+
+    # polygons sharing a UV coordinate are in the same island
+    parent = list(range(nbr_polys))
+    union = _disjoint_set_union
+    luv_poly = {}
+    luv_poly_setdefault = luv_poly.setdefault
+    for pi in range(nbr_polys):
+        li_start = loop_starts[pi] * 2
+        for li in range(li_start, li_start + loop_totals[pi] * 2, 2):
+            uv = uv_array[li], uv_array[li + 1]
+            pi_other = luv_poly_setdefault(uv, pi)
+            if pi_other != pi:
+                union(parent, pi, pi_other)
+
+    return _disjoint_set_groups(parent)
 
 
 def mesh_linked_tessfaces(mesh):
@@ -100,50 +117,58 @@ def mesh_linked_tessfaces(mesh):
     :return: lists of lists containing faces.
     :rtype: list
     """
+    import array
+
+    tessfaces = mesh.tessfaces
+    nbr_faces = len(tessfaces)
+
+    # 4 indices per face, the 4th is 0 for triangles
+    face_verts = array.array('i', [0]) * (nbr_faces * 4)
+    tessfaces.foreach_get("vertices_raw", face_verts)
+
+    # faces sharing a vertex are connected, join their vertices
+    parent = list(range(len(mesh.vertices)))
+    union = _disjoint_set_union
+    for i in range(0, nbr_faces * 4, 4):
+        v1 = face_verts[i]
+        union(parent, v1, face_verts[i + 1])
+        union(parent, v1, face_verts[i + 2])
+        v4 = face_verts[i + 3]
+        if v4 != 0:
+            union(parent, v1, v4)
+
+    # group the faces by the set of their first vertex
+    find = _disjoint_set_find
+    face_groups = []
+    face_group_of_root = {}
+    for i in range(nbr_faces):
+        root = find(parent, face_verts[i * 4])
+        face_group = face_group_of_root.get(root)
+        if face_group is None:
+            face_group = face_group_of_root[root] = []
+            face_groups.append(face_group)
+        face_group.append(tessfaces[i])
+
+    return face_groups
+
+
+def edge_face_count_array(mesh):
+    """
+    :return: number of faces using each item in mesh.edges.
+    :rtype: :class:`array.array` of ints
+    """
+    import array
+    from collections import Counter
 
-    # Build vert face connectivity
-    vert_faces = [[] for i in range(len(mesh.vertices))]
-    for f in mesh.tessfaces:
-        for v in f.vertices:
-            vert_faces[v].append(f)
-
-    # sort faces into connectivity groups
-    face_groups = [[f] for f in mesh.tessfaces]
-    # map old, new face location
-    face_mapping = list(range(len(mesh.tessfaces)))
-
-    # Now clump faces iteratively
-    ok = True
-    while ok:
-        ok = False
-
-        for i, f in enumerate(mesh.tessfaces):
-            mapped_index = face_mapping[f.index]
-            mapped_group = face_groups[mapped_index]
-
-            for v in f.vertices:
-                for nxt_f in vert_faces[v]:
-                    if nxt_f != f:
-                        nxt_mapped_index = face_mapping[nxt_f.index]
-
-                        # We are not a part of the same group
-                        if mapped_index != nxt_mapped_index:
-                            ok = True
-
-                            # Assign mapping to this group so they
-                            # all map to this group
-                            for grp_f in face_groups[nxt_mapped_index]:
-                                face_mapping[grp_f.index] = mapped_index
-
-                            # Move faces into this group
-                            mapped_group.extend(face_groups[nxt_mapped_index])
+    loops = mesh.loops
+    loop_edges = array.array('i', [0]) * len(loops)
+    loops.foreach_get("edge_index", loop_edges)
 
-                            # remove reference to the list
-                            face_groups[nxt_mapped_index] = None
+    face_edge_count = array.array('i', [0]) * len(mesh.edges)
+    for i, count in Counter(loop_edges).items():
+        face_edge_count[i] = count
 
-    # return all face groups that are not null
-    # this is all the faces that are connected in their own lists.
-    return [fg for fg in face_groups if fg]
+    return face_edge_count
 
 
 def edge_face_count_dict(mesh):
@@ -152,19 +177,19 @@ def edge_face_count_dict(mesh):
        faces using each edge.
     :rtype: dict
     """
+    import array
+
+    face_edge_count = edge_face_count_array(mesh)
 
-    face_edge_count = {}
-    loops = mesh.loops
     edges = mesh.edges
-    for poly in mesh.polygons:
-        for i in poly.loop_indices:
-            key = edges[loops[i].edge_index].key
-            try:
-                face_edge_count[key] += 1
-            except:
-                face_edge_count[key] = 1
+    edge_verts = array.array('i', [0]) * (len(edges) * 2)
+    edges.foreach_get("vertices", edge_verts)
 
-    return face_edge_count
+    return {(v1, v2) if v1 < v2 else (v2, v1): count
+            for v1, v2, count in zip(edge_verts[0::2],
+                                     edge_verts[1::2],
+                                     face_edge_count)
+            if count}
 
 
 def edge_face_count(mesh):
@@ -172,12 +197,27 @@ def edge_face_count(mesh):
     :return: list face users for each item in mesh.edges.
     :rtype: list
     """
-    edge_face_count = edge_face_count_dict(mesh)
-    get = dict.get
-    return [get(edge_face_count, ed.key, 0) for ed in mesh.edges]
+    return edge_face_count_array(mesh).tolist()
 
 
-def edge_loops_from_tessfaces(mesh, tessfaces=None, seams=()):
+def _edge_loops_as_arrays(loops, item_size):
+    """
+    :return: the items of all loops in one flat array,
+       and the number of items in each loop.
+    :rtype: pair of :class:`array.array` of ints
+    """
+    import array
+    from itertools import chain
+
+    loop_items = chain.from_iterable(loops)
+    if item_size != 1:
+        loop_items = chain.from_iterable(loop_items)
+    return (array.array('i', loop_items),
+            array.array('i', [len(loop) for loop in loops]))
+
+
+def edge_loops_from_tessfaces(mesh, tessfaces=None, seams=(),
+                              use_arrays=False):
     """
     Edge loops defined by faces
 
@@ -193,22 +233,34 @@ def edge_loops_from_tessfaces(mesh, tessfaces=None, seams=()):
     :type mesh: :class:`bpy.types.Mesh`
     :arg tessfaces: optional face list to only use some of the meshes faces.
     :type tessfaces: :class:`bpy.types.MeshTessFace`, sequence or or NoneType
+    :arg use_arrays: return the edge vertex indices of all loops in one
+       flat array (2 per edge) and the number of edges of each loop.
+    :type use_arrays: bool
     :return: return a list of edge vertex index lists.
     :rtype: list
     """
+    import array
 
     OTHER_INDEX = 2, 3, 0, 1  # opposite face index
 
     if tessfaces is None:
         tessfaces = mesh.tessfaces
+        # 4 indices per face, the 4th is 0 for triangles
+        face_verts = array.array('i', [0]) * (len(tessfaces) * 4)
+        tessfaces.foreach_get("vertices_raw", face_verts)
+    else:
+        face_verts = array.array('i', [v for f in tessfaces
+                                       for v in f.vertices_raw])
 
     edges = {}
 
-    for f in tessfaces:
-        if len(f.vertices) == 4:
-            edge_keys = f.edge_keys
-            for i, edkey in enumerate(f.edge_keys):
-                edges.setdefault(edkey, []).append(edge_keys[OTHER_INDEX[i]])
+    for i in range(0, len(face_verts), 4):
+        if face_verts[i + 3] != 0:
+            fv = face_verts[i:i + 4]
+            edge_keys = [(fv[j], fv[j - 3]) if fv[j] < fv[j - 3] else
+                         (fv[j - 3], fv[j]) for j in range(4)]
+            for j, edkey in enumerate(edge_keys):
+                edges.setdefault(edkey, []).append(edge_keys[OTHER_INDEX[j]])
 
     for edkey in seams:
         edges[edkey] = []
@@ -255,10 +307,13 @@ def edge_loops_from_tessfaces(mesh, tessfaces=None, seams=()):
                 # Dont look at this again
                 del ed_adj[:]
 
+    if use_arrays:
+        return _edge_loops_as_arrays(edge_loops, 2)
+
     return edge_loops
 
 
-def edge_loops_from_edges(mesh, edges=None):
+def edge_loops_from_edges(mesh, edges=None, use_arrays=False):
     """
     Edge loops defined by edges
 
@@ -268,56 +323,68 @@ def edge_loops_from_edges(mesh, edges=None):
     [ [1, 6, 7, 2], ...]
 
     closed loops have matching start and end values.
+
+    :arg use_arrays: return the vertex indices of all loops in one flat
+       array and the number of vertices of each loop.
+    :type use_arrays: bool
     """
-    line_polys = []
+    import array
 
     # Get edges not used by a face
     if edges is None:
         edges = mesh.edges
+        edge_verts = array.array('i', [0]) * (len(edges) * 2)
+        edges.foreach_get("vertices", edge_verts)
+    else:
+        edge_verts = array.array('i', [v for ed in edges
+                                       for v in ed.vertices])
+
+    # vertex to edge adjacency, each edge is followed once
+    vert_edges = {}
+    for i, v in enumerate(edge_verts):
+        vert_edges.setdefault(v, []).append(i >> 1)
+    edge_used = bytearray(len(edge_verts) >> 1)
+
+    def edge_next(v):
+        v_edges = vert_edges[v]
+        while v_edges:
+            i = v_edges.pop()
+            if not edge_used[i]:
+                edge_used[i] = True
+                # the other vertex of the edge
+                v1, v2 = edge_verts[i * 2], edge_verts[i * 2 + 1]
+                return v2 if v1 == v else v1
+        return None
 
-    if not hasattr(edges, "pop"):
-        edges = edges[:]
+    line_polys = []
+
+    # start from the last edges, as edges used to be popped
+    for i in range(len(edge_used) - 1, -1, -1):
+        if edge_used[i]:
+            continue
+        edge_used[i] = True
+        vert_end, vert_start = edge_verts[i * 2], edge_verts[i * 2 + 1]
 
-    while edges:
-        current_edge = edges.pop()
-        vert_end, vert_start = current_edge.vertices[:]
         line_poly = [vert_start, vert_end]
+        v = edge_next(vert_end)
+        while v is not None:
+            line_poly.append(v)
+            v = edge_next(v)
+
+        line_poly_start = []
+        v = edge_next(vert_start)
+        while v is not None:
+            line_poly_start.append(v)
+            v = edge_next(v)
+        if line_poly_start:
+            line_poly_start.reverse()
+            line_poly[:0] = line_poly_start
 
-        ok = True
-        while ok:
-            ok = False
-            #for i, ed in enumerate(edges):
-            i = len(edges)
-            while i:
-                i -= 1
-                ed = edges[i]
-                v1, v2 = ed.vertices
-                if v1 == vert_end:
-                    line_poly.append(v2)
-                    vert_end = line_poly[-1]
-                    ok = 1
-                    del edges[i]
-                    # break
-                elif v2 == vert_end:
-                    line_poly.append(v1)
-                    vert_end = line_poly[-1]
-                    ok = 1
-                    del edges[i]
-                    #break
-                elif v1 == vert_start:
-                    line_poly.insert(0, v2)
-                    vert_start = line_poly[0]
-                    ok = 1
-                    del edges[i]
-                    # break
-                elif v2 == vert_start:
-                    line_poly.insert(0, v1)
-                    vert_start = line_poly[0]
-                    ok = 1
-                    del edges[i]
-                    #break
         line_polys.append(line_poly)
 
+    if use_arrays:
+        return _edge_loops_as_arrays(line_polys, 1)
+
     return line_polys
 
 
@@ -354,7 +421,9 @@ def ngon_tessellate(from_data, indices, fix_loops=True):
         return v, vector_to_tuple(v, 6), i, mlen(v)
 
     def ed_key_mlen(v1, v2):
-        if v1[3] > v2[3]:
+        # locations with the same length are ordered too,
+        # so an edge has the same key in both directions
+        if v1[3] > v2[3] or (v1[3] == v2[3] and v1[1] > v2[1]):
             return v2[1], v1[1]
         else:
             return v1[1], v2[1]
@@ -486,9 +555,17 @@ def ngon_tessellate(from_data, indices, fix_loops=True):
         # map to original indices
         fill = [[vert_map[i] for i in reversed(f)] for f in fill]
 
+    return _ngon_fill_orient(fill, len(indices))
+
+
+def _ngon_fill_orient(fill, totvert):
+    """
+    Flips the triangles of a fill to the winding of the polyline,
+    a triangle fan is used when the fill is empty.
+    """
     if not fill:
         print('Warning Cannot scanfill, fallback on a triangle fan.')
-        fill = [[0, i - 1, i] for i in range(2, len(indices))]
+        fill = [[0, i - 1, i] for i in range(2, totvert)]
     else:
         # Use real scanfill.
         # See if its flipped the wrong way.
@@ -511,6 +588,152 @@ def ngon_tessellate(from_data, indices, fix_loops=True):
     return fill
 
 
+def _ngon_loops_split(verts):
+    """
+    Splits a polyline of (location key, index) pairs into closed loops,
+    at edges used twice, joining the segments through a hash of their
+    first location.
+    """
+    # edges used twice (location based)
+    edges_used = set()
+    edges_doubles = set()
+    key_prev = verts[-1][0]
+    for key, i in verts:
+        edkey = (key, key_prev) if key < key_prev else (key_prev, key)
+        if edkey in edges_used:
+            edges_doubles.add(edkey)
+        else:
+            edges_used.add(edkey)
+        key_prev = key
+
+    # loop segments split by double edges, without repeated locations
+    context_loop = [verts[0]]
+    loop_segments = [context_loop]
+    key_prev = verts[0][0]
+    for vert in verts[1:]:
+        key = vert[0]
+        edkey = (key, key_prev) if key < key_prev else (key_prev, key)
+        if edkey in edges_doubles:
+            context_loop = [vert]
+            loop_segments.append(context_loop)
+        elif context_loop[-1][0] != key:
+            context_loop.append(vert)
+        key_prev = key
+
+    if not edges_doubles:
+        loop_list = loop_segments
+    else:
+        # join each segment to the segments starting where it ends
+        seg_starts = {}
+        for j in range(len(loop_segments) - 1, -1, -1):
+            seg_starts.setdefault(loop_segments[j][0][0], []).append(j)
+
+        seg_used = [False] * len(loop_segments)
+        loop_list = []
+        for j, seg in enumerate(loop_segments):
+            if seg_used[j]:
+                continue
+            seg_used[j] = True
+            loop = seg[:]
+            while loop[0][0] != loop[-1][0]:
+                seg_next = seg_starts.get(loop[-1][0])
+                while seg_next and seg_used[seg_next[-1]]:
+                    seg_next.pop()
+                if not seg_next:
+                    break
+                k = seg_next.pop()
+                seg_used[k] = True
+                loop.pop()
+                loop.extend(loop_segments[k])
+            loop_list.append(loop)
+
+    for loop in loop_list:
+        while loop and loop[0][0] == loop[-1][0]:
+            loop.pop()
+
+    return [loop for loop in loop_list if len(loop) > 2]
+
+
+def ngon_tessellate_batch(from_data, indices, polygon_totals, fix_loops=True):
+    """
+    Tessellates many polylines of indices (fgons) at once, for importers
+    that create faces from existing verts.
+
+    :arg from_data: either a mesh, or a list/tuple of vectors.
+    :type from_data: list or :class:`bpy.types.Mesh`
+    :arg indices: the ordered closed polylines to fill,
+       all polylines one after the other.
+    :type indices: sequence of ints
+    :arg polygon_totals: the number of indices of each polyline.
+    :type polygon_totals: sequence of ints
+    :arg fix_loops: If this is enabled polylines
+       that use loops to make multiple
+       polylines are delt with correctly,
+       only polylines using an edge twice are split.
+    :type fix_loops: bool
+    :return: the triangles, 3 positions in *indices* for each triangle,
+       and the number of triangles of each polyline.
+    :rtype: pair of :class:`array.array` of ints
+    """
+    import array
+    from mathutils.geometry import tessellate_polygon
+
+    if type(from_data) in {tuple, list}:
+        vert_co = from_data
+    else:
+        vertices = from_data.vertices
+        vert_co_flat = array.array('f', [0.0]) * (len(vertices) * 3)
+        vertices.foreach_get("co", vert_co_flat)
+        vert_co = tuple(zip(*([iter(vert_co_flat)] * 3)))
+
+    tris = array.array('i')
+    tri_totals = array.array('i', [0]) * len(polygon_totals)
+    tris_extend = tris.extend
+
+    start = 0
+    for poly_index, total in enumerate(polygon_totals):
+        end = start + total
+
+        if total == 3:
+            tris_extend((start, start + 1, start + 2))
+            tri_totals[poly_index] = 1
+            start = end
+            continue
+        elif total < 3:
+            start = end
+            continue
+
+        # location keys, as used by ngon_tessellate
+        verts = [(tuple([round(c, 6) for c in vert_co[i]]), ii)
+                 for ii, i in enumerate(indices[start:end])]
+
+        if fix_loops:
+            loop_list = _ngon_loops_split(verts)
+        else:
+            # only remove repeated locations
+            verts_prev = verts[-1:] + verts[:-1]
+            loop_list = [[vert for vert, vert_prev in zip(verts, verts_prev)
+                          if vert[0] != vert_prev[0]]]
+
+        if loop_list and len(loop_list[0]) > 2:
+            # vert mapping
+            vert_map = [ii for loop in loop_list for key, ii in loop]
+            fill = tessellate_polygon([[vert_co[indices[start + ii]]
+                                        for key, ii in loop]
+                                       for loop in loop_list])
+            fill = [[vert_map[i] for i in reversed(f)] for f in fill]
+        else:
+            fill = []
+
+        fill = _ngon_fill_orient(fill, total)
+        for f in fill:
+            tris_extend((start + f[0], start + f[1], start + f[2]))
+        tri_totals[poly_index] = len(fill)
+        start = end
+
+    return tris, tri_totals
+
+
 def face_random_points(num_points, tessfaces):
     """
     Generates a list of random points over mesh tessfaces.
@@ -546,16 +769,16 @@ def face_random_points(num_points, tessfaces):
     # For each face, generate the required number of random points
     sampled_points = [None] * (num_points * len(tessfaces))
     for i, tf in enumerate(tri_faces):
-        for k in range(num_points):
-            # If this is a quad, we need to weight its 2 tris by their area
-            if len(tf) != 1:
-                area1 = area_tri(*tf[0])
-                area2 = area_tri(*tf[1])
-                area_tot = area1 + area2
+        # If this is a quad, we need to weight its 2 tris by their area
+        if len(tf) != 1:
+            area1 = area_tri(*tf[0])
+            area2 = area_tri(*tf[1])
+            area_tot = area1 + area2
 
-                area1 = area1 / area_tot
-                area2 = area2 / area_tot
+            area1 = area1 / area_tot if area_tot else 0.5
 
+        for k in range(num_points):
+            if len(tf) != 1:
                 vecs = tf[0 if (random() < area1) else 1]
             else:
                 vecs = tf[0]
@@ -576,3 +799,154 @@ def face_random_points(num_points, tessfaces):
             sampled_points[num_points * i + k] = p
 
     return sampled_points
+
+
+# number of points sampled with the same random generator, the points
+# don't depend on the number of processes used by mesh_random_points
+_RANDOM_POINTS_CHUNK = 1 << 16
+
+
+def _random_points_sample(state, seed, num_points):
+    from random import Random
+    from bisect import bisect_right
+    import array
+
+    vert_co, tri_verts, tri_area_accum = state
+    area_tot = tri_area_accum[-1]
+    tri_last = len(tri_area_accum) - 1
+    random = Random(seed).random
+
+    sampled_points = array.array('f')
+    extend = sampled_points.extend
+    for k in range(num_points):
+        # area weighted triangle selection
+        i = min(bisect_right(tri_area_accum, random() * area_tot), tri_last)
+        i0 = tri_verts[i * 3] * 3
+        i1 = tri_verts[i * 3 + 1] * 3
+        i2 = tri_verts[i * 3 + 2] * 3
+
+        u1 = random()
+        u2 = random()
+        if u1 + u2 > 1.0:
+            u1 = 1.0 - u1
+            u2 = 1.0 - u2
+
+        x, y, z = vert_co[i0], vert_co[i0 + 1], vert_co[i0 + 2]
+        extend((x + u1 * (vert_co[i1] - x) + u2 * (vert_co[i2] - x),
+                y + u1 * (vert_co[i1 + 1] - y) + u2 * (vert_co[i2 + 1] - y),
+                z + u1 * (vert_co[i1 + 2] - z) + u2 * (vert_co[i2 + 2] - z),
+                ))
+
+    return sampled_points
+
+
+# state of the worker processes of mesh_random_points
+_random_points_pool_state = None
+
+
+def _random_points_pool_init(state):
+    global _random_points_pool_state
+    _random_points_pool_state = state
+
+
+def _random_points_pool_sample(args):
+    return _random_points_sample(_random_points_pool_state, *args)
+
+
+def mesh_random_points(mesh, num_points, seed=0, processes=1):
+    """
+    Generates random points distributed evenly over the surface of a mesh,
+    faces are chosen in proportion to their area.
+
+    :arg mesh: the mesh to generate points on, its tessellation is
+       calculated when the mesh has no tessfaces.
+    :type mesh: :class:`bpy.types.Mesh`
+    :arg num_points: the total number of random points to generate.
+    :type num_points: int
+    :arg seed: seed of the random generator,
+       the same seed gives the same points.
+    :type seed: int
+    :arg processes: number of processes to generate the points with,
+       used when processes can be forked (not on MS-Windows),
+       the points don't depend on the number of processes.
+    :type processes: int
+    :return: flat sequence of the x, y, z coordinates of the points,
+       empty when the mesh has no area.
+    :rtype: :class:`array.array` of floats
+    """
+    import array
+    from random import Random
+    from itertools import accumulate
+
+    if len(mesh.tessfaces) == 0 and len(mesh.polygons) != 0:
+        mesh.calc_tessface()
+
+    vertices = mesh.vertices
+    vert_co = array.array('f', [0.0]) * (len(vertices) * 3)
+    vertices.foreach_get("co", vert_co)
+
+    tessfaces = mesh.tessfaces
+    face_verts = array.array('i', [0]) * (len(tessfaces) * 4)
+    tessfaces.foreach_get("vertices_raw", face_verts)
+
+    # split all quads into 2 tris, the 4th index is 0 for tris
+    tri_verts = array.array('i')
+    for i in range(0, len(face_verts), 4):
+        tri_verts.extend(face_verts[i:i + 3])
+        if face_verts[i + 3] != 0:
+            tri_verts.extend((face_verts[i],
+                              face_verts[i + 2],
+                              face_verts[i + 3]))
+
+    # twice the area of each tri, from the cross product of its sides
+    tri_area = array.array('d', [0.0]) * (len(tri_verts) // 3)
+    for i in range(len(tri_area)):
+        i0 = tri_verts[i * 3] * 3
+        i1 = tri_verts[i * 3 + 1] * 3
+        i2 = tri_verts[i * 3 + 2] * 3
+        x0, y0, z0 = vert_co[i0:i0 + 3]
+        ax, ay, az = (vert_co[i1] - x0,
+                      vert_co[i1 + 1] - y0,
+                      vert_co[i1 + 2] - z0)
+        bx, by, bz = (vert_co[i2] - x0,
+                      vert_co[i2 + 1] - y0,
+                      vert_co[i2 + 2] - z0)
+        cx, cy, cz = ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx
+        tri_area[i] = (cx * cx + cy * cy + cz * cz) ** 0.5
+
+    tri_area_accum = array.array('d', accumulate(tri_area))
+    if not tri_area_accum or tri_area_accum[-1] <= 0.0:
+        return array.array('f')
+
+    # each chunk of points has its own seed
+    random_seed = Random(seed).getrandbits
+    chunks = [(random_seed(32), min(_RANDOM_POINTS_CHUNK, num_points - i))
+              for i in range(0, num_points, _RANDOM_POINTS_CHUNK)]
+
+    state = vert_co, tri_verts, tri_area_accum
+    chunk_points = None
+    if processes > 1 and len(chunks) > 1:
+        import multiprocessing
+        try:
+            mp_context = multiprocessing.get_context("fork")
+        except ValueError:
+            # spawned processes can't import this module without blender
+            mp_context = None
+
+        if mp_context is not None:
+            pool = mp_context.Pool(min(processes, len(chunks)),
+                                   _random_points_pool_init, (state,))
+            try:
+                chunk_points = pool.map(_random_points_pool_sample, chunks)
+            finally:
+                pool.close()
+                pool.join()
+
+    if chunk_points is None:
+        chunk_points = [_random_points_sample(state, *chunk)
+                        for chunk in chunks]
+
+    sampled_points = array.array('f')
+    for points in chunk_points:
+        sampled_points.extend(points)
+    return sampled_points
@@ -0,0 +1,381 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8-80 compliant>
+
+__all__ = (
+    "pack_boxes",
+    "pack_uv_islands",
+    "uv_island_bounds",
+    )
+
+# rounding error allowed when fitting boxes into the skyline
+_SKYLINE_EPS = 1e-9
+
+# the 'AUTO' method packs more boxes with box_pack_2d,
+# the skyline is slow past this (its time grows faster than the boxes)
+_SKYLINE_MAX_BOXES = 2000
+
+
+def _skyline_best(skyline, width, height, rot, bin_width, best):
+    """
+    Returns the placement of a box with the lowest top (then leftmost)
+    as (top, x, y, index, width, rot), best when none is lower.
+
+    A box placed at a segment rests on the highest segment under it,
+    this is found for all segments in one walk over the skyline,
+    keeping the segments under the box in a deque of decreasing heights.
+    """
+    from collections import deque
+
+    tot_segment = len(skyline)
+    x_max = bin_width * (1.0 + _SKYLINE_EPS) - width
+    width_min = width * (1.0 - _SKYLINE_EPS)
+
+    # segments from index to end (excluded), by decreasing height
+    under = deque()
+    end = 0
+    for index in range(tot_segment):
+        x, y, seg_width = skyline[index]
+        if x > x_max:
+            break
+
+        while end < tot_segment and (
+                end == index or
+                skyline[end - 1][0] + skyline[end - 1][2] - x < width_min):
+            seg_y = skyline[end][1]
+            while under and skyline[under[-1]][1] <= seg_y:
+                under.pop()
+            under.append(end)
+            end += 1
+
+        if skyline[end - 1][0] + skyline[end - 1][2] - x < width_min:
+            # past the end of the skyline
+            break
+
+        top = skyline[under[0]][1] + height
+        if (best is None or top < best[0] or
+                (top == best[0] and x < best[1])):
+            best = top, x, top - height, index, width, rot
+
+        if under[0] == index:
+            under.popleft()
+
+    return best
+
+
+def _skyline_add(skyline, index, width, top):
+    """
+    Raises the skyline to top over width, from the segment index.
+    """
+    if width <= 0.0:
+        return
+    x = skyline[index][0]
+    end = x + width
+    skyline.insert(index, [x, top, width])
+
+    # shrink or remove the segments under the box
+    i = index + 1
+    while i < len(skyline):
+        seg = skyline[i]
+        if seg[0] >= end:
+            break
+        shrink = end - seg[0]
+        if seg[2] <= shrink:
+            del skyline[i]
+        else:
+            seg[0] += shrink
+            seg[2] -= shrink
+            break
+
+    # join with neighbors of the same height
+    if i < len(skyline) and skyline[i][1] == top:
+        skyline[index][2] += skyline[i][2]
+        del skyline[i]
+    if index and skyline[index - 1][1] == top:
+        skyline[index - 1][2] += skyline[index][2]
+        del skyline[index]
+
+
+def _skyline_pack(widths, heights, order, bin_width, use_rotate):
+    """
+    Packs the boxes in order into a bin of bin_width (and any height),
+    each box goes where its top is lowest (then leftmost).
+    """
+    tot = len(widths)
+    xs = [0.0] * tot
+    ys = [0.0] * tot
+    rotated = [False] * tot
+    pack_width = pack_height = 0.0
+
+    skyline = [[0.0, 0.0, bin_width]]
+
+    for i in order:
+        w = widths[i]
+        h = heights[i]
+        if use_rotate and w != h:
+            orientations = (w, h, False), (h, w, True)
+        else:
+            orientations = (w, h, False),
+
+        best = None
+        for w_test, h_test, rot in orientations:
+            best = _skyline_best(skyline, w_test, h_test, rot, bin_width,
+                                 best)
+
+        if best is None:
+            # wider than the bin, on top of everything
+            w_test, h_test, rot = min(orientations)
+            y = max(seg[1] for seg in skyline)
+            skyline[:] = [[0.0, y + h_test, max(bin_width, w_test)]]
+            best = y + h_test, 0.0, y, 0, w_test, rot
+        else:
+            _skyline_add(skyline, best[3], best[4], best[0])
+
+        top, x, y, j, w_test, rot = best
+        xs[i] = x
+        ys[i] = y
+        rotated[i] = rot
+        if x + w_test > pack_width:
+            pack_width = x + w_test
+        if top > pack_height:
+            pack_height = top
+
+    return xs, ys, rotated, pack_width, pack_height
+
+
+def _pack_boxes_skyline(widths, heights, use_rotate, use_stretch, passes):
+    from math import sqrt
+
+    tot = len(widths)
+    # largest first, they're hard to fit in later
+    order = sorted(range(tot),
+                   key=lambda i: (-max(widths[i], heights[i]),
+                                  -(widths[i] * heights[i])))
+
+    if use_rotate:
+        min_width = max(min(w, h) for w, h in zip(widths, heights))
+    else:
+        min_width = max(widths)
+    side = sqrt(sum(w * h for w, h in zip(widths, heights)))
+
+    # try bins around the square of the total area, keep the best.
+    bin_widths = []
+    for p in range(max(1, passes)):
+        bin_width = max(min_width, side * (1.0 + 0.1 * p))
+        if bin_width not in bin_widths:
+            bin_widths.append(bin_width)
+
+    best = None
+    for bin_width in bin_widths:
+        packed = _skyline_pack(widths, heights, order, bin_width, use_rotate)
+        pack_width, pack_height = packed[3], packed[4]
+        if use_stretch:
+            score = pack_width * pack_height
+        else:
+            score = max(pack_width, pack_height)
+        if best is None or score < best[0]:
+            best = score, packed
+    return best[1]
+
+
+def _pack_boxes_box_pack_2d(widths, heights):
+    from mathutils.geometry import box_pack_2d
+
+    boxes = [[0.0, 0.0, w, h] for w, h in zip(widths, heights)]
+    pack_width, pack_height = box_pack_2d(boxes)
+    return ([box[0] for box in boxes],
+            [box[1] for box in boxes],
+            [False] * len(boxes),
+            pack_width,
+            pack_height)
+
+
+def pack_boxes(widths,
+               heights,
+               margin=0.0,
+               image_size=0,
+               use_rotate=False,
+               use_stretch=True,
+               method='AUTO',
+               passes=2,
+               ):
+    """
+    Packs boxes (usually the bounds of UV islands) into a rectangle.
+
+    :arg widths: Widths of the boxes.
+    :type widths: sequence of floats
+    :arg heights: Heights of the boxes.
+    :type heights: sequence of floats
+    :arg margin: Space to keep around each box, in the units of the boxes,
+       or in texels of a square image when image_size is given
+       (the space kept once the packing is scaled to the image).
+    :type margin: float
+    :arg image_size: Size of the image in texels, for a margin in texels.
+    :type image_size: int
+    :arg use_rotate: Allow rotating boxes by 90 degrees
+       (only with the 'SKYLINE' method).
+    :type use_rotate: bool
+    :arg use_stretch: The packing will be stretched to a square,
+       so the area of the packing is kept low, instead of its longest side.
+    :type use_stretch: bool
+    :arg method: 'SKYLINE' (tight, can rotate),
+       'BOX_PACK_2D' (:func:`mathutils.geometry.box_pack_2d`, much faster
+       for many boxes) or 'AUTO' ('SKYLINE' for up to 2000 boxes).
+    :type method: string
+    :arg passes: Number of bin widths 'SKYLINE' tries,
+       more may pack tighter but are slower.
+    :type passes: int
+    :return: (xs, ys, rotated, width, height), the positions of the boxes
+       (inside the margin), if each box is rotated by 90 degrees
+       (counter-clockwise) and the size of the packing (with margins).
+    :rtype: tuple
+    """
+    if not widths:
+        return [], [], [], 0.0, 0.0
+
+    if method == 'AUTO':
+        if len(widths) <= _SKYLINE_MAX_BOXES:
+            method = 'SKYLINE'
+        else:
+            method = 'BOX_PACK_2D'
+
+    if method == 'SKYLINE':
+        def pack(widths, heights):
+            return _pack_boxes_skyline(widths, heights,
+                                       use_rotate, use_stretch, passes)
+    elif method == 'BOX_PACK_2D':
+        pack = _pack_boxes_box_pack_2d
+    else:
+        raise ValueError("unknown pack method %r" % method)
+
+    if not margin:
+        return pack(widths, heights)
+
+    if image_size:
+        # The margin is scaled with the packing,
+        # start from the size of a perfect packing and grow it until
+        # the margin is at least margin texels once scaled
+        # (with some slack so this doesn't only get close to it).
+        from math import sqrt
+        margin_fac = margin / image_size
+        pack_side = sqrt(sum(w * h for w, h in zip(widths, heights)))
+        for i in range(8):
+            pad = margin_fac * pack_side * 1.05
+            packed = pack([w + pad * 2.0 for w in widths],
+                          [h + pad * 2.0 for h in heights])
+            pack_side = max(packed[3], packed[4])
+            if pack_side * margin_fac <= pad:
+                break
+    else:
+        pad = margin
+        packed = pack([w + pad * 2.0 for w in widths],
+                      [h + pad * 2.0 for h in heights])
+
+    xs, ys, rotated, pack_width, pack_height = packed
+    return ([x + pad for x in xs],
+            [y + pad for y in ys],
+            rotated,
+            pack_width,
+            pack_height)
+
+
+def uv_island_bounds(uvs, island):
+    """
+    Returns the bounds of a UV island.
+
+    :arg uvs: UV coordinates, x and y of each UV.
+    :type uvs: flat float sequence
+    :arg island: Offsets of the x of each UV of the island in uvs.
+    :type island: sequence of ints
+    :return: (min x, min y, max x, max y)
+    :rtype: tuple
+    """
+    island_xs = [uvs[i] for i in island]
+    island_ys = [uvs[i + 1] for i in island]
+    return min(island_xs), min(island_ys), max(island_xs), max(island_ys)
+
+
+def pack_uv_islands(uvs,
+                    islands,
+                    margin=0.0,
+                    image_size=0,
+                    use_rotate=False,
+                    use_stretch=True,
+                    method='AUTO',
+                    passes=2,
+                    ):
+    """
+    Packs UV islands into the UV bounds (0-1), the UVs are moved in place.
+
+    :arg uvs: UV coordinates, x and y of each UV.
+    :type uvs: flat float array
+    :arg islands: The offsets of the x of each UV of an island in uvs.
+    :type islands: sequence of int sequences
+    :arg use_stretch: Stretch the packing to the UV bounds,
+       otherwise the proportions are kept.
+    :type use_stretch: bool
+
+    See :func:`pack_boxes` for the other arguments.
+
+    :return: (width, height) of the packing, before it was scaled to the UV
+       bounds.
+    :rtype: tuple
+    """
+    bounds = [uv_island_bounds(uvs, island) for island in islands]
+    widths = [maxx - minx for minx, miny, maxx, maxy in bounds]
+    heights = [maxy - miny for minx, miny, maxx, maxy in bounds]
+
+    xs, ys, rotated, pack_width, pack_height = pack_boxes(
+        widths, heights,
+        margin=margin,
+        image_size=image_size,
+        use_rotate=use_rotate,
+        use_stretch=use_stretch,
+        method=method,
+        passes=passes,
+        )
+    if not islands:
+        return pack_width, pack_height
+
+    # Having these here avoids divide by 0
+    if use_stretch:
+        xfac = 1.0 / (pack_width or 1.0)
+        yfac = 1.0 / (pack_height or 1.0)
+    else:
+        xfac = yfac = 1.0 / (max(pack_width, pack_height) or 1.0)
+
+    for island, (minx, miny, maxx, maxy), x, y, rot in zip(
+            islands, bounds, xs, ys, rotated):
+        island_xs = [uvs[i] for i in island]
+        island_ys = [uvs[i + 1] for i in island]
+        if rot:
+            # 90d counter-clockwise, the top left corner is the bottom left
+            island_xs, island_ys = (
+                [(x + maxy - uv_y) * xfac for uv_y in island_ys],
+                [(y - minx + uv_x) * yfac for uv_x in island_xs],
+                )
+        else:
+            island_xs = [(x - minx + uv_x) * xfac for uv_x in island_xs]
+            island_ys = [(y - miny + uv_y) * yfac for uv_y in island_ys]
+
+        for i, uv_x, uv_y in zip(island, island_xs, island_ys):
+            uvs[i] = uv_x
+            uvs[i + 1] = uv_y
+
+    return pack_width, pack_height
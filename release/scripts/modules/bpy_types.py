@@ -378,6 +378,35 @@ def ord_ind(i1, i2):
     return i2, i1
 
 
+def _mesh_edge_keys(mesh):
+    import array
+
+    edges = mesh.edges
+    edge_verts = array.array('i', [0]) * (len(edges) * 2)
+    edges.foreach_get("vertices", edge_verts)
+    return list(map(ord_ind, edge_verts[0::2], edge_verts[1::2]))
+
+
+def _mesh_polygon_edge_keys(mesh):
+    import array
+
+    edge_keys = _mesh_edge_keys(mesh)
+
+    loops = mesh.loops
+    loop_edges = array.array('i', [0]) * len(loops)
+    loops.foreach_get("edge_index", loop_edges)
+
+    polygons = mesh.polygons
+    poly_starts = array.array('i', [0]) * len(polygons)
+    poly_totals = array.array('i', [0]) * len(polygons)
+    polygons.foreach_get("loop_start", poly_starts)
+    polygons.foreach_get("loop_total", poly_totals)
+
+    loop_edge_keys = tuple(map(edge_keys.__getitem__, loop_edges))
+    return [loop_edge_keys[start:start + total]
+            for start, total in zip(poly_starts, poly_totals)]
+
+
 class Mesh(bpy_types.ID):
     __slots__ = ()
 
@@ -405,36 +434,126 @@ class Mesh(bpy_types.ID):
 
         :type faces: iterable object
         """
-        self.vertices.add(len(vertices))
-        self.edges.add(len(edges))
-        self.loops.add(sum((len(f) for f in faces)))
-        self.polygons.add(len(faces))
-
-        vertices_flat = [f for v in vertices for f in v]
-        self.vertices.foreach_set("co", vertices_flat)
-        del vertices_flat
-
-        edges_flat = [i for e in edges for i in e]
-        self.edges.foreach_set("vertices", edges_flat)
-        del edges_flat
-
-        # this is different in bmesh
-        loop_index = 0
-        for i, p in enumerate(self.polygons):
-            f = faces[i]
-            loop_len = len(f)
-            p.loop_start = loop_index
-            p.loop_total = loop_len
-            p.vertices = f
-            loop_index += loop_len
+        from itertools import chain
+
+        self.from_pydata_flat(
+            tuple(chain.from_iterable(vertices)),
+            tuple(chain.from_iterable(faces)),
+            tuple(map(len, faces)),
+            edges=tuple(chain.from_iterable(edges)),
+            )
+
+    def from_pydata_flat(self, vertices, loops, polygon_totals,
+                         polygon_starts=None, edges=()):
+        """
+        Make a mesh from flat sequences of vertex coordinates,
+        loop vertex indices and polygon sizes.
+        Any sequence or buffer object (such as :class:`array.array`)
+        can be used, buffers are written directly when their item type
+        matches (float for the coordinates, int for the indices).
+
+        :arg vertices:
+
+           vertex coordinates, 3 floats for each vertex
+           eg: [0.0, 1.0, 0.5, ...].
+
+        :type vertices: sequence or buffer
+        :arg loops:
+
+           vertex index of each face corner,
+           the corners of each face are consecutive.
+
+        :type loops: sequence or buffer
+        :arg polygon_totals: number of loops of each face.
+        :type polygon_totals: sequence or buffer
+        :arg polygon_starts:
+
+           index of the first loop of each face,
+           when None the faces use the loops in order.
+
+        :type polygon_starts: sequence or buffer
+        :arg edges:
+
+           vertex indices of the edges, 2 ints for each edge,
+           calculated from the faces when empty.
+
+        :type edges: sequence or buffer
+        """
+        from itertools import accumulate
+        from operator import add
+
+        def flat(seq):
+            # buffers are iterated as numbers, not as bytes
+            try:
+                buf = memoryview(seq)
+                return buf.cast("B").cast(buf.format)
+            except (TypeError, ValueError):
+                return seq
+
+        vertices, loops, polygon_totals, edges = (
+            flat(vertices), flat(loops), flat(polygon_totals), flat(edges))
+
+        # validate everything before changing the mesh
+        if len(vertices) % 3 != 0:
+            raise ValueError("vertices length %d is not a multiple of 3" %
+                             len(vertices))
+        if len(edges) % 2 != 0:
+            raise ValueError("edges length %d is not a multiple of 2" %
+                             len(edges))
+
+        totvert = len(vertices) // 3
+        totloop = len(loops)
+        for name, indices in (("loops", loops), ("edges", edges)):
+            if len(indices) and (min(indices) < 0 or max(indices) >= totvert):
+                raise ValueError("%s vertex index out of range" % name)
+        if len(polygon_totals) and min(polygon_totals) < 0:
+            raise ValueError("polygon_totals can't be negative")
+
+        if polygon_starts is None:
+            polygon_starts = tuple(accumulate(polygon_totals, add))
+            if polygon_starts and polygon_starts[-1] != totloop:
+                raise ValueError("polygon_totals sum %d != %d loops" %
+                                 (polygon_starts[-1], totloop))
+            polygon_starts = (0,) + polygon_starts[:-1]
+        else:
+            polygon_starts = flat(polygon_starts)
+            if len(polygon_starts) != len(polygon_totals):
+                raise ValueError("polygon_starts and polygon_totals "
+                                 "lengths differ")
+            if len(polygon_starts) and (
+                    min(polygon_starts) < 0 or
+                    max(map(add, polygon_starts, polygon_totals)) > totloop):
+                raise ValueError("polygon_starts index out of range")
+
+        self.vertices.add(totvert)
+        self.edges.add(len(edges) // 2)
+        self.loops.add(totloop)
+        self.polygons.add(len(polygon_totals))
+
+        self.vertices.foreach_set("co", vertices)
+        self.edges.foreach_set("vertices", edges)
+        self.loops.foreach_set("vertex_index", loops)
+        self.polygons.foreach_set("loop_start", polygon_starts)
+        self.polygons.foreach_set("loop_total", polygon_totals)
 
         # if no edges - calculate them
-        if faces and (not edges):
+        if len(polygon_totals) and not len(edges):
             self.update(calc_edges=True)
 
     @property
     def edge_keys(self):
-        return [ed.key for ed in self.edges]
+        """
+        Edge keys (sorted vertex index pairs) of all edges.
+        """
+        return _mesh_edge_keys(self)
+
+    @property
+    def polygon_edge_keys(self):
+        """
+        Edge keys of the loops of each polygon,
+        looked up from the loop edge indices.
+        """
+        return _mesh_polygon_edge_keys(self)
 
 
 class MeshEdge(StructRNA):
@@ -24,6 +24,74 @@ from bpy.types import Operator
 from bpy.props import EnumProperty, IntProperty
 
 
+def mirror_vertex_map(vcos, tolerance):
+    """
+    Matches the vertices mirrored on the X axis, vertices are matched when
+    the distance to the mirrored location is below tolerance on each axis.
+
+    :arg vcos: flat vertex coordinates, 3 floats for each vertex.
+    :type vcos: sequence of floats
+    :arg tolerance: maximum distance on each axis.
+    :type tolerance: float
+    :return: the index of the mirror vertex of each vertex (-1 for none),
+       and the number of vertices with more than one mirror candidate.
+    :rtype: pair of list and int
+    """
+    from math import floor
+
+    # a spatial hash with cells of twice the tolerance, a location only
+    # needs the 2 closest cells on each axis (8 cells in total)
+    scale = 0.5 / tolerance
+    grid = {}
+    for i in range(len(vcos) // 3):
+        key = (floor(vcos[i * 3] * scale),
+               floor(vcos[i * 3 + 1] * scale),
+               floor(vcos[i * 3 + 2] * scale))
+        grid.setdefault(key, []).append(i)
+
+    def cells(c):
+        c *= scale
+        k = floor(c)
+        return (k, k - 1) if c - k < 0.5 else (k, k + 1)
+
+    vmap = [-1] * (len(vcos) // 3)
+    double_warn = 0
+    for i in range(len(vmap)):
+        x, y, z = -vcos[i * 3], vcos[i * 3 + 1], vcos[i * 3 + 2]
+        # the mirror is on the other side of the X axis
+        if x > tolerance:
+            x_min, x_max = 0.0, x + tolerance
+        elif x < -tolerance:
+            x_min, x_max = x - tolerance, 0.0
+        else:
+            x_min, x_max = -tolerance, tolerance
+
+        j_best = -1
+        d_best = 0.0
+        found = 0
+        for kx in cells(x):
+            for ky in cells(y):
+                for kz in cells(z):
+                    for j in grid.get((kx, ky, kz), ()):
+                        xj = vcos[j * 3]
+                        if not (x_min <= xj <= x_max):
+                            continue
+                        dx = abs(xj - x)
+                        dy = abs(vcos[j * 3 + 1] - y)
+                        dz = abs(vcos[j * 3 + 2] - z)
+                        if dx > tolerance or dy > tolerance or dz > tolerance:
+                            continue
+                        found += 1
+                        d = dx * dx + dy * dy + dz * dz
+                        if j_best == -1 or d < d_best:
+                            j_best = j
+                            d_best = d
+        vmap[i] = j_best
+        double_warn += found > 1
+
+    return vmap, double_warn
+
+
 class MeshMirrorUV(Operator):
     """Copy mirror UV coordinates on the X axis based on a mirrored mesh"""
     bl_idname = "mesh.faces_mirror_uv"
@@ -50,9 +118,10 @@ class MeshMirrorUV(Operator):
         return (obj and obj.type == 'MESH' and obj.data.uv_textures.active)
 
     def execute(self, context):
+        import array
+
         DIR = (self.direction == 'NEGATIVE')
         precision = self.precision
-        double_warn = 0
 
         ob = context.active_object
         is_editmode = (ob.mode == 'EDIT')
@@ -62,82 +131,72 @@ class MeshMirrorUV(Operator):
         mesh = ob.data
 
         # mirror lookups
-        mirror_gt = {}
-        mirror_lt = {}
-
-        vcos = (v.co.to_tuple(precision) for v in mesh.vertices)
-
-        for i, co in enumerate(vcos):
-            if co[0] >= 0.0:
-                double_warn += co in mirror_gt
-                mirror_gt[co] = i
-            if co[0] <= 0.0:
-                double_warn += co in mirror_lt
-                mirror_lt[co] = i
-
-        vmap = {}
-        for mirror_a, mirror_b in ((mirror_gt, mirror_lt),
-                                   (mirror_lt, mirror_gt)):
-            for co, i in mirror_a.items():
-                nco = (-co[0], co[1], co[2])
-                j = mirror_b.get(nco)
-                if j is not None:
-                    vmap[i] = j
+        vcos = array.array('f', [0.0]) * (len(mesh.vertices) * 3)
+        mesh.vertices.foreach_get("co", vcos)
+        vmap, double_warn = mirror_vertex_map(vcos, 10.0 ** -precision)
 
         polys = mesh.polygons
         loops = mesh.loops
         uv_loops = mesh.uv_layers.active.data
         nbr_polys = len(polys)
 
+        loop_vidxs = array.array('i', [0]) * len(loops)
+        loops.foreach_get("vertex_index", loop_vidxs)
+        puvs = array.array('f', [0.0]) * (len(uv_loops) * 2)
+        uv_loops.foreach_get("uv", puvs)
+        puvs_cpy = puvs[:]
+        luvsel = [False] * len(uv_loops)
+        uv_loops.foreach_get("select", luvsel)
+
+        lstarts = array.array('i', [0]) * nbr_polys
+        ltotals = array.array('i', [0]) * nbr_polys
+        pcents = array.array('f', [0.0]) * (nbr_polys * 3)
+        polys.foreach_get("loop_start", lstarts)
+        polys.foreach_get("loop_total", ltotals)
+        polys.foreach_get("center", pcents)
+
         mirror_pm = {}
-        pmap = {}
-        puvs = [None] * nbr_polys
-        puvs_cpy = [None] * nbr_polys
-        puvsel = [None] * nbr_polys
-        pcents = [None] * nbr_polys
+        puvsel = [False] * nbr_polys
         vidxs = [None] * nbr_polys
-        for i, p in enumerate(polys):
-            lstart = lend = p.loop_start
-            lend += p.loop_total
-            puvs[i] = tuple(uv.uv for uv in uv_loops[lstart:lend])
-            puvs_cpy[i] = tuple(uv.copy() for uv in puvs[i])
-            puvsel[i] = (False not in
-                         (uv.select for uv in uv_loops[lstart:lend]))
+        for i, lstart in enumerate(lstarts):
+            lend = lstart + ltotals[i]
+            puvsel[i] = (False not in luvsel[lstart:lend])
             # Vert idx of the poly.
-            vidxs[i] = tuple(l.vertex_index for l in loops[lstart:lend])
-            pcents[i] = p.center
+            vidxs[i] = loop_vidxs[lstart:lend].tolist()
             # Preparing next step finding matching polys.
             mirror_pm[tuple(sorted(vidxs[i]))] = i
 
         for i in range(nbr_polys):
-            # Find matching mirror poly.
-            tvidxs = [vmap.get(j) for j in vidxs[i]]
-            if None not in tvidxs:
-                tvidxs.sort()
-                j = mirror_pm.get(tuple(tvidxs))
-                if j is not None:
-                    pmap[i] = j
-
-        for i, j in pmap.items():
-            if not puvsel[i] or not puvsel[j]:
+            if not puvsel[i]:
                 continue
-            elif DIR == 0 and pcents[i][0] < 0.0:
+            elif DIR == 0 and pcents[i * 3] < 0.0:
                 continue
-            elif DIR == 1 and pcents[i][0] > 0.0:
+            elif DIR == 1 and pcents[i * 3] > 0.0:
                 continue
 
-            # copy UVs
-            uv1 = puvs[i]
-            uv2 = puvs_cpy[j]
+            # Find matching mirror poly.
+            tvidxs = [vmap[k] for k in vidxs[i]]
+            if -1 in tvidxs:
+                continue
+            j = mirror_pm.get(tuple(sorted(tvidxs)))
+            if j is None or not puvsel[j]:
+                continue
 
-            # get the correct rotation
-            v1 = vidxs[j]
-            v2 = tuple(vmap[k] for k in vidxs[i])
+            # get the correct rotation,
+            # the loop of poly j using the mirror of each vertex of poly i
+            v1_rot = {v: k for k, v in enumerate(vidxs[j])}
+            if len(v1_rot) != len(tvidxs):
+                continue
 
-            if len(v1) == len(v2):
-                for k in range(len(v1)):
-                    k_map = v1.index(v2[k])
-                    uv1[k].xy = - (uv2[k_map].x - 0.5) + 0.5, uv2[k_map].y
+            # copy UVs
+            uv1 = lstarts[i] * 2
+            uv2 = lstarts[j] * 2
+            for k, v in enumerate(tvidxs):
+                k_map = uv2 + v1_rot[v] * 2
+                puvs[uv1 + k * 2] = 1.0 - puvs_cpy[k_map]
+                puvs[uv1 + k * 2 + 1] = puvs_cpy[k_map + 1]
+
+        uv_loops.foreach_set("uv", puvs)
 
         if is_editmode:
             bpy.ops.object.mode_set(mode='EDIT', toggle=False)
@@ -64,55 +64,48 @@ def GlobalBB_LQ(bb_world):
     return (Vector((left, front, up)), Vector((right, back, down)))
 
 
-def GlobalBB_HQ(obj):
-
-    matrix_world = obj.matrix_world.copy()
-
-    # Initialize the variables with the last vertex
-
-    me = obj.to_mesh(scene=bpy.context.scene, apply_modifiers=True, settings='PREVIEW')
-    verts = me.vertices
-
-    val = matrix_world * verts[-1].co
-
-    left, right, front, back, down, up = (val[0],
-                                          val[0],
-                                          val[1],
-                                          val[1],
-                                          val[2],
-                                          val[2],
-                                          )
+def _evaluated_co(obj, scene, evaluated_co_cache):
+    """
+    Returns the vertex coordinates of obj with modifiers applied as a flat
+    array, evaluated_co_cache is a dict only kept for one align operation
+    (bounds are used more than once per object).
+    """
+    import array
+
+    co = evaluated_co_cache.get(obj.as_pointer())
+    if co is not None:
+        return co
+
+    me = obj.to_mesh(scene=scene, apply_modifiers=True, settings='PREVIEW')
+    co = array.array('f', [0.0]) * (len(me.vertices) * 3)
+    me.vertices.foreach_get("co", co)
+    bpy.data.meshes.remove(me)
 
-    # Test against all other verts
-    for i in range(len(verts) - 1):
+    evaluated_co_cache[obj.as_pointer()] = co
+    return co
 
-        vco = matrix_world * verts[i].co
 
-        # X Range
-        val = vco[0]
-        if val < left:
-            left = val
-
-        if val > right:
-            right = val
+def GlobalBB_HQ(obj, evaluated_co_cache=None):
 
-        # Y Range
-        val = vco[1]
-        if val < front:
-            front = val
+    matrix_world = obj.matrix_world.copy()
 
-        if val > back:
-            back = val
+    if evaluated_co_cache is None:
+        evaluated_co_cache = {}
+    co = _evaluated_co(obj, bpy.context.scene, evaluated_co_cache)
+    if not co:
+        return GlobalBB_LQ([matrix_world * Vector(v[:])
+                            for v in obj.bound_box])
 
-        # Z Range
-        val = vco[2]
-        if val < down:
-            down = val
+    xs, ys, zs = co[0::3], co[1::3], co[2::3]
 
-        if val > up:
-            up = val
+    # min & max of each world axis, transforming all verts one axis at a time
+    bounds = []
+    for i in range(3):
+        m0, m1, m2, m3 = matrix_world[i]
+        val = [m0 * x + m1 * y + m2 * z for x, y, z in zip(xs, ys, zs)]
+        bounds.append((min(val) + m3, max(val) + m3))
 
-    bpy.data.meshes.remove(me)
+    (left, right), (front, back), (down, up) = bounds
 
     return Vector((left, front, up)), Vector((right, back, down))
 
@@ -134,6 +127,9 @@ def align_objects(context,
 
     objects = []
 
+    # evaluated meshes of the objects, for the bounds of both passes
+    evaluated_co_cache = {}
+
     for obj in context.selected_objects:
         matrix_world = obj.matrix_world.copy()
         bb_world = [matrix_world * Vector(v[:]) for v in obj.bound_box]
@@ -145,7 +141,7 @@ def align_objects(context,
     for obj, bb_world in objects:
 
         if bb_quality and obj.type == 'MESH':
-            GBB = GlobalBB_HQ(obj)
+            GBB = GlobalBB_HQ(obj, evaluated_co_cache)
         else:
             GBB = GlobalBB_LQ(bb_world)
 
@@ -209,7 +205,7 @@ def align_objects(context,
         bb_world = [matrix_world * Vector(v[:]) for v in obj.bound_box]
 
         if bb_quality and obj.type == 'MESH':
-            GBB = GlobalBB_HQ(obj)
+            GBB = GlobalBB_HQ(obj, evaluated_co_cache)
         else:
             GBB = GlobalBB_LQ(bb_world)
 
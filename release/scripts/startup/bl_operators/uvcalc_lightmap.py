@@ -21,6 +21,7 @@
 import bpy
 from bpy.types import Operator
 import mathutils
+from array import array
 
 
 class prettyface:
@@ -33,9 +34,12 @@ class prettyface:
         "yoff",
         "has_parent",
         "rot",
+        "uv_data",
         )
 
-    def __init__(self, data):
+    def __init__(self, data, uv_arrays=None):
+        # uv_arrays are the UVs of each mesh (x, y of each loop),
+        # uv_data the arrays the faces of this box are written to.
         self.has_parent = False
         self.rot = False  # only used for triangles
         self.xoff = 0
@@ -71,6 +75,7 @@ class prettyface:
                 pf.has_parent = True
 
             self.children = data
+            self.uv_data = None
 
         elif type(data) == tuple:
             # 2 blender faces
@@ -82,15 +87,18 @@ class prettyface:
                 f2, lens2, lens2ord = data[1]
                 self.width = (lens1[lens1ord[0]] + lens2[lens2ord[0]]) / 2.0
                 self.height = (lens1[lens1ord[1]] + lens2[lens2ord[1]]) / 2.0
+                self.uv_data = uv_arrays[f1.id_data], uv_arrays[f2.id_data]
             else:  # 1 tri :/
                 self.width = lens1[0]
                 self.height = lens1[1]
+                self.uv_data = uv_arrays[f1.id_data], None
 
             self.children = []
 
         else:  # blender face
-            uv_layer = data.id_data.uv_layers.active.data
-            self.uv = [uv_layer[i].uv for i in data.loop_indices]
+            # offsets of the UVs in uv_data
+            self.uv_data = uv_arrays[data.id_data]
+            self.uv = [i * 2 for i in data.loop_indices]
 
             # cos = [v.co for v in data]
             cos = [data.id_data.vertices[v].co for v in data.vertices]  # XXX25
@@ -129,9 +137,10 @@ class prettyface:
 
                 # ngons work different, we store projected result
                 # in UV's to avoid having to re-project later.
-                for i, co in enumerate(cos_2d):
-                    self.uv[i][:] = ((co.x - xmin) / xspan,
-                                     (co.y - ymin) / yspan)
+                uv_data = self.uv_data
+                for i, co in zip(self.uv, cos_2d):
+                    uv_data[i] = (co.x - xmin) / xspan
+                    uv_data[i + 1] = (co.y - ymin) / yspan
 
             self.children = []
 
@@ -180,7 +189,7 @@ class prettyface:
 
                 return [(a1, 0), (a2, 1), (a3, 2)]
 
-            def set_uv(f, p1, p2, p3):
+            def set_uv(f, uv_data, p1, p2, p3):
 
                 # cos =
                 #v1 = cos[0]-cos[1]
@@ -193,46 +202,141 @@ class prettyface:
                 angles_co.sort()
                 I = [i for a, i in angles_co]
 
-                uv_layer = f.id_data.uv_layers.active.data
-                fuv = [uv_layer[i].uv for i in f.loop_indices]
+                fuv = [i * 2 for i in f.loop_indices]
 
                 if self.rot:
-                    fuv[I[2]][:] = p1
-                    fuv[I[1]][:] = p2
-                    fuv[I[0]][:] = p3
+                    uv_data[fuv[I[2]]:fuv[I[2]] + 2] = array('f', p1)
+                    uv_data[fuv[I[1]]:fuv[I[1]] + 2] = array('f', p2)
+                    uv_data[fuv[I[0]]:fuv[I[0]] + 2] = array('f', p3)
                 else:
-                    fuv[I[2]][:] = p1
-                    fuv[I[0]][:] = p2
-                    fuv[I[1]][:] = p3
+                    uv_data[fuv[I[2]]:fuv[I[2]] + 2] = array('f', p1)
+                    uv_data[fuv[I[0]]:fuv[I[0]] + 2] = array('f', p2)
+                    uv_data[fuv[I[1]]:fuv[I[1]] + 2] = array('f', p3)
 
             f, lens, lensord = uv[0]
 
-            set_uv(f, (x1, y1), (x1, y2 - margin_h), (x2 - margin_w, y1))
+            set_uv(f, self.uv_data[0], (x1, y1), (x1, y2 - margin_h), (x2 - margin_w, y1))
 
             if uv[1]:
                 f, lens, lensord = uv[1]
-                set_uv(f, (x2, y2), (x2, y1 + margin_h), (x1 + margin_w, y2))
+                set_uv(f, self.uv_data[1], (x2, y2), (x2, y1 + margin_h), (x1 + margin_w, y2))
 
         else:  # 1 QUAD
+            uv_data = self.uv_data
             if len(uv) == 4:
-                uv[1][:] = x1, y1
-                uv[2][:] = x1, y2
-                uv[3][:] = x2, y2
-                uv[0][:] = x2, y1
+                uv_data[uv[1]:uv[1] + 2] = array('f', (x1, y1))
+                uv_data[uv[2]:uv[2] + 2] = array('f', (x1, y2))
+                uv_data[uv[3]:uv[3] + 2] = array('f', (x2, y2))
+                uv_data[uv[0]:uv[0] + 2] = array('f', (x2, y1))
             else:
                 # NGon
                 xspan = x2 - x1
                 yspan = y2 - y1
-                for uvco in uv:
-                    x, y = uvco
-                    uvco[:] = ((x1 + (x * xspan)),
-                               (y1 + (y * yspan)))
+                for i in uv:
+                    x, y = uv_data[i:i + 2]
+                    uv_data[i:i + 2] = array('f', ((x1 + (x * xspan)),
+                                                   (y1 + (y * yspan))))
 
     def __hash__(self):
         # None unique hash
         return self.width, self.height
 
 
+def trilensdiff(t1, t2):
+    return (abs(t1[1][t1[2][0]] - t2[1][t2[2][0]]) +
+            abs(t1[1][t1[2][1]] - t2[1][t2[2][1]]) +
+            abs(t1[1][t1[2][2]] - t2[1][t2[2][2]]))
+
+
+def tri_pairs_exhaustive(tri_lengths):
+    """
+    Pairs each triangle with the one closest in edge lengths,
+    testing all the remaining triangles (slow for many triangles).
+
+    Returns a list of (tri1, tri2) pairs,
+    tri2 is None for a last unpaired triangle.
+    """
+    tri_lengths = tri_lengths[:]
+    tri_pairs = []
+
+    while tri_lengths:
+        tri1 = tri_lengths.pop()
+
+        if not tri_lengths:
+            tri_pairs.append((tri1, None))
+            break
+
+        best_tri_index = -1
+        best_tri_diff = 100000000.0
+
+        for i, tri2 in enumerate(tri_lengths):
+            diff = trilensdiff(tri1, tri2)
+            if diff < best_tri_diff:
+                best_tri_index = i
+                best_tri_diff = diff
+
+        tri_pairs.append((tri1, tri_lengths.pop(best_tri_index)))
+
+    return tri_pairs
+
+
+def tri_pairs_kdtree(tri_lengths):
+    """
+    Pairs each triangle with one close in edge lengths,
+    from the nearest sorted edge lengths in a kd-tree.
+
+    Returns a list of (tri1, tri2) pairs, like tri_pairs_exhaustive.
+    """
+    from mathutils.kdtree import KDTree
+
+    tot_tri = len(tri_lengths)
+    tri_keys = [(lens[lens_order[0]], lens[lens_order[1]], lens[lens_order[2]])
+                for f, lens, lens_order in tri_lengths]
+    tri_used = bytearray(tot_tri)
+    tot_remaining = tot_tri
+    tri_pairs = []
+
+    tree = None
+    tree_size = 0
+
+    # from the last triangle, as tri_pairs_exhaustive does
+    for i in range(tot_tri - 1, -1, -1):
+        if tri_used[i]:
+            continue
+        tri_used[i] = True
+        tot_remaining -= 1
+        tri1 = tri_lengths[i]
+
+        if not tot_remaining:
+            tri_pairs.append((tri1, None))
+            break
+
+        # Trees can't remove triangles, rebuild it once most are used
+        # so lookups don't have to skip over them.
+        if tree is None or tot_remaining * 2 < tree_size:
+            tree_size = tot_remaining
+            tree = KDTree(tree_size)
+            for j in range(tot_tri):
+                if not tri_used[j]:
+                    tree.insert(tri_keys[j], j)
+            tree.balance()
+
+        n = 8
+        while True:
+            found = [j for co, j, dist in tree.find_n(tri_keys[i], n) if not tri_used[j]]
+            if found or n >= tree_size:
+                break
+            n *= 4
+
+        # the best of the nearest, in the same measure as tri_pairs_exhaustive
+        j = min(found, key=lambda j: trilensdiff(tri1, tri_lengths[j]))
+        tri_used[j] = True
+        tot_remaining -= 1
+        tri_pairs.append((tri1, tri_lengths[j]))
+
+    return tri_pairs
+
+
 def lightmap_uvpack(meshes,
                     PREF_SEL_ONLY=True,
                     PREF_NEW_UVLAYER=False,
@@ -240,16 +344,27 @@ def lightmap_uvpack(meshes,
                     PREF_APPLY_IMAGE=False,
                     PREF_IMG_PX_SIZE=512,
                     PREF_BOX_DIV=8,
-                    PREF_MARGIN_DIV=512
+                    PREF_MARGIN_DIV=512,
+                    PREF_TRI_PAIRING='FAST',
+                    PREF_MARGIN_PX=0,
+                    PREF_ROTATE=True,
+                    PREF_PACK_METHOD='AUTO',
                     ):
     """
     BOX_DIV if the maximum division of the UV map that
     a box may be consolidated into.
     Basically, a lower value will be slower but waist less space
     and a higher value will have more clumpy boxes but more wasted space
+
+    TRI_PAIRING 'QUALITY' pairs each triangle with its best match,
+    'FAST' with a close match (much faster for many triangles).
+
+    MARGIN_PX is the margin between faces in pixels of an IMG_PX_SIZE image,
+    used instead of MARGIN_DIV when set.
     """
     import time
     from math import sqrt
+    from bpy_extras import uv_pack
 
     if not meshes:
         return
@@ -282,6 +397,13 @@ def lightmap_uvpack(meshes,
         if not me.uv_textures:
             me.uv_textures.new()
 
+    # UVs of each mesh, written back once all are packed
+    uv_arrays = {}
+    for me in meshes:
+        uv_data = array('f', [0.0]) * (len(me.loops) * 2)
+        me.uv_layers.active.data.foreach_get("uv", uv_data)
+        uv_arrays[me] = uv_data
+
     for face_sel in face_groups:
         print("\nStarting unwrap")
 
@@ -289,7 +411,7 @@ def lightmap_uvpack(meshes,
             print("\tWarning, less then 4 faces, skipping")
             continue
 
-        pretty_faces = [prettyface(f) for f in face_sel if f.loop_total >= 4]
+        pretty_faces = [prettyface(f, uv_arrays) for f in face_sel if f.loop_total >= 4]
 
         # Do we have any triangles?
         if len(pretty_faces) != len(face_sel):
@@ -316,28 +438,12 @@ def lightmap_uvpack(meshes,
             tri_lengths = [trylens(f) for f in face_sel if f.loop_total == 3]
             del trylens
 
-            def trilensdiff(t1, t2):
-                return (abs(t1[1][t1[2][0]] - t2[1][t2[2][0]]) +
-                        abs(t1[1][t1[2][1]] - t2[1][t2[2][1]]) +
-                        abs(t1[1][t1[2][2]] - t2[1][t2[2][2]]))
-
-            while tri_lengths:
-                tri1 = tri_lengths.pop()
-
-                if not tri_lengths:
-                    pretty_faces.append(prettyface((tri1, None)))
-                    break
-
-                best_tri_index = -1
-                best_tri_diff = 100000000.0
-
-                for i, tri2 in enumerate(tri_lengths):
-                    diff = trilensdiff(tri1, tri2)
-                    if diff < best_tri_diff:
-                        best_tri_index = i
-                        best_tri_diff = diff
+            if PREF_TRI_PAIRING == 'QUALITY':
+                tri_pairs = tri_pairs_exhaustive(tri_lengths)
+            else:
+                tri_pairs = tri_pairs_kdtree(tri_lengths)
 
-                pretty_faces.append(prettyface((tri1, tri_lengths.pop(best_tri_index))))
+            pretty_faces.extend([prettyface(tri_pair, uv_arrays) for tri_pair in tri_pairs])
 
         # Get the min, max and total areas
         max_area = 0.0
@@ -515,27 +621,38 @@ def lightmap_uvpack(meshes,
         print("Consolidated", c, "boxes, done")
         # print("done", orig, len(pretty_faces))
 
-        # boxes2Pack.append([islandIdx, w,h])
         print("\tPacking Boxes", len(pretty_faces), end="...")
-        boxes2Pack = [[0.0, 0.0, pf.width, pf.height, i] for i, pf in enumerate(pretty_faces)]
-        packWidth, packHeight = mathutils.geometry.box_pack_2d(boxes2Pack)
+        box_xs, box_ys, box_rotated, packWidth, packHeight = uv_pack.pack_boxes(
+                [pf.width for pf in pretty_faces],
+                [pf.height for pf in pretty_faces],
+                use_rotate=PREF_ROTATE,
+                method=PREF_PACK_METHOD,
+                )
+
+        # boxes the packer turned on their side
+        for pf, rot in zip(pretty_faces, box_rotated):
+            if rot:
+                pf.spin()
 
         # print(packWidth, packHeight)
 
         packWidth = float(packWidth)
         packHeight = float(packHeight)
 
-        margin_w = ((packWidth) / PREF_MARGIN_DIV) / packWidth
-        margin_h = ((packHeight) / PREF_MARGIN_DIV) / packHeight
+        if PREF_MARGIN_PX:
+            # each face is inset by half the margin
+            margin_w = margin_h = PREF_MARGIN_PX / (PREF_IMG_PX_SIZE * 2.0)
+        else:
+            margin_w = ((packWidth) / PREF_MARGIN_DIV) / packWidth
+            margin_h = ((packHeight) / PREF_MARGIN_DIV) / packHeight
 
         # print(margin_w, margin_h)
         print("done")
 
         # Apply the boxes back to the UV coords.
         print("\twriting back UVs", end="")
-        for i, box in enumerate(boxes2Pack):
-            pretty_faces[i].place(box[0], box[1], packWidth, packHeight, margin_w, margin_h)
-            # pf.place(box[1][1], box[1][2], packWidth, packHeight, margin_w, margin_h)
+        for pf, box_x, box_y in zip(pretty_faces, box_xs, box_ys):
+            pf.place(box_x, box_y, packWidth, packHeight, margin_w, margin_h)
         print("done")
 
         if PREF_APPLY_IMAGE:
@@ -550,6 +667,7 @@ def lightmap_uvpack(meshes,
                 f.id_data.uv_textures.active.data[f.index].image = image  # XXX25
 
     for me in meshes:
+        me.uv_layers.active.data.foreach_set("uv", uv_arrays[me])
         me.update()
 
     print("finished all %.2f " % (time.time() - t))
@@ -628,7 +746,8 @@ class LightMapPack(Operator):
             )
     PREF_IMG_PX_SIZE = IntProperty(
             name="Image Size",
-            description="Width and Height for the new image",
+            description="Width and Height for the new image, "
+                        "and the image of the margin in pixels",
             min=64, max=5000,
             default=512,
             )
@@ -645,6 +764,35 @@ class LightMapPack(Operator):
             min=0.001, max=1.0,
             default=0.1,
             )
+    PREF_TRI_PAIRING = bpy.props.EnumProperty(
+            name="Triangle Pairing",
+            items=(('FAST', "Fast", "Pair each triangle with a close match in edge lengths"),
+                   ('QUALITY', "Quality", "Pair each triangle with its best match in edge lengths "
+                                          "(slow for many triangles)"),
+                   ),
+            default='FAST',
+            )
+    PREF_MARGIN_PX = IntProperty(
+            name="Margin Pixels",
+            description="Margin between faces in pixels of an image of Image Size, "
+                        "used instead of Margin when set",
+            min=0, max=64,
+            default=0,
+            )
+    PREF_ROTATE = BoolProperty(
+            name="Rotate Boxes",
+            description="Rotate boxes by 90 degrees when they pack tighter",
+            default=True,
+            )
+    PREF_PACK_METHOD = bpy.props.EnumProperty(
+            name="Pack Method",
+            items=(('AUTO', "Automatic", "Skyline for up to a few thousand boxes, "
+                                        "Box Pack for more"),
+                   ('SKYLINE', "Skyline", "Tight packing, slow for many boxes"),
+                   ('BOX_PACK_2D', "Box Pack", "Fast packing, boxes aren't rotated"),
+                   ),
+            default='AUTO',
+            )
 
     def execute(self, context):
         kwargs = self.as_keywords()
@@ -25,12 +25,7 @@ from bpy.types import Operator
 DEG_TO_RAD = 0.017453292519943295 # pi/180.0
 SMALL_NUM = 0.00000001  # see bug [#31598] why we dont have smaller values
 
-global USER_FILL_HOLES
-global USER_FILL_HOLES_QUALITY
-USER_FILL_HOLES = None
-USER_FILL_HOLES_QUALITY = None
-
-def pointInTri2D(v, v1, v2, v3):
+def pointInTri2D(v, v1, v2, v3, dict_matrix):
     key = v1.x, v1.y, v2.x, v2.y, v3.x, v3.y
 
     # Commented because its slower to do the bounds check, we should really cache the bounds info for each face.
@@ -128,19 +123,19 @@ def island2Edge(island):
     unique_points= {}
 
     for f in island:
-        f_uvkey= map(tuple, f.uv)
+        f_uvkey= list(map(tuple, f.uv))
 
 
         for vIdx, edkey in enumerate(f.edge_keys):
             unique_points[f_uvkey[vIdx]] = f.uv[vIdx]
 
-            if f.v[vIdx].index > f.v[vIdx-1].index:
+            if f.v[vIdx] > f.v[vIdx-1]:
                 i1= vIdx-1;	i2= vIdx
             else:
                 i1= vIdx;	i2= vIdx-1
 
             try:	edges[ f_uvkey[i1], f_uvkey[i2] ] *= 0 # sets any edge with more than 1 user to 0 are not returned.
-            except:	edges[ f_uvkey[i1], f_uvkey[i2] ] = (f.uv[i1] - f.uv[i2]).length,
+            except:	edges[ f_uvkey[i1], f_uvkey[i2] ] = (f.uv[i1] - f.uv[i2]).length
 
     # If 2 are the same then they will be together, but full [a,b] order is not correct.
 
@@ -182,86 +177,151 @@ def pointInEdges(pt, edges):
     return intersectCount % 2
 """
 
-def pointInIsland(pt, island):
-    vec1, vec2, vec3 = Vector(), Vector(), Vector()
-    for f in island:
-        vec1.x, vec1.y = f.uv[0]
-        vec2.x, vec2.y = f.uv[1]
-        vec3.x, vec3.y = f.uv[2]
-
-        if pointInTri2D(pt, vec1, vec2, vec3):
-            return True
-
-        if len(f.v) == 4:
-            vec1.x, vec1.y = f.uv[0]
-            vec2.x, vec2.y = f.uv[2]
-            vec3.x, vec3.y = f.uv[3]
-            if pointInTri2D(pt, vec1, vec2, vec3):
+class UvIslandIndex:
+    """
+    Uniform grid of the outline edges and the UV triangles of an island,
+    intersection tests only look at the edges and triangles in the grid
+    cells they overlap, instead of all of them.
+    """
+    __slots__ = "cell_size", "edges", "edge_cells", "tris", "tri_cells"
+
+    # cells along the longest side of an island
+    MAX_CELLS = 64
+
+    def __init__(self, width, height, edge_count):
+        from math import sqrt
+        cells = min(self.MAX_CELLS, max(1, int(sqrt(edge_count))))
+        self.cell_size = max(width, height, SMALL_NUM) / cells
+        self.edges = []
+        self.edge_cells = {}
+        self.tris = []
+        self.tri_cells = {}
+
+    def _cells(self, minx, miny, maxx, maxy):
+        # Includes every cell a point in the bounds can be found in,
+        # with a margin for the precision of pointInTri2D.
+        from math import floor
+        size = self.cell_size
+        margin = size * 0.0001
+        x_range = range(int(floor((minx - margin) / size)), int(floor((maxx + margin) / size)) + 1)
+        for y in range(int(floor((miny - margin) / size)), int(floor((maxy + margin) / size)) + 1):
+            for x in x_range:
+                yield x, y
+
+    def add_edges(self, edges):
+        edge_cells = self.edge_cells
+        for ed in edges:
+            i = len(self.edges)
+            self.edges.append(ed)
+            v1, v2 = ed[0], ed[1]
+            for key in self._cells(min(v1.x, v2.x), min(v1.y, v2.y), max(v1.x, v2.x), max(v1.y, v2.y)):
+                try:	edge_cells[key].append(i)
+                except:	edge_cells[key] = [i]
+
+    def add_faces(self, faces):
+        tri_cells = self.tri_cells
+        for f in faces:
+            f_uv = f.uv
+            # the first triangle of each face, both triangles of quads
+            if len(f.v) == 4:
+                f_tris = (f_uv[0], f_uv[1], f_uv[2]), (f_uv[0], f_uv[2], f_uv[3])
+            else:
+                f_tris = (f_uv[0], f_uv[1], f_uv[2]),
+
+            for tri in f_tris:
+                i = len(self.tris)
+                self.tris.append(tuple(Vector((uv.x, uv.y, 0.0)) for uv in tri))
+                xs = [uv.x for uv in tri]
+                ys = [uv.y for uv in tri]
+                for key in self._cells(min(xs), min(ys), max(xs), max(ys)):
+                    try:	tri_cells[key].append(i)
+                    except:	tri_cells[key] = [i]
+
+    def intersect_edge(self, v1, v2):
+        edges = self.edges
+        edge_cells = self.edge_cells
+        tested = set()
+        for key in self._cells(min(v1.x, v2.x), min(v1.y, v2.y), max(v1.x, v2.x), max(v1.y, v2.y)):
+            for i in edge_cells.get(key, ()):
+                if i not in tested:
+                    tested.add(i)
+                    seg = edges[i]
+                    if geometry.intersect_line_line_2d(seg[0], seg[1], v1, v2):
+                        return True
+        return False
+
+    def point_inside(self, pt, dict_matrix):
+        from math import floor
+        size = self.cell_size
+        tris = self.tris
+        for i in self.tri_cells.get((int(floor(pt.x / size)), int(floor(pt.y / size))), ()):
+            vec1, vec2, vec3 = tris[i]
+            if pointInTri2D(pt, vec1, vec2, vec3, dict_matrix):
                 return True
-    return False
+        return False
 
 
 # box is (left,bottom, right, top)
-def islandIntersectUvIsland(source, target, SourceOffset):
+def islandIntersectUvIsland(source, target, SourceOffset, dict_matrix):
     # Is 1 point in the box, inside the vertLoops
     edgeLoopsSource = source[6] # Pretend this is offset
-    edgeLoopsTarget = target[6]
+    indexTarget = target[8]
 
-    # Edge intersect test
+    # Edge intersect test, against the target edges near each source edge
     for ed in edgeLoopsSource:
-        for seg in edgeLoopsTarget:
-            i = geometry.intersect_line_line_2d(seg[0],
-                                                seg[1],
-                                                SourceOffset+ed[0],
-                                                SourceOffset+ed[1],
-                                                )
-            if i:
-                return 1 # LINE INTERSECTION
+        if indexTarget.intersect_edge(SourceOffset+ed[0], SourceOffset+ed[1]):
+            return 1 # LINE INTERSECTION
 
     # 1 test for source being totally inside target
     SourceOffset.resize_3d()
     for pv in source[7]:
-        if pointInIsland(pv+SourceOffset, target[0]):
+        if indexTarget.point_inside(pv+SourceOffset, dict_matrix):
             return 2 # SOURCE INSIDE TARGET
 
     # 2 test for a part of the target being totally inside the source.
+    indexSource = source[8]
     for pv in target[7]:
-        if pointInIsland(pv-SourceOffset, source[0]):
+        if indexSource.point_inside(pv-SourceOffset, dict_matrix):
             return 3 # PART OF TARGET INSIDE SOURCE.
 
     return 0 # NO INTERSECTION
 
 
-def rotate_uvs(uv_points, angle):
-
+def rotate_uvs(uvs, uv_indices, angle):
+    # uv_indices are the offsets of the x of each uv in uvs
     if angle != 0.0:
-        mat = Matrix.Rotation(angle, 2)
-        for uv in uv_points:
-            uv[:] = mat * uv
+        from math import cos, sin
+        c, s = cos(angle), sin(angle)
+        for i in uv_indices:
+            x, y = uvs[i], uvs[i + 1]
+            uvs[i] = c * x - s * y
+            uvs[i + 1] = s * x + c * y
 
 
-def optiRotateUvIsland(faces):
-    uv_points = [uv for f in faces  for uv in f.uv]
+def optiRotateUvIsland(uvs, uv_indices):
+    uv_points = [(uvs[i], uvs[i + 1]) for i in uv_indices]
     angle = geometry.box_fit_2d(uv_points)
 
     if angle != 0.0:
-        rotate_uvs(uv_points, angle)
+        rotate_uvs(uvs, uv_indices, angle)
 
     # orient them vertically (could be an option)
-    minx, miny, maxx, maxy = boundsIsland(faces)
-    w, h = maxx - minx, maxy - miny
+    xs = [uvs[i] for i in uv_indices]
+    ys = [uvs[i + 1] for i in uv_indices]
+    w, h = max(xs) - min(xs), max(ys) - min(ys)
     # use epsilon so we dont randomly rotate (almost) perfect squares.
     if h + 0.00001 < w:
         from math import pi
         angle = pi / 2.0
-        rotate_uvs(uv_points, angle)
+        rotate_uvs(uvs, uv_indices, angle)
 
 
 # Takes an island list and tries to find concave, hollow areas to pack smaller islands into.
-def mergeUvIslands(islandList):
-    global USER_FILL_HOLES
-    global USER_FILL_HOLES_QUALITY
+def mergeUvIslands(islandList, settings):
+    USER_FILL_HOLES_QUALITY = settings.fill_holes_quality
 
+    # inverted uv triangle matrices of pointInTri2D
+    dict_matrix = {}
 
     # Pack islands to bottom LHS
     # Sync with island
@@ -292,7 +352,12 @@ def mergeUvIslands(islandList):
         # UV Edge list used for intersections as well as unique points.
         edges, uniqueEdgePoints = island2Edge(islandList[islandIdx])
 
-        decoratedIslandList.append([islandList[islandIdx], totFaceArea, efficiency, islandBoundsArea, w,h, edges, uniqueEdgePoints])
+        # Spatial index of the edges and faces for the intersection tests.
+        index = UvIslandIndex(w, h, len(edges))
+        index.add_edges(edges)
+        index.add_faces(islandList[islandIdx])
+
+        decoratedIslandList.append([islandList[islandIdx], totFaceArea, efficiency, islandBoundsArea, w,h, edges, uniqueEdgePoints, index])
 
 
     # Sort by island bounding box area, smallest face area first.
@@ -324,7 +389,7 @@ def mergeUvIslands(islandList):
     removedCount = 0
 
     areaIslandIdx = 0
-    ctrl = Window.Qual.CTRL
+#XXX	ctrl = Window.Qual.CTRL
     BREAK= False
     while areaIslandIdx < len(decoratedIslandListAreaSort) and not BREAK:
         sourceIsland = decoratedIslandListAreaSort[areaIslandIdx]
@@ -335,9 +400,9 @@ def mergeUvIslands(islandList):
             efficIslandIdx = 0
             while efficIslandIdx < len(decoratedIslandListEfficSort) and not BREAK:
 
-                if Window.GetKeyQualifiers() & ctrl:
-                    BREAK= True
-                    break
+#XXX				if Window.GetKeyQualifiers() & ctrl:
+#XXX					BREAK= True
+#XXX					break
 
                 # Now we have 2 islands, if the efficiency of the islands lowers theres an
                 # increasing likely hood that we can fit merge into the bigger UV island.
@@ -403,7 +468,7 @@ def mergeUvIslands(islandList):
 
                             ##testcount+=1
                             #print 'Testing intersect'
-                            Intersect = islandIntersectUvIsland(sourceIsland, targetIsland, Vector((boxLeft, boxBottom)))
+                            Intersect = islandIntersectUvIsland(sourceIsland, targetIsland, Vector((boxLeft, boxBottom)), dict_matrix)
                             #print 'Done', Intersect
                             if Intersect == 1:  # Line intersect, don't bother with this any more
                                 pass
@@ -434,15 +499,19 @@ def mergeUvIslands(islandList):
                                     for uv in f.uv:
                                         uv+= offset
 
+                                targetIsland[8].add_faces(sourceIsland[0])
+
                                 del sourceIsland[0][:]  # Empty
 
 
                                 # Move edge loop into new and offset.
                                 # targetIsland[6].extend(sourceIsland[6])
                                 #while sourceIsland[6]:
-                                targetIsland[6].extend( [ (\
+                                sourceEdges = [ (\
                                      (e[0]+offset, e[1]+offset, e[2])\
-                                ) for e in sourceIsland[6] ] )
+                                ) for e in sourceIsland[6] ]
+                                targetIsland[6].extend(sourceEdges)
+                                targetIsland[8].add_edges(sourceEdges)
 
                                 del sourceIsland[6][:]  # Empty
 
@@ -487,16 +556,9 @@ def mergeUvIslands(islandList):
         if not islandList[i]:
             del islandList[i] # Can increment islands removed here.
 
-# Takes groups of faces. assumes face groups are UV groups.
-def getUvIslands(faceGroups, me):
-
-    # Get seams so we don't cross over seams
-    edge_seams = {} # should be a set
-    for ed in me.edges:
-        if ed.use_seam:
-            edge_seams[ed.key] = None # dummy var- use sets!
-    # Done finding seams
-
+# Takes groups of face indices. assumes face groups are UV groups.
+# edge_seams are the edge keys of the seams, so we don't cross over seams
+def getUvIslands(faceGroups, face_edge_keys, edge_seams):
 
     islandList = []
 
@@ -517,270 +579,542 @@ def getUvIslands(faceGroups, me):
         edge_users = {}
 
         for i, f in enumerate(faces):
-            for ed_key in f.edge_keys:
+            for ed_key in face_edge_keys[f]:
                 if ed_key in edge_seams: # DELIMIT SEAMS! ;)
                     edge_users[ed_key] = [] # so as not to raise an error
                 else:
                     try:		edge_users[ed_key].append(i)
                     except:		edge_users[ed_key] = [i]
 
-        # Modes
-        # 0 - face not yet touched.
-        # 1 - added to island list, and need to search
-        # 2 - touched and searched - don't touch again.
-        face_modes = [0] * len(faces) # initialize zero - untested.
-
-        face_modes[0] = 1 # start the search with face 1
-
-        newIsland = []
-
-        newIsland.append(faces[0])
-
-
-        ok = True
-        while ok:
-
-            ok = True
-            while ok:
-                ok= False
-                for i in range(len(faces)):
-                    if face_modes[i] == 1: # search
-                        for ed_key in faces[i].edge_keys:
-                            for ii in edge_users[ed_key]:
-                                if i != ii and face_modes[ii] == 0:
-                                    face_modes[ii] = ok = 1 # mark as searched
-                                    newIsland.append(faces[ii])
-
-                        # mark as searched, don't look again.
-                        face_modes[i] = 2
-
-            islandList.append(newIsland)
-
-            ok = False
-            for i in range(len(faces)):
-                if face_modes[i] == 0:
-                    newIsland = []
-                    newIsland.append(faces[i])
-
-                    face_modes[i] = ok = 1
-                    break
-            # if not ok will stop looping
-
-#XXX	Window.DrawProgressBar(0.1, 'Optimizing Rotation for %i UV Islands' % len(islandList))
+        # Flood fill from the first face not in an island yet,
+        # newIsland grows while its walked.
+        face_tag = bytearray(len(faces))
+        for i_start in range(len(faces)):
+            if face_tag[i_start]:
+                continue
+            face_tag[i_start] = True
+            newIsland = [i_start]
+            for i in newIsland:
+                for ed_key in face_edge_keys[faces[i]]:
+                    for ii in edge_users[ed_key]:
+                        if not face_tag[ii]:
+                            face_tag[ii] = True
+                            newIsland.append(ii)
 
-    for island in islandList:
-        optiRotateUvIsland(island)
+            islandList.append([faces[i] for i in newIsland])
 
     return islandList
 
 
-def packIslands(islandList):
-    if USER_FILL_HOLES:
-#XXX		Window.DrawProgressBar(0.1, 'Merging Islands (Ctrl: skip merge)...')
-        mergeUvIslands(islandList) # Modify in place
-
-
-    # Now we have UV islands, we need to pack them.
-
-    # Make a synchronized list with the islands
-    # so we can box pack the islands.
-    packBoxes = []
-
-    # Keep a list of X/Y offset so we can save time by writing the
-    # uv's and packed data in one pass.
-    islandOffsetList = []
+def VectoQuat(vec):
+    vec = vec.normalized()
+    return vec.to_track_quat('Z', 'X' if abs(vec.x) > 0.5 else 'Y').inverted()
 
-    islandIdx = 0
 
-    while islandIdx < len(islandList):
-        minx, miny, maxx, maxy = boundsIsland(islandList[islandIdx])
+# Faces of the islands when filling holes,
+# uv_index is the offset of the first UV of the face in the packed UVs.
+class thickface:
+    __slots__ = "v", "uv", "area", "edge_keys", "uv_index"
+    def __init__(self, v, uv, area, edge_keys, uv_index):
+        self.v = v
+        self.uv = uv
+
+        self.area = area
+        self.edge_keys = edge_keys
+        self.uv_index = uv_index
+
+
+def face_uv_starts(face_loop_total):
+    """
+    Returns the offset of the first UV of each face,
+    in UVs with 2 floats for each loop of each face.
+    """
+    import array
+    face_uv_start = array.array('i', [0]) * len(face_loop_total)
+    uv_index = 0
+    for i, loop_total in enumerate(face_loop_total):
+        face_uv_start[i] = uv_index
+        uv_index += loop_total * 2
+    return face_uv_start
+
+
+class SmartProjectSettings:
+    """
+    Settings of a smart projection, passed to every stage
+    (replaces the USER_* globals).
+    """
+    __slots__ = (
+        "projection_limit",
+        "island_margin",
+        "area_weight",
+        "only_selected_faces",
+        "share_space",
+        "stretch_aspect",
+        "fill_holes",
+        "fill_holes_quality",
+        "use_rotate",
+        "margin_pixels",
+        "image_size",
+        "pack_method",
+        )
+
+    def __init__(self, projection_limit=66.0, island_margin=0.0,
+                 area_weight=0.0, only_selected_faces=True):
+        self.projection_limit = projection_limit
+        self.island_margin = island_margin
+        self.area_weight = area_weight
+        self.only_selected_faces = only_selected_faces
+        self.share_space = True
+        self.stretch_aspect = True
+        self.fill_holes = False
+        self.fill_holes_quality = 50
+        # packing, see bpy_extras.uv_pack.pack_uv_islands
+        self.use_rotate = False
+        self.margin_pixels = 0  # used instead of island_margin when set
+        self.image_size = 1024
+        self.pack_method = 'AUTO'
+
+
+class MeshProjectionData:
+    """
+    The arrays of a mesh used to project it, extracted up front so
+    the projection can run without access to blender data.
+    Faces are the polygons which are unwrapped, in polygon order.
+    """
+    __slots__ = (
+        "name",
+        "vert_co",  # flat vertex coordinates
+        "face_loop_start",  # first loop of each face
+        "face_loop_total",  # loops of each face
+        "loop_verts",  # vertex index of each loop
+        "face_no",  # flat face normals
+        "face_area",
+        "face_edge_keys",  # edge keys of each face
+        "edge_seams",  # edge keys of the seams
+        )
+
+    def __init__(self, me, only_selected_faces):
+        import array
+
+        polygons = me.polygons
+        tot_poly = len(polygons)
+        poly_select = [True] * tot_poly
+        if only_selected_faces:
+            polygons.foreach_get("select", poly_select)
+        poly_indices = [i for i, select in enumerate(poly_select) if select]
+
+        def poly_array(attr, typecode, size=1):
+            values = array.array(typecode, [0]) * (tot_poly * size)
+            polygons.foreach_get(attr, values)
+            if len(poly_indices) == tot_poly:
+                return values
+            if size == 1:
+                return array.array(typecode, map(values.__getitem__, poly_indices))
+            return array.array(typecode, [values[i * size + j] for i in poly_indices for j in range(size)])
+
+        self.name = me.name
+        self.face_loop_start = poly_array("loop_start", 'i')
+        self.face_loop_total = poly_array("loop_total", 'i')
+        self.face_no = poly_array("normal", 'f', 3)
+        self.face_area = poly_array("area", 'f')
+
+        self.vert_co = array.array('f', [0.0]) * (len(me.vertices) * 3)
+        me.vertices.foreach_get("co", self.vert_co)
+        self.loop_verts = array.array('i', [0]) * len(me.loops)
+        me.loops.foreach_get("vertex_index", self.loop_verts)
+
+        polygon_edge_keys = me.polygon_edge_keys
+        self.face_edge_keys = [polygon_edge_keys[i] for i in poly_indices]
+
+        edge_seams = [False] * len(me.edges)
+        me.edges.foreach_get("use_seam", edge_seams)
+        self.edge_seams = frozenset(ed_key for ed_key, seam in zip(me.edge_keys, edge_seams) if seam)
+
+
+def face_dots(vec, face_nx, face_ny, face_nz, faces):
+    """
+    Returns the dot products of vec with the normals of faces,
+    all faces at once.
+    """
+    x, y, z = vec
+    return [x * face_nx[f] + y * face_ny[f] + z * face_nz[f] for f in faces]
+
+
+def project_mesh(data, settings):
+    """
+    Projects the faces of a mesh and splits them into UV islands.
+
+    Returns the UVs of the face loops (2 floats for each loop of each face,
+    in face order) and the islands as lists of face indices,
+    None when there are no projections (only zero area faces).
+    """
+    import array
+    from math import cos, sqrt
+
+    USER_PROJECTION_LIMIT = settings.projection_limit
+    user_area_weight = settings.area_weight
 
-        w, h = maxx-minx, maxy-miny
+    # Convert from being button types
+    USER_PROJECTION_LIMIT_CONVERTED = cos(USER_PROJECTION_LIMIT * DEG_TO_RAD)
+    USER_PROJECTION_LIMIT_HALF_CONVERTED = cos((USER_PROJECTION_LIMIT/2) * DEG_TO_RAD)
 
-        if USER_ISLAND_MARGIN:
-            minx -= USER_ISLAND_MARGIN# *w
-            miny -= USER_ISLAND_MARGIN# *h
-            maxx += USER_ISLAND_MARGIN# *w
-            maxy += USER_ISLAND_MARGIN# *h
+    # Faces are indices into these arrays.
+    face_area = data.face_area
+    face_nx = data.face_no[0::3]
+    face_ny = data.face_no[1::3]
+    face_nz = data.face_no[2::3]
+    face_loop_start = data.face_loop_start
+    face_loop_total = data.face_loop_total
+    loop_verts = data.loop_verts
+    vert_co = data.vert_co
+
+    # Offset of the first UV of each face in uvs.
+    face_uv_start = face_uv_starts(face_loop_total)
+    uvs = array.array('f', [0.0]) * (sum(face_loop_total) * 2)
+
+    # =======
+    # Generate a projection list from face normals, this is meant to be smart :)
+
+    # Make a Face List that is sorted by area.
+    meshFaces = sorted(range(len(face_area)), key=lambda f: -face_area[f]) # Biggest first.
+
+    # remove all zero area faces (their UV's stay at 0,0)
+    while meshFaces and face_area[meshFaces[-1]] <= SMALL_NUM:
+        meshFaces.pop()
+
+    # Smallest first is slightly more efficient, but if the user cancels early then its better we work on the larger data.
+
+    # Generate Projection Vecs
+    # 0d is   1.0
+    # 180 IS -0.59846
+
+    # Initialize projectVecs
+    projectVecs = []
+
+    if not meshFaces:
+        return None
+
+    f = meshFaces[0]
+    newProjectVec = face_nx[f], face_ny[f], face_nz[f]
+    newProjectMeshFaces = []	# Popping stuffs it up.
+
+    # This is popped
+    tempMeshFaces = meshFaces[:]
+    # The closest angle of each of tempMeshFaces to the projectVecs,
+    # updated as projectVecs are added.
+    tempMeshFacesAngle = [-1.0] * len(tempMeshFaces) # 180d difference.
+
+    # This while only gathers projection vecs, faces are assigned later on.
+    while 1:
+        # If theres none there then start with the largest face
+
+        # add all the faces that are close.
+        # Use half the angle limit so we don't overweight faces towards this
+        # normal and hog all the faces.
+        dots = face_dots(newProjectVec, face_nx, face_ny, face_nz, tempMeshFaces)
+        is_close = [d > USER_PROJECTION_LIMIT_HALF_CONVERTED for d in dots]
+        if True in is_close:
+            newProjectMeshFaces.extend(reversed([f for f, close in zip(tempMeshFaces, is_close) if close]))
+            tempMeshFaces = [f for f, close in zip(tempMeshFaces, is_close) if not close]
+            tempMeshFacesAngle = [a for a, close in zip(tempMeshFacesAngle, is_close) if not close]
+
+        # Add the average of all these faces normals as a projectionVec
+        if user_area_weight == 0.0:
+            weights = [1.0] * len(newProjectMeshFaces)
+        elif user_area_weight == 1.0:
+            weights = [face_area[f] for f in newProjectMeshFaces]
+        else:
+            weights = [(face_area[f] * user_area_weight) + (1.0 - user_area_weight) for f in newProjectMeshFaces]
+        x = sum([face_nx[f] * w for f, w in zip(newProjectMeshFaces, weights)])
+        y = sum([face_ny[f] * w for f, w in zip(newProjectMeshFaces, weights)])
+        z = sum([face_nz[f] * w for f, w in zip(newProjectMeshFaces, weights)])
+
+        if x != 0 or y != 0 or z != 0: # Avoid NAN
+            length = sqrt(x * x + y * y + z * z)
+            projectVec = x / length, y / length, z / length
+            projectVecs.append(projectVec)
+
+            # Get the closest vec angle we are to.
+            tempMeshFacesAngle = list(map(max, tempMeshFacesAngle,
+                                          face_dots(projectVec, face_nx, face_ny, face_nz, tempMeshFaces)))
+
+        # Get the next vec!
+        # Pick the face thats most different to all existing angles :)
+        mostUniqueAngle = 1.0 # 1.0 is 0d. no difference.
+        mostUniqueIndex = 0 # dummy
+
+        if tempMeshFacesAngle:
+            angle = min(tempMeshFacesAngle)
+            if angle < mostUniqueAngle:
+                # We have a new most different angle (the last of equally different faces)
+                mostUniqueAngle = angle
+                mostUniqueIndex = len(tempMeshFacesAngle) - 1 - tempMeshFacesAngle[::-1].index(angle)
+
+        if mostUniqueAngle < USER_PROJECTION_LIMIT_CONVERTED:
+            #print 'adding', mostUniqueAngle, USER_PROJECTION_LIMIT, len(newProjectMeshFaces)
+            # Now weight the vector to all its faces, will give a more direct projection
+            # if the face its self was not representative of the normal from surrounding faces.
+
+            f = tempMeshFaces.pop(mostUniqueIndex)
+            del tempMeshFacesAngle[mostUniqueIndex]
+            newProjectVec = face_nx[f], face_ny[f], face_nz[f]
+            newProjectMeshFaces = [f]
 
-            # recalc width and height
-            w, h = maxx-minx, maxy-miny
+        else:
+            if len(projectVecs) >= 1 or not tempMeshFaces: # Must have at least 2 projections
+                break
 
-        if w < SMALL_NUM:
-            w = SMALL_NUM
-        if h < SMALL_NUM:
-            h = SMALL_NUM
 
-        """Save the offset to be applied later,
-        we could apply to the UVs now and allign them to the bottom left hand area
-        of the UV coords like the box packer imagines they are
-        but, its quicker just to remember their offset and
-        apply the packing and offset in 1 pass """
-        islandOffsetList.append((minx, miny))
+    # If there are only zero area faces then its possible
+    # there are no projectionVecs
+    if not len(projectVecs):
+        return None
 
-        # Add to boxList. use the island idx for the BOX id.
-        packBoxes.append([0, 0, w, h])
-        islandIdx+=1
+    faceProjectionGroupList =[[] for i in range(len(projectVecs)) ]
 
-    # Now we have a list of boxes to pack that syncs
-    # with the islands.
+    # MAP and Arrange # We know there are 3 or 4 faces here
 
-    #print '\tPacking UV Islands...'
-#XXX	Window.DrawProgressBar(0.7, "Packing %i UV Islands..." % len(packBoxes) )
+    # Initialize first
+    bestAng = face_dots(projectVecs[0], face_nx, face_ny, face_nz, meshFaces)
+    bestAngIdx = [0] * len(meshFaces)
 
-    # time1 = time.time()
-    packWidth, packHeight = geometry.box_pack_2d(packBoxes)
+    # Cycle through the remaining, first already done
+    for i in range(len(projectVecs) - 1, 0, -1):
+        for fIdx, newAng in enumerate(face_dots(projectVecs[i], face_nx, face_ny, face_nz, meshFaces)):
+            if newAng > bestAng[fIdx]: # Reverse logic for dotvecs
+                bestAng[fIdx] = newAng
+                bestAngIdx[fIdx] = i
 
-    # print 'Box Packing Time:', time.time() - time1
+    for fIdx in range(len(meshFaces)-1, -1, -1):
+        faceProjectionGroupList[bestAngIdx[fIdx]].append(meshFaces[fIdx])
 
-    #if len(pa	ckedLs) != len(islandList):
-    #    raise ValueError("Packed boxes differs from original length")
+    # Cull faceProjectionGroupList,
 
-    #print '\tWriting Packed Data to faces'
-#XXX	Window.DrawProgressBar(0.8, "Writing Packed Data to faces")
 
-    # Sort by ID, so there in sync again
-    islandIdx = len(islandList)
-    # Having these here avoids divide by 0
-    if islandIdx:
+    # Now faceProjectionGroupList is full of faces that face match the project Vecs list
+    for i in range(len(projectVecs)):
+        # Account for projectVecs having no faces.
+        if not faceProjectionGroupList[i]:
+            continue
 
-        if USER_STRETCH_ASPECT:
-            # Maximize to uv area?? Will write a normalize function.
-            xfactor = 1.0 / packWidth
-            yfactor = 1.0 / packHeight
-        else:
-            # Keep proportions.
-            xfactor = yfactor = 1.0 / max(packWidth, packHeight)
+        # Make a projection matrix from a unit length vector.
+        MatQuat = VectoQuat(Vector(projectVecs[i]))
+        (ux, uy, uz), (vx, vy, vz) = MatQuat.to_matrix()[0:2]
 
-    while islandIdx:
-        islandIdx -=1
-        # Write the packed values to the UV's
+        # Get the faces UV's from the projected vertex.
+        for f in faceProjectionGroupList[i]:
+            uv_index = face_uv_start[f]
+            loop_start = face_loop_start[f]
+            for v in loop_verts[loop_start:loop_start + face_loop_total[f]]:
+                x, y, z = vert_co[v * 3:v * 3 + 3]
+                uvs[uv_index] = ux * x + uy * y + uz * z
+                uvs[uv_index + 1] = vx * x + vy * y + vz * z
+                uv_index += 2
 
-        xoffset = packBoxes[islandIdx][0] - islandOffsetList[islandIdx][0]
-        yoffset = packBoxes[islandIdx][1] - islandOffsetList[islandIdx][1]
+    islands = getUvIslands(faceProjectionGroupList, data.face_edge_keys, data.edge_seams)
 
-        for f in islandList[islandIdx]: # Offsetting the UV's so they fit in there packed box
-            for uv in f.uv:
-                uv.x= (uv.x+xoffset) * xfactor
-                uv.y= (uv.y+yoffset) * yfactor
+#XXX	Window.DrawProgressBar(0.1, 'Optimizing Rotation for %i UV Islands' % len(islands))
 
+    for island in islands:
+        optiRotateUvIsland(uvs, [j for f in island for j in range(face_uv_start[f], face_uv_start[f] + face_loop_total[f] * 2, 2)])
 
-def VectoQuat(vec):
-    vec = vec.normalized()
-    return vec.to_track_quat('Z', 'X' if abs(vec.x) > 0.5 else 'Y').inverted()
+    return uvs, islands
 
 
-class thickface:
-    __slost__= "v", "uv", "no", "area", "edge_keys"
-    def __init__(self, face, uv_layer, mesh_verts):
-        self.v = [mesh_verts[i] for i in face.vertices]
-        self.uv = [uv_layer[i].uv for i in face.loop_indices]
+# below this many faces in total, starting a pool of processes
+# takes longer than projecting the meshes one after the other
+PROJECT_POOL_MIN_FACES = 10000
 
-        self.no = face.normal.copy()
-        self.area = face.area
-        self.edge_keys = face.edge_keys
+# the arguments of project_mesh while a pool runs, the forked processes
+# read them from here instead of having every mesh pickled to them
+_project_pool_args = None
 
 
-def main_consts():
-    from math import radians
+def _project_mesh_index(index):
+    return project_mesh(*_project_pool_args[index])
 
-    global ROTMAT_2D_POS_90D
-    global ROTMAT_2D_POS_45D
-    global RotMatStepRotation
 
-    ROTMAT_2D_POS_90D = Matrix.Rotation(radians(90.0), 2)
-    ROTMAT_2D_POS_45D = Matrix.Rotation(radians(45.0), 2)
+def _fork_context():
+    """
+    Returns a multiprocessing context which forks processes,
+    None when forking isn't available or isn't safe.
+    """
+    import sys
+    import threading
+    import multiprocessing
 
-    RotMatStepRotation = []
-    rot_angle = 22.5 #45.0/2
-    while rot_angle > 0.1:
-        RotMatStepRotation.append([
-            Matrix.Rotation(radians(+rot_angle), 2),
-            Matrix.Rotation(radians(-rot_angle), 2),
-            ])
+    # system frameworks on OS X don't support fork without exec
+    if sys.platform == "darwin":
+        return None
+    # locks held by other threads stay locked in the forked processes
+    if threading.active_count() > 1:
+        return None
+    try:
+        return multiprocessing.get_context("fork")
+    except ValueError:
+        # spawned processes can't import this module without blender
+        return None
+
+
+def project_meshes(mesh_datas, settings, processes=1, min_faces=PROJECT_POOL_MIN_FACES):
+    """
+    Runs project_mesh for each mesh, in a pool of processes when
+    processes is more than 1, there are min_faces or more faces in total
+    and processes can be forked, the results are the same as the serial results.
+    Only the results are pickled back from the pool.
+    """
+    global _project_pool_args
+
+    args = [(data, settings) for data in mesh_datas]
+    if (processes > 1 and len(args) > 1 and
+            sum(len(data.face_loop_start) for data in mesh_datas) >= min_faces):
+        mp_context = _fork_context()
+        if mp_context is not None:
+            # set before the pool forks its processes
+            _project_pool_args = args
+            try:
+                pool = mp_context.Pool(min(processes, len(args)))
+                try:
+                    # a mesh at a time, meshes can differ a lot in size
+                    return pool.map(_project_mesh_index, range(len(args)), chunksize=1)
+                finally:
+                    pool.close()
+                    pool.join()
+            finally:
+                _project_pool_args = None
+
+    return [project_mesh(*arg) for arg in args]
+
+
+def pack_projections(mesh_datas, results, settings):
+    """
+    Packs the UV islands of projected meshes in place,
+    into one UV space (share_space) or one for each mesh.
+    """
+    import array
+    from bpy_extras import uv_pack
+
+    projections = [(data, result) for data, result in zip(mesh_datas, results) if result is not None]
+    if settings.share_space:
+        # We want to pack all in 1 go
+        groups = [projections]
+    else:
+        groups = [[projection] for projection in projections]
+
+    for group in groups:
+        # The UVs of all meshes of the group in one array,
+        # island faces are (data, face index, offset of the face UVs).
+        uvs = array.array('f')
+        island_faces = []
+        for data, (mesh_uvs, mesh_islands) in group:
+            uv_offset = len(uvs)
+            face_uv_start = face_uv_starts(data.face_loop_total)
+            uvs.extend(mesh_uvs)
+            for island in mesh_islands:
+                island_faces.append([(data, f, uv_offset + face_uv_start[f]) for f in island])
+
+        if settings.fill_holes:
+#XXX		Window.DrawProgressBar(0.1, 'Merging Islands (Ctrl: skip merge)...')
+            islandList = []
+            for island in island_faces:
+                faces = []
+                for data, f, uv_index in island:
+                    loop_start = data.face_loop_start[f]
+                    loop_total = data.face_loop_total[f]
+                    faces.append(thickface(
+                            data.loop_verts[loop_start:loop_start + loop_total].tolist(),
+                            [Vector(uvs[j:j + 2]) for j in range(uv_index, uv_index + loop_total * 2, 2)],
+                            data.face_area[f],
+                            data.face_edge_keys[f],
+                            uv_index,
+                            ))
+                islandList.append(faces)
+
+            mergeUvIslands(islandList, settings) # Modify in place
+
+            islands = []
+            for island in islandList:
+                island_uvs = []
+                for f in island:
+                    for j, uv in enumerate(f.uv, f.uv_index // 2):
+                        uvs[j * 2] = uv.x
+                        uvs[j * 2 + 1] = uv.y
+                    island_uvs.extend(range(f.uv_index, f.uv_index + len(f.uv) * 2, 2))
+                islands.append(island_uvs)
+        else:
+            islands = [[j for data, f, uv_index in island
+                        for j in range(uv_index, uv_index + data.face_loop_total[f] * 2, 2)]
+                       for island in island_faces]
 
-        rot_angle = rot_angle/2.0
+#XXX	Window.DrawProgressBar(0.7, "Packing %i UV Islands..." % len(islands) )
+        if settings.margin_pixels:
+            margin, image_size = settings.margin_pixels, settings.image_size
+        else:
+            margin, image_size = settings.island_margin, 0
+        uv_pack.pack_uv_islands(uvs, islands,
+                                margin=margin,
+                                image_size=image_size,
+                                use_rotate=settings.use_rotate,
+                                use_stretch=settings.stretch_aspect,
+                                method=settings.pack_method,
+                                )
+
+        # Back to the UVs of each mesh
+        uv_offset = 0
+        for data, (mesh_uvs, mesh_islands) in group:
+            mesh_uvs[:] = uvs[uv_offset:uv_offset + len(mesh_uvs)]
+            uv_offset += len(mesh_uvs)
 
 
-global ob
-ob = None
 def main(context,
          island_margin,
          projection_limit,
          user_area_weight,
-         use_aspect
+         use_aspect,
+         use_fill_holes=False,
+         fill_holes_quality=50,
+         use_rotate=False,
+         margin_pixels=0,
+         image_size=1024,
+         pack_method='AUTO',
          ):
-    global USER_FILL_HOLES
-    global USER_FILL_HOLES_QUALITY
-    global USER_STRETCH_ASPECT
-    global USER_ISLAND_MARGIN
-    
-    from math import cos
+    """
+    Returns the names of the meshes which couldn't be projected.
+    """
+    import array
     import time
+    import os
 
-    global dict_matrix
-    dict_matrix = {}
-
-    # Constants:
-    # Takes a list of faces that make up a UV island and rotate
-    # until they optimally fit inside a square.
-    global ROTMAT_2D_POS_90D
-    global ROTMAT_2D_POS_45D
-    global RotMatStepRotation
-    main_consts()
-
-    # Create the variables.
-    USER_PROJECTION_LIMIT = projection_limit
-    USER_ONLY_SELECTED_FACES = True
-    USER_SHARE_SPACE = 1 # Only for hole filling.
-    USER_STRETCH_ASPECT = 1 # Only for hole filling.
-    USER_ISLAND_MARGIN = island_margin # Only for hole filling.
-    USER_FILL_HOLES = 0
-    USER_FILL_HOLES_QUALITY = 50 # Only for hole filling.
-    USER_VIEW_INIT = 0 # Only for hole filling.
-    
     is_editmode = (context.active_object.mode == 'EDIT')
     if is_editmode:
         obList =  [ob for ob in [context.active_object] if ob and ob.type == 'MESH']
     else:
         obList =  [ob for ob in context.selected_editable_objects if ob and ob.type == 'MESH']
-        USER_ONLY_SELECTED_FACES = False
+
+    settings = SmartProjectSettings(
+            projection_limit=projection_limit,
+            island_margin=island_margin,
+            area_weight=user_area_weight,
+            only_selected_faces=is_editmode,
+            )
+    settings.fill_holes = use_fill_holes
+    settings.fill_holes_quality = fill_holes_quality
+    settings.use_rotate = use_rotate
+    settings.margin_pixels = margin_pixels
+    settings.image_size = image_size
+    settings.pack_method = pack_method
 
     if not obList:
         raise Exception("error, no selected mesh objects")
 
-    # Reuse variable
-    if len(obList) == 1:
-        ob = "Unwrap %i Selected Mesh"
-    else:
-        ob = "Unwrap %i Selected Meshes"
-
-    # HACK, loop until mouse is lifted.
-    '''
-    while Window.GetMouseButtons() != 0:
-        time.sleep(10)
-    '''
-
-#~ XXX	if not Draw.PupBlock(ob % len(obList), pup_block):
-#~ XXX		return
-#~ XXX	del ob
-
-    # Convert from being button types
-
-    USER_PROJECTION_LIMIT_CONVERTED = cos(USER_PROJECTION_LIMIT * DEG_TO_RAD)
-    USER_PROJECTION_LIMIT_HALF_CONVERTED = cos((USER_PROJECTION_LIMIT/2) * DEG_TO_RAD)
-
-
     # Toggle Edit mode
-    is_editmode = (context.active_object.mode == 'EDIT')
     if is_editmode:
         bpy.ops.object.mode_set(mode='OBJECT')
     # Assume face select mode! an annoying hack to toggle face select mode because Mesh doesn't like faceSelectMode.
 
-    if USER_SHARE_SPACE:
+    if settings.share_space:
         # Sort by data name so we get consistent results
         obList.sort(key = lambda ob: ob.data.name)
-        collected_islandList= []
 
 #XXX	Window.WaitCursor(1)
 
@@ -791,7 +1125,7 @@ def main(context,
     for me in bpy.data.meshes:
         me.tag = False
 
-
+    meshList = []
     for ob in obList:
         me = ob.data
 
@@ -804,190 +1138,34 @@ def main(context,
         if not me.uv_textures: # Mesh has no UV Coords, don't bother.
             me.uv_textures.new()
 
-        uv_layer = me.uv_layers.active.data
-        me_verts = list(me.vertices)
-
-        if USER_ONLY_SELECTED_FACES:
-            meshFaces = [thickface(f, uv_layer, me_verts) for i, f in enumerate(me.polygons) if f.select]
-        else:
-            meshFaces = [thickface(f, uv_layer, me_verts) for i, f in enumerate(me.polygons)]
-
-        if not meshFaces:
-            continue
-
-#XXX		Window.DrawProgressBar(0.1, 'SmartProj UV Unwrapper, mapping "%s", %i faces.' % (me.name, len(meshFaces)))
-
-        # =======
-        # Generate a projection list from face normals, this is meant to be smart :)
-
-        # make a list of face props that are in sync with meshFaces
-        # Make a Face List that is sorted by area.
-        # meshFaces = []
-
-        # meshFaces.sort( lambda a, b: cmp(b.area , a.area) ) # Biggest first.
-        meshFaces.sort(key=lambda a: -a.area)
-
-        # remove all zero area faces
-        while meshFaces and meshFaces[-1].area <= SMALL_NUM:
-            # Set their UV's to 0,0
-            for uv in meshFaces[-1].uv:
-                uv.zero()
-            meshFaces.pop()
-
-        # Smallest first is slightly more efficient, but if the user cancels early then its better we work on the larger data.
-
-        # Generate Projection Vecs
-        # 0d is   1.0
-        # 180 IS -0.59846
-
-
-        # Initialize projectVecs
-        if USER_VIEW_INIT:
-            # Generate Projection
-            projectVecs = [Vector(Window.GetViewVector()) * ob.matrix_world.inverted().to_3x3()] # We add to this along the way
-        else:
-            projectVecs = []
-
-        newProjectVec = meshFaces[0].no
-        newProjectMeshFaces = []	# Popping stuffs it up.
-
-
-        # Pretend that the most unique angle is ages away to start the loop off
-        mostUniqueAngle = -1.0
-
-        # This is popped
-        tempMeshFaces = meshFaces[:]
-
-
-
-        # This while only gathers projection vecs, faces are assigned later on.
-        while 1:
-            # If theres none there then start with the largest face
-
-            # add all the faces that are close.
-            for fIdx in range(len(tempMeshFaces)-1, -1, -1):
-                # Use half the angle limit so we don't overweight faces towards this
-                # normal and hog all the faces.
-                if newProjectVec.dot(tempMeshFaces[fIdx].no) > USER_PROJECTION_LIMIT_HALF_CONVERTED:
-                    newProjectMeshFaces.append(tempMeshFaces.pop(fIdx))
-
-            # Add the average of all these faces normals as a projectionVec
-            averageVec = Vector((0.0, 0.0, 0.0))
-            if user_area_weight == 0.0:
-                for fprop in newProjectMeshFaces:
-                    averageVec += fprop.no
-            elif user_area_weight == 1.0:
-                for fprop in newProjectMeshFaces:
-                    averageVec += fprop.no * fprop.area
-            else:
-                for fprop in newProjectMeshFaces:
-                    averageVec += fprop.no * ((fprop.area * user_area_weight) + (1.0 - user_area_weight))
-
-            if averageVec.x != 0 or averageVec.y != 0 or averageVec.z != 0: # Avoid NAN
-                projectVecs.append(averageVec.normalized())
-
-
-            # Get the next vec!
-            # Pick the face thats most different to all existing angles :)
-            mostUniqueAngle = 1.0 # 1.0 is 0d. no difference.
-            mostUniqueIndex = 0 # dummy
-
-            for fIdx in range(len(tempMeshFaces)-1, -1, -1):
-                angleDifference = -1.0 # 180d difference.
+        meshList.append(me)
 
-                # Get the closest vec angle we are to.
-                for p in projectVecs:
-                    temp_angle_diff= p.dot(tempMeshFaces[fIdx].no)
+    # extract all mesh data, then project & pack without accessing blender data
+    mesh_datas = [MeshProjectionData(me, settings.only_selected_faces) for me in meshList]
+    mesh_datas_used = [data for data in mesh_datas if data.face_loop_start]
 
-                    if angleDifference < temp_angle_diff:
-                        angleDifference= temp_angle_diff
+    results = project_meshes(mesh_datas_used, settings, processes=os.cpu_count() or 1)
 
-                if angleDifference < mostUniqueAngle:
-                    # We have a new most different angle
-                    mostUniqueIndex = fIdx
-                    mostUniqueAngle = angleDifference
+    pack_projections(mesh_datas_used, results, settings)
 
-            if mostUniqueAngle < USER_PROJECTION_LIMIT_CONVERTED:
-                #print 'adding', mostUniqueAngle, USER_PROJECTION_LIMIT, len(newProjectMeshFaces)
-                # Now weight the vector to all its faces, will give a more direct projection
-                # if the face its self was not representative of the normal from surrounding faces.
-
-                newProjectVec = tempMeshFaces[mostUniqueIndex].no
-                newProjectMeshFaces = [tempMeshFaces.pop(mostUniqueIndex)]
-
-
-            else:
-                if len(projectVecs) >= 1: # Must have at least 2 projections
-                    break
-
-
-        # If there are only zero area faces then its possible
-        # there are no projectionVecs
-        if not len(projectVecs):
-            Draw.PupMenu('error, no projection vecs where generated, 0 area faces can cause this.')
-            return
-
-        faceProjectionGroupList =[[] for i in range(len(projectVecs)) ]
-
-        # MAP and Arrange # We know there are 3 or 4 faces here
-
-        for fIdx in range(len(meshFaces)-1, -1, -1):
-            fvec = meshFaces[fIdx].no
-            i = len(projectVecs)
-
-            # Initialize first
-            bestAng = fvec.dot(projectVecs[0])
-            bestAngIdx = 0
-
-            # Cycle through the remaining, first already done
-            while i-1:
-                i-=1
-
-                newAng = fvec.dot(projectVecs[i])
-                if newAng > bestAng: # Reverse logic for dotvecs
-                    bestAng = newAng
-                    bestAngIdx = i
-
-            # Store the area for later use.
-            faceProjectionGroupList[bestAngIdx].append(meshFaces[fIdx])
-
-        # Cull faceProjectionGroupList,
-
-
-        # Now faceProjectionGroupList is full of faces that face match the project Vecs list
-        for i in range(len(projectVecs)):
-            # Account for projectVecs having no faces.
-            if not faceProjectionGroupList[i]:
-                continue
-
-            # Make a projection matrix from a unit length vector.
-            MatQuat = VectoQuat(projectVecs[i])
-
-            # Get the faces UV's from the projected vertex.
-            for f in faceProjectionGroupList[i]:
-                f_uv = f.uv
-                for j, v in enumerate(f.v):
-                    # XXX - note, between mathutils in 2.4 and 2.5 the order changed.
-                    f_uv[j][:] = (MatQuat * v.co).xy
-
-
-        if USER_SHARE_SPACE:
-            # Should we collect and pack later?
-            islandList = getUvIslands(faceProjectionGroupList, me)
-            collected_islandList.extend(islandList)
-
-        else:
-            # Should we pack the islands for this 1 object?
-            islandList = getUvIslands(faceProjectionGroupList, me)
-            packIslands(islandList)
-
-
-        # update the mesh here if we need to.
+    # write the UVs of the projected faces back
+    mesh_skipped = []
+    results_map = {id(data): result for data, result in zip(mesh_datas_used, results)}
+    for me, data in zip(meshList, mesh_datas):
+        result = results_map.get(id(data))
+        if result is None:
+            if data.face_loop_start:
+                mesh_skipped.append(me.name)
+            continue
 
-    # We want to pack all in 1 go, so pack now
-    if USER_SHARE_SPACE:
-#XXX        Window.DrawProgressBar(0.9, "Box Packing for all objects...")
-        packIslands(collected_islandList)
+        uv_layer = me.uv_layers.active.data
+        uvs = array.array('f', [0.0]) * (len(uv_layer) * 2)
+        uv_layer.foreach_get("uv", uvs)
+        uv_index = 0
+        for loop_start, loop_total in zip(data.face_loop_start, data.face_loop_total):
+            uvs[loop_start * 2:(loop_start + loop_total) * 2] = result[0][uv_index:uv_index + loop_total * 2]
+            uv_index += loop_total * 2
+        uv_layer.foreach_set("uv", uvs)
 
     print("Smart Projection time: %.2f" % (time.time() - time1))
     # Window.DrawProgressBar(0.9, "Smart Projections done, time: %.2f sec" % (time.time() - time1))
@@ -1017,7 +1195,7 @@ def main(context,
                    l[uv_act].uv[0] *= aspect[0]
                    l[uv_act].uv[1] *= aspect[1]
 
-    dict_matrix.clear()
+    return mesh_skipped
 
 #XXX	Window.DrawProgressBar(1.0, "")
 #XXX	Window.WaitCursor(0)
@@ -1039,7 +1217,7 @@ def main(context,
     ]
 """
 
-from bpy.props import FloatProperty, BoolProperty
+from bpy.props import FloatProperty, BoolProperty, IntProperty, EnumProperty
 
 
 class SmartProject(Operator):
@@ -1073,18 +1251,68 @@ class SmartProject(Operator):
             description="Map UVs taking image aspect ratio into account",
             default=True
             )
+    use_fill_holes = BoolProperty(
+            name="Fill Holes",
+            description="Pack smaller islands into the empty areas of larger ones, "
+                        "to reduce texture wastage (slower)",
+            default=False,
+            )
+    fill_holes_quality = IntProperty(
+            name="Fill Quality",
+            description="How tightly to fill the holes of islands, "
+                        "higher tests more placements and is slower",
+            min=1, max=100,
+            default=50,
+            )
+    use_rotate = BoolProperty(
+            name="Rotate Islands",
+            description="Rotate islands by 90 degrees when they pack tighter",
+            default=False,
+            )
+    margin_pixels = IntProperty(
+            name="Margin Pixels",
+            description="Margin between islands in pixels of an image of Image Size, "
+                        "used instead of Island Margin when set",
+            min=0, max=64,
+            default=0,
+            )
+    image_size = IntProperty(
+            name="Image Size",
+            description="Size of the image the margin in pixels is for",
+            min=64, max=16384,
+            default=1024,
+            )
+    pack_method = EnumProperty(
+            name="Pack Method",
+            items=(('AUTO', "Automatic", "Skyline for up to a few thousand islands, "
+                                        "Box Pack for more"),
+                   ('SKYLINE', "Skyline", "Tight packing, slow for many islands"),
+                   ('BOX_PACK_2D', "Box Pack", "Fast packing, islands aren't rotated"),
+                   ),
+            default='AUTO',
+            )
 
     @classmethod
     def poll(cls, context):
         return context.active_object is not None
 
     def execute(self, context):
-        main(context,
-             self.island_margin,
-             self.angle_limit,
-             self.user_area_weight,
-             self.use_aspect
-             )
+        mesh_skipped = main(context,
+                            self.island_margin,
+                            self.angle_limit,
+                            self.user_area_weight,
+                            self.use_aspect,
+                            self.use_fill_holes,
+                            self.fill_holes_quality,
+                            self.use_rotate,
+                            self.margin_pixels,
+                            self.image_size,
+                            self.pack_method,
+                            )
+        if mesh_skipped:
+            self.report({'WARNING'},
+                        "No projections for %s, 0 area faces can cause this" %
+                        ", ".join(mesh_skipped))
         return {'FINISHED'}
 
     def invoke(self, context, event):
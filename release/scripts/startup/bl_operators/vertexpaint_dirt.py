@@ -24,42 +24,83 @@
 # Contributor(s): Keith "Wahooney" Boshoff, Campbell Barton
 
 
-def applyVertexDirt(me, blur_iterations, blur_strength, clamp_dirt, clamp_clean, dirt_only):
-    from mathutils import Vector
-    from math import acos
+def _segment_sums(values, offsets):
+    """
+    Sums of values[offsets[i]:offsets[i + 1]] for each i,
+    from the differences of the running totals.
+    """
+    from itertools import accumulate
+    from operator import sub
     import array
 
-    vert_tone = array.array("f", [0.0]) * len(me.vertices)
-
-    # create lookup table for each vertex's connected vertices (via edges)
-    con = []
-
-    con = [[] for i in range(len(me.vertices))]
+    totals = array.array("d", [0.0])
+    totals.extend(accumulate(values))
+    totals_get = totals.__getitem__
+    return list(map(sub,
+                    map(totals_get, offsets[1:]),
+                    map(totals_get, offsets[:-1])))
 
-    # add connected verts
-    for e in me.edges:
-        con[e.vertices[0]].append(e.vertices[1])
-        con[e.vertices[1]].append(e.vertices[0])
 
-    for i, v in enumerate(me.vertices):
-        vec = Vector()
-        no = v.normal
-        co = v.co
-
-        # get the direction of the vectors between the vertex and it's connected vertices
-        for c in con[i]:
-            vec += (me.vertices[c].co - co).normalized()
+def applyVertexDirt(me, blur_iterations, blur_strength, clamp_dirt, clamp_clean, dirt_only):
+    from math import acos, sqrt
+    from itertools import accumulate, repeat
+    from operator import add, mul
+    from collections import Counter
+    import array
 
+    tot_vert = len(me.vertices)
+
+    vert_co = array.array("f", [0.0]) * (tot_vert * 3)
+    vert_no = array.array("f", [0.0]) * (tot_vert * 3)
+    me.vertices.foreach_get("co", vert_co)
+    me.vertices.foreach_get("normal", vert_no)
+
+    edge_verts = array.array("i", [0]) * (len(me.edges) * 2)
+    me.edges.foreach_get("vertices", edge_verts)
+
+    # create lookup table for each vertex's connected vertices (via edges),
+    # as compressed rows: the connected verts of vertex i are
+    # con[con_offsets[i]:con_offsets[i + 1]], in the order of the edges.
+    # each edge has 2 sides, side h belongs to edge_verts[h]
+    con_sides = sorted(range(len(edge_verts)), key=edge_verts.__getitem__)
+    edge_verts_other = edge_verts[:]
+    edge_verts_other[0::2] = edge_verts[1::2]
+    edge_verts_other[1::2] = edge_verts[0::2]
+    con = list(map(edge_verts_other.__getitem__, con_sides))
+
+    tot_con = [0] * tot_vert
+    for i, count in Counter(edge_verts).items():
+        tot_con[i] = count
+    con_offsets = [0]
+    con_offsets.extend(accumulate(tot_con))
+
+    # the normalized direction of each edge, as Vector.normalized()
+    # zero length edges have no direction
+    edge_dirs = []
+    for axis in range(3):
+        co = vert_co[axis::3]
+        edge_dirs.append([co[v2] - co[v1] for v1, v2 in zip(edge_verts[0::2], edge_verts[1::2])])
+    edge_len = [sqrt(x * x + y * y + z * z) for x, y, z in zip(*edge_dirs)]
+    edge_len = [1.0 / length if length else 0.0 for length in edge_len]
+
+    # get the direction of the vectors between the vertex and it's connected vertices,
+    # the direction is negated for the second side of each edge
+    vec = []
+    for d in edge_dirs:
+        side_d = array.array("d", [0.0]) * len(edge_verts)
+        side_d[0::2] = array.array("d", map(mul, d, edge_len))
+        side_d[1::2] = array.array("d", [-x for x in side_d[0::2]])
+        vec.append(_segment_sums(map(side_d.__getitem__, con_sides), con_offsets))
+
+    vert_tone = array.array("f", [0.0]) * tot_vert
+    for i, (vx, vy, vz) in enumerate(zip(*vec)):
         # normalize the vector by dividing by the number of connected verts
-        tot_con = len(con[i])
-
-        if tot_con == 0:
+        if tot_con[i] == 0:
             continue
 
-        vec /= tot_con
-
         # angle is the acos() of the dot product between vert and connected verts normals
-        ang = acos(no.dot(vec))
+        dot = (vert_no[i * 3] * vx + vert_no[i * 3 + 1] * vy + vert_no[i * 3 + 2] * vz) / tot_con[i]
+        ang = acos(max(-1.0, min(1.0, dot)))
 
         # enforce min/max
         ang = max(clamp_dirt, ang)
@@ -69,18 +110,14 @@ def applyVertexDirt(me, blur_iterations, blur_strength, clamp_dirt, clamp_clean,
 
         vert_tone[i] = ang
 
-    # blur tones
+    # blur tones, each vertex is averaged with its connected verts:
+    # (tone + strength * sum(connected tones)) / (connected * strength + 1)
+    blur_weights = [1.0 / (c * blur_strength + 1) for c in tot_con]
     for i in range(blur_iterations):
-        # backup the original tones
-        orig_vert_tone = vert_tone[:]
-
-        # use connected verts look up for blurring
-        for j, c in enumerate(con):
-            for v in c:
-                vert_tone[j] += blur_strength * orig_vert_tone[v]
-
-            vert_tone[j] /= len(c) * blur_strength + 1
-        del orig_vert_tone
+        con_tone = _segment_sums(map(vert_tone.__getitem__, con), con_offsets)
+        vert_tone = array.array("f", map(mul,
+                                         map(add, vert_tone, map(mul, con_tone, repeat(blur_strength))),
+                                         blur_weights))
 
     min_tone = min(vert_tone)
     max_tone = max(vert_tone)
@@ -108,21 +145,39 @@ def applyVertexDirt(me, blur_iterations, blur_strength, clamp_dirt, clamp_clean,
         return {'CANCELLED'}
 
     use_paint_mask = me.use_paint_mask
-    for i, p in enumerate(me.polygons):
-        if not use_paint_mask or p.select:
-            for loop_index in p.loop_indices:
-                loop = me.loops[loop_index]
-                v = loop.vertex_index
-                col = active_col_layer[loop_index].color
-                tone = vert_tone[v]
-                tone = (tone - min_tone) * tone_range
-
-                if dirt_only:
-                    tone = min(tone, 0.5) * 2.0
-
-                col[0] = tone * col[0]
-                col[1] = tone * col[1]
-                col[2] = tone * col[2]
+
+    # tone of each vertex, mapped to the tone range
+    for i, tone in enumerate(vert_tone):
+        tone = (tone - min_tone) * tone_range
+
+        if dirt_only:
+            tone = min(tone, 0.5) * 2.0
+
+        vert_tone[i] = tone
+
+    tot_loop = len(me.loops)
+    loop_verts = array.array("i", [0]) * tot_loop
+    me.loops.foreach_get("vertex_index", loop_verts)
+    loop_tone = array.array("d", map(vert_tone.__getitem__, loop_verts))
+
+    if use_paint_mask:
+        tot_poly = len(me.polygons)
+        poly_select = [False] * tot_poly
+        poly_loop_start = array.array("i", [0]) * tot_poly
+        poly_loop_total = array.array("i", [0]) * tot_poly
+        me.polygons.foreach_get("select", poly_select)
+        me.polygons.foreach_get("loop_start", poly_loop_start)
+        me.polygons.foreach_get("loop_total", poly_loop_total)
+        for select, loop_start, loop_total in zip(poly_select, poly_loop_start, poly_loop_total):
+            if not select:
+                loop_tone[loop_start:loop_start + loop_total] = array.array("d", [1.0]) * loop_total
+
+    loop_col = array.array("f", [0.0]) * (tot_loop * 3)
+    active_col_layer.foreach_get("color", loop_col)
+    for i in range(3):
+        loop_col[i::3] = array.array("f", map(mul, loop_col[i::3], loop_tone))
+    active_col_layer.foreach_set("color", loop_col)
+
     me.update()
     return {'FINISHED'}
 
@@ -0,0 +1,154 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Times Mesh.from_pydata and Mesh.from_pydata_flat against setting
+the polygons one at a time, and checks all make the same mesh.
+
+Example Usage:
+
+./blender.bin --background -noaudio --factory-startup \
+    --python tests/python/bl_mesh_from_pydata_benchmark.py -- --size=500
+"""
+
+import bpy
+
+import sys
+import time
+import array
+
+
+def grid_pydata(size):
+    """ quads with a row of triangles, as nested lists """
+    verts = [(x, y, 0.0) for y in range(size + 1) for x in range(size + 1)]
+    faces = []
+    for y in range(size):
+        for x in range(size):
+            v1 = y * (size + 1) + x
+            v2, v3, v4 = v1 + 1, v1 + size + 2, v1 + size + 1
+            if y == 0:
+                faces.append((v1, v2, v3))
+                faces.append((v1, v3, v4))
+            else:
+                faces.append((v1, v2, v3, v4))
+    return verts, faces
+
+
+def from_pydata_per_polygon(me, vertices, edges, faces):
+    """ the polygons written one at a time, as from_pydata used to """
+    me.vertices.add(len(vertices))
+    me.edges.add(len(edges))
+    me.loops.add(sum((len(f) for f in faces)))
+    me.polygons.add(len(faces))
+
+    me.vertices.foreach_set("co", [f for v in vertices for f in v])
+    me.edges.foreach_set("vertices", [i for e in edges for i in e])
+
+    loop_index = 0
+    for i, p in enumerate(me.polygons):
+        f = faces[i]
+        loop_len = len(f)
+        p.loop_start = loop_index
+        p.loop_total = loop_len
+        p.vertices = f
+        loop_index += loop_len
+
+    if faces and (not edges):
+        me.update(calc_edges=True)
+
+
+def mesh_data(me):
+    def get(seq, attr, typecode, size):
+        data = array.array(typecode, [0]) * (len(seq) * size)
+        seq.foreach_get(attr, data)
+        return data
+
+    return (get(me.vertices, "co", 'f', 3),
+            sorted(ed.key for ed in me.edges),
+            get(me.loops, "vertex_index", 'i', 1),
+            get(me.polygons, "loop_start", 'i', 1),
+            get(me.polygons, "loop_total", 'i', 1))
+
+
+def test_from_pydata(size):
+    verts, faces = grid_pydata(size)
+
+    verts_flat = array.array('f', [f for v in verts for f in v])
+    loops_flat = array.array('i', [i for f in faces for i in f])
+    totals = array.array('i', [len(f) for f in faces])
+
+    results = []
+    for name, make in (
+            ("per polygon",
+             lambda me: from_pydata_per_polygon(me, verts, [], faces)),
+            ("from_pydata",
+             lambda me: me.from_pydata(verts, [], faces)),
+            ("from_pydata_flat",
+             lambda me: me.from_pydata_flat(verts_flat, loops_flat, totals)),
+            ):
+        me = bpy.data.meshes.new(name)
+        t = time.time()
+        make(me)
+        elapsed = time.time() - t
+        assert not me.validate()
+        results.append(mesh_data(me))
+        bpy.data.meshes.remove(me)
+        print("  %s: %.4f s" % (name, elapsed))
+
+    assert results[0] == results[1] == results[2]
+
+
+def test_from_pydata_invalid():
+    me = bpy.data.meshes.new("Invalid")
+    for args in (([0.0] * 4, [0, 1, 2], [3]),
+                 ([0.0] * 9, [0, 1, 3], [3]),
+                 ([0.0] * 9, [0, 1, 2], [4])):
+        try:
+            me.from_pydata_flat(*args)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError for %r" % (args,))
+    # the mesh isn't changed by invalid data
+    assert len(me.vertices) == 0
+    bpy.data.meshes.remove(me)
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    size = 200
+    for arg in argv:
+        if arg.startswith("--size="):
+            size = int(arg.split("=", 1)[1])
+
+    print("Grid: %d quads" % (size * size))
+    test_from_pydata(size)
+    test_from_pydata_invalid()
+
+    print("Finished!")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except:
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,310 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Times the functions of bpy_extras.mesh_utils on generated meshes,
+and checks their results against simple reference implementations.
+
+Example Usage:
+
+./blender.bin --background -noaudio --factory-startup \
+    --python tests/python/bl_mesh_utils_benchmark.py -- --size=200
+"""
+
+import bpy
+
+import sys
+import time
+
+from bpy_extras import mesh_utils
+
+
+def mesh_grid(name, size):
+    """ a single connected grid of size * size quads, with one uv island """
+    verts = [(x, y, 0.0) for y in range(size + 1) for x in range(size + 1)]
+    faces = [(y * (size + 1) + x,
+              y * (size + 1) + x + 1,
+              (y + 1) * (size + 1) + x + 1,
+              (y + 1) * (size + 1) + x)
+             for y in range(size) for x in range(size)]
+    return mesh_from_pydata(name, verts, faces)
+
+
+def mesh_cubes(name, count):
+    """ count disconnected cubes, each cube is a uv island """
+    cube_verts = [(x, y, z) for z in (0, 1) for y in (0, 1) for x in (0, 1)]
+    cube_faces = ((0, 2, 3, 1), (4, 5, 7, 6), (0, 1, 5, 4),
+                  (1, 3, 7, 5), (3, 2, 6, 7), (2, 0, 4, 6))
+    verts = []
+    faces = []
+    for i in range(count):
+        offset = len(verts)
+        verts.extend((x + i * 2, y, z) for x, y, z in cube_verts)
+        faces.extend(tuple(v + offset for v in f) for f in cube_faces)
+    return mesh_from_pydata(name, verts, faces)
+
+
+def mesh_from_pydata(name, verts, faces):
+    me = bpy.data.meshes.new(name)
+    me.from_pydata(verts, [], faces)
+    me.update(calc_tessface=True)
+
+    # uv's from the vertex locations, so uv islands match the connected parts
+    me.uv_textures.new()
+    uv_data = me.uv_layers.active.data
+    vert_co = me.vertices
+    for l in me.loops:
+        co = vert_co[l.vertex_index].co
+        uv_data[l.index].uv = co.x + co.z * 0.5, co.y + co.z * 0.25
+    return me
+
+
+def reference_groups(element_keys):
+    """ flood fill, groups elements sharing a key """
+    key_elements = {}
+    for i, keys in enumerate(element_keys):
+        for k in keys:
+            key_elements.setdefault(k, []).append(i)
+
+    tag = [False] * len(element_keys)
+    groups = []
+    for i in range(len(element_keys)):
+        if tag[i]:
+            continue
+        tag[i] = True
+        group = [i]
+        stack = [i]
+        while stack:
+            for k in element_keys[stack.pop()]:
+                for j in key_elements[k]:
+                    if not tag[j]:
+                        tag[j] = True
+                        group.append(j)
+                        stack.append(j)
+        groups.append(group)
+    return groups
+
+
+def as_sets(groups):
+    return sorted(sorted(g) for g in groups)
+
+
+def test_linked_uv_islands(me):
+    uv_data = me.uv_layers.active.data
+    poly_uvs = [[uv_data[li].uv[:] for li in p.loop_indices]
+                for p in me.polygons]
+
+    t = time.time()
+    islands = mesh_utils.mesh_linked_uv_islands(me)
+    elapsed = time.time() - t
+
+    assert as_sets(islands) == as_sets(reference_groups(poly_uvs))
+    return elapsed
+
+
+def test_linked_tessfaces(me):
+    face_verts = [f.vertices[:] for f in me.tessfaces]
+
+    t = time.time()
+    groups = mesh_utils.mesh_linked_tessfaces(me)
+    elapsed = time.time() - t
+
+    groups = [[f.index for f in g] for g in groups]
+    assert as_sets(groups) == as_sets(reference_groups(face_verts))
+    return elapsed
+
+
+def test_edge_face_count(me):
+    edge_keys = [ed.key for ed in me.edges]
+    reference = {}
+    for p in me.polygons:
+        for key in p.edge_keys:
+            reference[key] = reference.get(key, 0) + 1
+
+    t = time.time()
+    face_edge_count = mesh_utils.edge_face_count(me)
+    face_edge_count_dict = mesh_utils.edge_face_count_dict(me)
+    elapsed = time.time() - t
+
+    assert face_edge_count == [reference.get(key, 0) for key in edge_keys]
+    assert face_edge_count_dict == reference
+    return elapsed
+
+
+def test_edge_keys(me):
+    t = time.time()
+    edge_keys = me.edge_keys
+    polygon_edge_keys = me.polygon_edge_keys
+    elapsed = time.time() - t
+
+    assert edge_keys == [ed.key for ed in me.edges]
+    assert [list(keys) for keys in polygon_edge_keys] == \
+        [p.edge_keys for p in me.polygons]
+
+    # tables follow changes to the edges
+    ed = me.edges[0]
+    ed.vertices = ed.vertices[1], len(me.vertices) - 1
+    assert me.edge_keys[0] == ed.key
+    assert me.edge_keys[1:] == edge_keys[1:]
+    return elapsed
+
+
+def test_edge_loops(me):
+    t = time.time()
+    line_polys = mesh_utils.edge_loops_from_edges(me)
+    edge_loops = mesh_utils.edge_loops_from_tessfaces(me)
+    elapsed = time.time() - t
+
+    # every edge is used by exactly one line
+    line_edges = sorted((v1, v2) if v1 < v2 else (v2, v1)
+                        for line in line_polys
+                        for v1, v2 in zip(line, line[1:]))
+    assert line_edges == sorted(ed.key for ed in me.edges)
+
+    verts, totals = mesh_utils.edge_loops_from_edges(me, use_arrays=True)
+    assert len(verts) == sum(totals) == len(line_edges) + len(totals)
+
+    # loops only contain mesh edges
+    edge_keys = set(ed.key for ed in me.edges)
+    assert all(edkey in edge_keys for loop in edge_loops for edkey in loop)
+    return elapsed
+
+
+def test_ngon_tessellate_batch(me):
+    polygons = [p.vertices[:] for p in me.polygons]
+    indices = [i for p in polygons for i in p]
+    polygon_totals = [len(p) for p in polygons]
+
+    t = time.time()
+    tris, tri_totals = mesh_utils.ngon_tessellate_batch(me, indices,
+                                                        polygon_totals)
+    elapsed = time.time() - t
+
+    tri_index = 0
+    start = 0
+    for p, tri_total in zip(polygons, tri_totals):
+        fill = sorted(tuple(f) for f in mesh_utils.ngon_tessellate(me, p))
+        fill_batch = sorted(
+            tuple(i - start for i in tris[j:j + 3])
+            for j in range(tri_index, tri_index + tri_total * 3, 3))
+        assert fill == fill_batch
+        tri_index += tri_total * 3
+        start += len(p)
+    return elapsed
+
+
+def fill_area(vert_co, polyline, fill):
+    """ area of the triangles of a fill, in the xy plane """
+    area = 0.0
+    for f in fill:
+        (x0, y0, z0), (x1, y1, z1), (x2, y2, z2) = [vert_co[polyline[i]]
+                                                    for i in f]
+        area += abs((x1 - x0) * (y2 - y0) - (x2 - x0) * (y1 - y0)) * 0.5
+    return area
+
+
+def test_ngon_tessellate_loops():
+    """ polylines using edges twice or repeating vertices,
+    split and joined by fix_loops """
+    vert_co = [(0.0, 0.0, 0.0), (4.0, 0.0, 0.0),
+               (4.0, 4.0, 0.0), (0.0, 4.0, 0.0),
+               (1.0, 1.0, 0.0), (3.0, 1.0, 0.0),
+               (3.0, 3.0, 0.0), (1.0, 3.0, 0.0),
+               # same location as 1
+               (4.0, 0.0, 0.0)]
+
+    # (polyline, area)
+    polylines = (
+        # a square with a square hole, bridged by the edge 3-7 used twice
+        ((0, 1, 2, 3, 7, 4, 5, 6, 7, 3), 12.0),
+        # the hole bridged from the other side of the loop
+        ((3, 0, 1, 2, 6, 7, 4, 5, 6, 2), 12.0),
+        # repeated vertices, by index and by location
+        ((0, 1, 1, 8, 2, 3), 16.0),
+        )
+
+    t = time.time()
+    for polyline, area in polylines:
+        tris, tri_totals = mesh_utils.ngon_tessellate_batch(
+            vert_co, polyline, [len(polyline)])
+        fill_batch = [tris[j:j + 3] for j in range(0, len(tris), 3)]
+        assert tri_totals[0] == len(fill_batch)
+
+        fill = mesh_utils.ngon_tessellate(vert_co, polyline)
+
+        # the loops may be filled from other vertices, compare the areas
+        assert abs(fill_area(vert_co, polyline, fill) - area) < 1e-4
+        assert abs(fill_area(vert_co, polyline, fill_batch) - area) < 1e-4
+        assert (set(vert_co[polyline[i]] for f in fill for i in f) ==
+                set(vert_co[polyline[i]] for f in fill_batch for i in f))
+    return time.time() - t
+
+
+def test_mesh_random_points(me):
+    num_points = len(me.polygons) * 10
+
+    t = time.time()
+    points = mesh_utils.mesh_random_points(me, num_points, seed=1)
+    elapsed = time.time() - t
+
+    assert len(points) == num_points * 3
+    assert points == mesh_utils.mesh_random_points(me, num_points, seed=1,
+                                                   processes=2)
+    assert points != mesh_utils.mesh_random_points(me, num_points, seed=2)
+
+    # all points are inside the bounds of the mesh
+    for axis in range(3):
+        co = [v.co[axis] for v in me.vertices]
+        lo, hi = min(co) - 1e-4, max(co) + 1e-4
+        assert all(lo <= x <= hi for x in points[axis::3])
+    return elapsed
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    size = 100
+    for arg in argv:
+        if arg.startswith("--size="):
+            size = int(arg.split("=", 1)[1])
+
+    for me in (mesh_grid("Grid", size), mesh_cubes("Cubes", size * size // 6)):
+        print("%s: %d verts, %d polygons" % (me.name, len(me.vertices), len(me.polygons)))
+        for test in (test_linked_uv_islands,
+                     test_linked_tessfaces,
+                     test_edge_face_count,
+                     test_edge_loops,
+                     test_edge_keys,
+                     test_ngon_tessellate_batch,
+                     test_mesh_random_points):
+            print("  %s: %.4f s" % (test.__name__, test(me)))
+        bpy.data.meshes.remove(me)
+
+    print("test_ngon_tessellate_loops: %.4f s" % test_ngon_tessellate_loops())
+
+    print("Finished!")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except:
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
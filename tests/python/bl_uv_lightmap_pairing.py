@@ -0,0 +1,59 @@
+# Apache License, Version 2.0
+
+# ./blender.bin --background -noaudio --python tests/python/bl_uv_lightmap_pairing.py -- --verbose
+import unittest
+import random
+
+from bl_operators.uvcalc_lightmap import (
+    trilensdiff,
+    tri_pairs_exhaustive,
+    tri_pairs_kdtree,
+    )
+
+
+def tri_lengths_random(count, seed):
+    """ (face, edge lengths, edge order) of each triangle, as Lightmap Pack makes them """
+    rng = random.Random(seed)
+    tri_lengths = []
+    for i in range(count):
+        lens = [rng.uniform(0.1, 2.0) for j in range(3)]
+        lens_order = sorted(range(3), key=lens.__getitem__)
+        tri_lengths.append((i, lens, lens_order))
+    return tri_lengths
+
+
+def tri_pairs_diff(tri_pairs):
+    return sum(trilensdiff(tri1, tri2) for tri1, tri2 in tri_pairs if tri2 is not None)
+
+
+class TriPairingTesting(unittest.TestCase):
+    def check_pairs(self, tri_lengths, tri_pairs):
+        faces = [tri[0] for tri_pair in tri_pairs for tri in tri_pair if tri is not None]
+        self.assertEqual(sorted(faces), [tri[0] for tri in tri_lengths])
+
+        unpaired = [tri_pair for tri_pair in tri_pairs if tri_pair[1] is None]
+        self.assertEqual(len(unpaired), len(tri_lengths) % 2)
+
+    def test_pairs_use_all(self):
+        for count in (0, 1, 2, 3, 10, 501):
+            tri_lengths = tri_lengths_random(count, count)
+            for tri_pairs_fn in (tri_pairs_exhaustive, tri_pairs_kdtree):
+                self.check_pairs(tri_lengths, tri_pairs_fn(tri_lengths))
+
+    def test_pairs_same_lengths(self):
+        tri_lengths = [(i, [1.0, 1.0, 1.0], [0, 1, 2]) for i in range(101)]
+        tri_pairs = tri_pairs_kdtree(tri_lengths)
+        self.check_pairs(tri_lengths, tri_pairs)
+        self.assertEqual(tri_pairs_diff(tri_pairs), 0.0)
+
+    def test_kdtree_close_to_exhaustive(self):
+        tri_lengths = tri_lengths_random(1501, 0)
+        diff_exhaustive = tri_pairs_diff(tri_pairs_exhaustive(tri_lengths))
+        diff_kdtree = tri_pairs_diff(tri_pairs_kdtree(tri_lengths))
+        self.assertLessEqual(diff_kdtree, diff_exhaustive * 1.01)
+
+
+if __name__ == '__main__':
+    import sys
+    sys.argv = [__file__] + (sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else [])
+    unittest.main()
@@ -0,0 +1,179 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Reports the pack efficiency and time of bpy_extras.uv_pack
+on generated sets of UV island bounds, and checks the boxes don't overlap.
+
+Example Usage:
+
+./blender.bin --background -noaudio --factory-startup \
+    --python tests/python/bl_uv_pack_benchmark.py -- --size=1000
+"""
+
+import sys
+import time
+import random
+import importlib.util
+
+from bpy_extras import uv_pack
+
+
+def boxes_random(count, rng):
+    """ islands of any proportion """
+    return ([rng.uniform(0.05, 1.0) for i in range(count)],
+            [rng.uniform(0.05, 1.0) for i in range(count)])
+
+
+def boxes_power_of_two(count, rng):
+    """ sizes as lightmap pack makes them """
+    return ([2 ** rng.randint(0, 4) for i in range(count)],
+            [2 ** rng.randint(0, 4) for i in range(count)])
+
+
+def boxes_thin(count, rng):
+    """ long strips, in both directions """
+    widths = []
+    heights = []
+    for i in range(count):
+        length, thickness = rng.uniform(0.5, 2.0), rng.uniform(0.02, 0.2)
+        if i % 2:
+            length, thickness = thickness, length
+        widths.append(length)
+        heights.append(thickness)
+    return widths, heights
+
+
+def check_overlap(widths, heights, packed, margin):
+    xs, ys, rotated, pack_width, pack_height = packed
+    eps = 1e-6 * max(pack_width, pack_height)
+    rects = []
+    for x, y, w, h, rot in zip(xs, ys, widths, heights, rotated):
+        if rot:
+            w, h = h, w
+        rects.append((x - margin, y - margin, x + w + margin, y + h + margin))
+        assert x - margin >= -eps and y - margin >= -eps
+        assert x + w + margin <= pack_width + eps
+        assert y + h + margin <= pack_height + eps
+
+    # sweep along x, only test boxes overlapping in x
+    rects.sort()
+    active = []
+    for rect in rects:
+        active = [other for other in active if other[2] > rect[0] + eps]
+        for other in active:
+            assert (other[3] <= rect[1] + eps or
+                    rect[3] <= other[1] + eps), (rect, other)
+        active.append(rect)
+
+
+def test_pack(widths, heights, **kwargs):
+    t = time.time()
+    packed = uv_pack.pack_boxes(widths, heights, **kwargs)
+    elapsed = time.time() - t
+
+    check_overlap(widths, heights, packed, kwargs.get("margin", 0.0)
+                  if not kwargs.get("image_size") else 0.0)
+
+    pack_width, pack_height = packed[3], packed[4]
+    area = sum(w * h for w, h in zip(widths, heights))
+    # the packing is scaled to a square, stretched or not
+    if kwargs.get("use_stretch", True):
+        efficiency = area / (pack_width * pack_height)
+    else:
+        efficiency = area / (max(pack_width, pack_height) ** 2)
+    return efficiency, elapsed
+
+
+def test_margin_texels(widths, heights):
+    margin, image_size = 2, 1024
+    packed = uv_pack.pack_boxes(widths, heights,
+                                margin=margin, image_size=image_size)
+    pack_width, pack_height = packed[3], packed[4]
+    scale = image_size / max(pack_width, pack_height)
+
+    # once scaled to the image, the space between boxes is at least
+    # 2 margins and the space to the bounds at least one, in texels
+    check_overlap(widths, heights, packed, margin / scale)
+
+
+def test_pack_uv_islands(rng):
+    import array
+    # 2 triangles per island, offsets of each island at a random place
+    uvs = array.array('f')
+    islands = []
+    for i in range(100):
+        x, y = rng.uniform(-5, 5), rng.uniform(-5, 5)
+        w, h = rng.uniform(0.1, 1.0), rng.uniform(0.1, 1.0)
+        islands.append(range(len(uvs), len(uvs) + 8, 2))
+        uvs.extend((x, y, x + w, y, x + w, y + h, x, y + h))
+
+    uv_pack.pack_uv_islands(uvs, islands, use_rotate=True)
+    assert all(-1e-6 <= c <= 1.0 + 1e-6 for c in uvs)
+
+    bounds = [uv_pack.uv_island_bounds(uvs, island) for island in islands]
+    check_overlap([maxx - minx for minx, miny, maxx, maxy in bounds],
+                  [maxy - miny for minx, miny, maxx, maxy in bounds],
+                  ([b[0] for b in bounds], [b[1] for b in bounds],
+                   [False] * len(bounds), 1.0, 1.0), 0.0)
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    size = 500
+    for arg in argv:
+        if arg.startswith("--size="):
+            size = int(arg.split("=", 1)[1])
+
+    methods = [
+        ("box_pack_2d", dict(method='BOX_PACK_2D')),
+        ("skyline", dict(method='SKYLINE', passes=1)),
+        ("skyline 4 passes", dict(method='SKYLINE', passes=4)),
+        ("skyline rotate", dict(method='SKYLINE', use_rotate=True)),
+        ("skyline margin", dict(method='SKYLINE', margin=0.01)),
+        ("auto", dict(method='AUTO')),
+        ]
+    if importlib.util.find_spec("mathutils") is None:
+        # running outside of blender, without box_pack_2d
+        methods = [(name, kwargs) for name, kwargs in methods
+                   if kwargs["method"] == 'SKYLINE']
+
+    rng = random.Random(0)
+    for gen in (boxes_random, boxes_power_of_two, boxes_thin):
+        widths, heights = gen(size, rng)
+        print("%s: %d boxes" % (gen.__name__, size))
+        for name, kwargs in methods:
+            efficiency, elapsed = test_pack(widths, heights, **kwargs)
+            print("  %-18s efficiency %5.1f%%, %.4f s" %
+                  (name, efficiency * 100.0, elapsed))
+        test_margin_texels(widths, heights)
+
+    test_pack_uv_islands(rng)
+
+    print("Finished!")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except:
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
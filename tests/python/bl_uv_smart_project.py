@@ -0,0 +1,279 @@
+# Apache License, Version 2.0
+
+# ./blender.bin --background -noaudio --python tests/python/bl_uv_smart_project.py -- --verbose
+import unittest
+import math
+
+import bpy
+from mathutils import Vector, geometry
+from bl_operators import uvcalc_smart_project
+from bl_operators.uvcalc_smart_project import (
+    MeshProjectionData,
+    SMALL_NUM,
+    SmartProjectSettings,
+    mergeUvIslands,
+    pack_projections,
+    pointInTri2D,
+    project_mesh,
+    project_meshes,
+    thickface,
+    )
+
+
+def mesh_from_pydata(name, verts, faces):
+    me = bpy.data.meshes.new(name)
+    me.from_pydata(verts, [], faces)
+    me.update(calc_edges=True)
+    return me
+
+
+def mesh_sphere(name, segments, rings, offset=0.0, jitter=0.0):
+    """ a sphere stretched along Y, so the projections aren't symmetric """
+    import random
+    rng = random.Random(0)
+    verts = [(offset, 0.0, 1.0)]
+    for j in range(1, rings):
+        theta = math.pi * j / rings
+        for i in range(segments):
+            phi = 2.0 * math.pi * i / segments
+            verts.append((offset + math.sin(theta) * math.cos(phi) + rng.uniform(-jitter, jitter),
+                          math.sin(theta) * math.sin(phi) * 1.3 + rng.uniform(-jitter, jitter),
+                          math.cos(theta) + rng.uniform(-jitter, jitter)))
+    verts.append((offset, 0.0, -1.0))
+
+    faces = [(0, 1 + i, 1 + (i + 1) % segments) for i in range(segments)]
+    for j in range(rings - 2):
+        ring = 1 + j * segments
+        for i in range(segments):
+            i_next = (i + 1) % segments
+            faces.append((ring + i, ring + segments + i, ring + segments + i_next, ring + i_next))
+    ring = 1 + (rings - 2) * segments
+    faces.extend((ring + i, len(verts) - 1, ring + (i + 1) % segments) for i in range(segments))
+    return mesh_from_pydata(name, verts, faces)
+
+
+def mesh_cube(name):
+    verts = [(x, y, z) for x in (-1.0, 1.0) for y in (-1.0, 1.0) for z in (-1.0, 1.0)]
+    faces = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    return mesh_from_pydata(name, verts, faces)
+
+
+def mesh_fold(name, angle):
+    """ two quads mirrored on the YZ plane, their normals angle degrees apart """
+    x = math.cos(math.radians(angle) / 2.0)
+    z = math.sin(math.radians(angle) / 2.0)
+    verts = [(-x, 0.0, z), (0.0, 0.0, 0.0), (x, 0.0, z), (-x, 1.0, z), (0.0, 1.0, 0.0), (x, 1.0, z)]
+    faces = [(0, 1, 4, 3), (1, 2, 5, 4)]
+    return mesh_from_pydata(name, verts, faces)
+
+
+def mesh_mirror(name, me):
+    """ a copy of me mirrored on the YZ plane (faces flipped so normals point outwards) """
+    verts = [(-v.co.x, v.co.y, v.co.z) for v in me.vertices]
+    faces = [tuple(reversed(p.vertices)) for p in me.polygons]
+    return mesh_from_pydata(name, verts, faces)
+
+
+def island_face(v, uv):
+    edge_keys = tuple((min(v[i - 1], v[i]), max(v[i - 1], v[i])) for i in range(len(v)))
+    area = abs(sum(uv[i - 1][0] * uv[i][1] - uv[i][0] * uv[i - 1][1] for i in range(len(uv)))) / 2.0
+    return thickface(v, [Vector(co) for co in uv], area, edge_keys, 0)
+
+
+def island_grid(columns, rows, size, offset=(0.0, 0.0), skip=lambda x, y: False):
+    """ quads of a grid, leaving out the cells skip returns True for """
+    faces = []
+    for y in range(rows):
+        for x in range(columns):
+            if not skip(x, y):
+                v_row = y * (columns + 1) + x
+                v = [v_row, v_row + 1, v_row + columns + 2, v_row + columns + 1]
+                uv = [(offset[0] + x_co * size, offset[1] + y_co * size)
+                      for x_co, y_co in ((x, y), (x + 1, y), (x + 1, y + 1), (x, y + 1))]
+                faces.append(island_face(v, uv))
+    return faces
+
+
+def islands_with_holes(seed):
+    """ frames with holes and small islands which can be put in them """
+    import random
+    rng = random.Random(seed)
+    islands = [
+        island_grid(10, 10, 0.1, skip=lambda x, y: 2 <= x < 8 and 2 <= y < 8),
+        island_grid(12, 8, 0.1, offset=(3.0, 1.0), skip=lambda x, y: 1 <= x < 11 and 1 <= y < 7),
+        island_grid(4, 4, 0.1, skip=lambda x, y: x > 0 and y > 0),
+        ]
+    for i in range(12):
+        size = rng.uniform(0.03, 0.08)
+        islands.append(island_grid(rng.randint(1, 3), rng.randint(1, 3), size,
+                                   offset=(rng.uniform(-5.0, 5.0), rng.uniform(-5.0, 5.0))))
+    for i in range(12):
+        uv = [(rng.uniform(0.0, 0.2), rng.uniform(0.0, 0.2)) for j in range(3)]
+        islands.append([island_face([0, 1, 2], uv)])
+    return islands
+
+
+def point_in_island(pt, faces, dict_matrix):
+    """ the test of every face, as it was before UvIslandIndex """
+    for f in faces:
+        f_uv = [Vector((uv.x, uv.y, 0.0)) for uv in f.uv]
+        if pointInTri2D(pt, f_uv[0], f_uv[1], f_uv[2], dict_matrix):
+            return True
+        if len(f_uv) == 4 and pointInTri2D(pt, f_uv[0], f_uv[2], f_uv[3], dict_matrix):
+            return True
+    return False
+
+
+def intersect_island_edges(edges, v1, v2):
+    """ the test of every edge, as it was before UvIslandIndex """
+    for seg in edges:
+        if geometry.intersect_line_line_2d(seg[0], seg[1], v1, v2):
+            return True
+    return False
+
+
+class UvIslandIndexTesting(unittest.TestCase):
+    def check_index(self, island, dict_matrix, points, edges):
+        index = island[8]
+        for pt in points:
+            self.assertEqual(index.point_inside(pt, dict_matrix),
+                             point_in_island(pt, island[0], dict_matrix))
+        for v1, v2 in edges:
+            self.assertEqual(index.intersect_edge(v1, v2),
+                             intersect_island_edges(island[6], v1, v2))
+
+    def check_merge(self, islands, settings):
+        """
+        Runs mergeUvIslands, comparing the index of both islands of every
+        intersection test with the tests of all faces and edges.
+        """
+        island_faces = {id(island): len(island) for island in islands}
+        island_intersect = uvcalc_smart_project.islandIntersectUvIsland
+        checks = {"all": 0, "merged": 0}
+        targets_checked = set()
+
+        def island_intersect_check(source, target, SourceOffset, dict_matrix):
+            offset = SourceOffset.to_3d()
+            self.check_index(target, dict_matrix,
+                             [pv + offset for pv in source[7]],
+                             [(SourceOffset + ed[0], SourceOffset + ed[1]) for ed in source[6]])
+            self.check_index(source, dict_matrix, [pv - offset for pv in target[7]], ())
+
+            # points and edges on the grid cell boundaries, once for each state of the target
+            target_key = id(target[0]), len(target[0])
+            if target_key not in targets_checked:
+                targets_checked.add(target_key)
+                size = target[8].cell_size
+                for y in range(int(target[5] / size) + 2):
+                    points = [Vector((x * size, y * size, 0.0)) for x in range(int(target[4] / size) + 2)]
+                    edges = [(pt_a.xy, pt_b.xy) for pt_a, pt_b in zip(points, points[1:])]
+                    edges += [(pt.xy, pt.xy + Vector((0.0, size))) for pt in points]
+                    self.check_index(target, dict_matrix, points, edges)
+
+            checks["all"] += 1
+            if len(target[0]) > island_faces[id(target[0])]:
+                checks["merged"] += 1
+            return island_intersect(source, target, SourceOffset, dict_matrix)
+
+        uvcalc_smart_project.islandIntersectUvIsland = island_intersect_check
+        try:
+            mergeUvIslands(islands, settings)
+        finally:
+            uvcalc_smart_project.islandIntersectUvIsland = island_intersect
+
+        return checks
+
+    def test_index_same_as_all_faces(self):
+        settings = SmartProjectSettings()
+        for quality in (1, 50, 100):
+            settings.fill_holes_quality = quality
+            islands = islands_with_holes(quality)
+            islands_len = len(islands)
+            checks = self.check_merge(islands, settings)
+            self.assertLess(len(islands), islands_len)
+            self.assertGreater(checks["all"], 0)
+            # the index of islands grown by merges is tested too
+            self.assertGreater(checks["merged"], 0)
+
+
+class ProjectMeshTesting(unittest.TestCase):
+    def setUp(self):
+        self.meshes = []
+
+    def tearDown(self):
+        for me in self.meshes:
+            bpy.data.meshes.remove(me)
+
+    def project(self, me, settings=None):
+        """ the islands of me, checking the packed UVs of every face """
+        if settings is None:
+            settings = SmartProjectSettings(island_margin=0.02, only_selected_faces=False)
+        self.meshes.append(me)
+        data = MeshProjectionData(me, False)
+        result = project_mesh(data, settings)
+        self.assertIsNotNone(result)
+        uvs, islands = result
+        islands = sorted(sorted(island) for island in islands)
+        self.assertEqual(sorted(f for island in islands for f in island), list(range(len(me.polygons))))
+
+        pack_projections([data], [result], settings)
+        for f, (loop_start, loop_total) in enumerate(zip(data.face_loop_start, data.face_loop_total)):
+            uv_start = sum(data.face_loop_total[:f]) * 2
+            face_uvs = uvs[uv_start:uv_start + loop_total * 2]
+            for uv in face_uvs:
+                self.assertGreaterEqual(uv, -1e-6)
+                self.assertLessEqual(uv, 1.0 + 1e-6)
+            if data.face_area[f] > SMALL_NUM:
+                # the face is projected, not left at a point
+                self.assertGreater(max(face_uvs[0::2]) - min(face_uvs[0::2]), 0.0)
+                self.assertGreater(max(face_uvs[1::2]) - min(face_uvs[1::2]), 0.0)
+        return islands
+
+    def test_cube(self):
+        # a projection for each side
+        self.assertEqual(self.project(mesh_cube("Cube")), [[0], [1], [2], [3], [4], [5]])
+
+    def test_fold(self):
+        # both halves in one projection below the angle limit, one each above it
+        self.assertEqual(self.project(mesh_fold("Fold", 20.0)), [[0, 1]])
+        self.assertEqual(self.project(mesh_fold("Fold", 90.0)), [[0], [1]])
+
+    def test_mirror(self):
+        for fill_holes in (False, True):
+            settings = SmartProjectSettings(island_margin=0.02, only_selected_faces=False)
+            settings.fill_holes = fill_holes
+            me = mesh_sphere("Sphere", 16, 8, jitter=0.05)
+            islands = self.project(me, settings)
+            self.assertGreater(len(islands), 2)
+            self.assertEqual(self.project(mesh_mirror("Mirror", me), settings), islands)
+
+
+class SmartProjectTesting(unittest.TestCase):
+    def setUp(self):
+        self.meshes = []
+
+    def tearDown(self):
+        for me in self.meshes:
+            bpy.data.meshes.remove(me)
+
+    def mesh_datas(self, meshes):
+        self.meshes.extend(meshes)
+        return [MeshProjectionData(me, False) for me in meshes]
+
+    def test_pool_same_as_serial(self):
+        datas = self.mesh_datas([mesh_sphere("Sphere%d" % i, 6 + i * 4, 4 + i * 2, offset=i * 3.0)
+                                 for i in range(6)])
+        settings = SmartProjectSettings(island_margin=0.02, only_selected_faces=False)
+        for fill_holes in (False, True):
+            settings.fill_holes = fill_holes
+            results = project_meshes(datas, settings, 1)
+            self.assertTrue(all(result is not None for result in results))
+            # min_faces=0 so these small meshes use the pool
+            self.assertEqual(project_meshes(datas, settings, 4, min_faces=0), results)
+            self.assertEqual(project_meshes(datas, settings, 4), results)
+
+
+if __name__ == '__main__':
+    import sys
+    sys.argv = [__file__] + (sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else [])
+    unittest.main()
@@ -0,0 +1,205 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Times release/bin/blender-thumbnailer.py in thumbnails/second,
+on a folder of generated .blend files (only containing REND & TEST blocks).
+
+Example Usage:
+
+python3 tests/python/thumbnailer_benchmark.py --files=500
+"""
+
+import os
+import sys
+import time
+import struct
+import shutil
+import random
+import tempfile
+
+BASE_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", ".."))
+THUMBNAILER = os.path.join(BASE_DIR, "release", "bin", "blender-thumbnailer.py")
+
+
+def thumbnailer_import():
+    import importlib.util
+    spec = importlib.util.spec_from_file_location("blender_thumbnailer", THUMBNAILER)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def write_blend(filepath, size=128, use_compress=False):
+    # gradient with some noise, compresses about like a rendered preview
+    image = bytes(bytearray(
+        ((x + y) // 2 + random.getrandbits(3)) & 0xff if c != 3 else 0xff
+        for y in range(size) for x in range(size) for c in range(4)))
+    data = struct.pack("<ii", size, size) + image
+    rend = struct.pack("<ii64s", 1, 250, b"Scene")
+
+    blend = b"".join((
+        b"BLENDER-v275",
+        b"REND", struct.pack("<iQii", len(rend), 0, 0, 1), rend,
+        b"TEST", struct.pack("<iQii", len(data), 0, 0, 1), data,
+        b"ENDB", struct.pack("<iQii", 0, 0, 0, 0),
+    ))
+
+    write_blend_data(filepath, blend, use_compress)
+
+
+def write_blend_data(filepath, blend, use_compress):
+    import gzip
+
+    with (gzip.open if use_compress else open)(filepath, "wb") as fh:
+        fh.write(blend)
+
+
+def test_truncated(thumbnailer, dir_temp):
+    """ blocks running past the end of the file end the scan, without errors """
+    filepath = os.path.join(dir_temp, "truncated.blend")
+    file_out = os.path.join(dir_temp, "truncated.png")
+
+    # the REND block length points past the end of the file
+    blend = b"".join((
+        b"BLENDER-v275",
+        b"REND", struct.pack("<iQii", 1 << 20, 0, 0, 1), b"\0" * 72,
+    ))
+    for use_compress in (False, True):
+        write_blend_data(filepath, blend, use_compress)
+        assert not thumbnailer.thumbnail(filepath, file_out, use_cache=False)
+
+    # the thumbnail is cut off half way
+    write_blend(filepath)
+    with open(filepath, "rb") as fh:
+        blend = fh.read()
+    write_blend_data(filepath, blend[:len(blend) // 2], False)
+    assert not thumbnailer.thumbnail(filepath, file_out, use_cache=False)
+
+
+def test_cache(thumbnailer, dir_temp):
+    """ changed files replace their cached thumbnail, deleted files are pruned """
+    dir_in = os.path.join(dir_temp, "cache_test")
+    os.makedirs(dir_in)
+    file_out = os.path.join(dir_temp, "cache_test.png")
+    cache_dir = thumbnailer.thumb_cache_dir()
+
+    def read_out():
+        with open(file_out, "rb") as fh:
+            return fh.read()
+
+    files = [os.path.join(dir_in, "%d.blend" % i) for i in range(8)]
+    for filepath in files:
+        write_blend(filepath, size=16)
+        assert thumbnailer.thumbnail(filepath, file_out)
+    assert len(os.listdir(cache_dir)) == len(files)
+
+    # a new version of the file, with another size and time
+    png = read_out()
+    write_blend(files[0], size=32)
+    os.utime(files[0], (1, 1))
+    assert thumbnailer.thumbnail(files[0], file_out)
+    assert read_out() != png
+    assert len(os.listdir(cache_dir)) == len(files)
+
+    for filepath in files[:2]:
+        os.remove(filepath)
+    thumbnailer.thumb_cache_prune(cache_dir, max_files=4)
+    cache_names = os.listdir(cache_dir)
+    assert len(cache_names) == 3
+    for name in cache_names:
+        with open(os.path.join(cache_dir, name), "rb") as fh:
+            uri = thumbnailer.png_read_text(fh.read())[b"Thumb::URI"]
+        assert os.path.exists(thumbnailer.url_path(uri.decode("utf-8")))
+
+    shutil.rmtree(cache_dir)
+
+
+def benchmark_png_rows(thumbnailer, size=256, repeat=200):
+    """ times png_rows against joining slices of the buffer (as write_png used to) """
+    buf = bytes(bytearray(random.getrandbits(8) for i in range(size * size * 4)))
+
+    def png_rows_join(buf, width, height):
+        width_byte_4 = width * 4
+        return b"\x00" + b"\x00".join([
+            buf[span:span + width_byte_4]
+            for span in range((height - 1) * width_byte_4, -1, -width_byte_4)])
+
+    assert thumbnailer.png_rows(buf, size, size) == png_rows_join(buf, size, size)
+
+    for name, fn in (("memoryview", thumbnailer.png_rows), ("join", png_rows_join)):
+        time_start = time.time()
+        for i in range(repeat):
+            fn(buf, size, size)
+        print("  png rows, %-11s %8.1f usec" % (name + ":", (time.time() - time_start) / repeat * 1e6))
+
+
+def run(thumbnailer, files, dir_out, **kwargs):
+    time_start = time.time()
+    for i, filepath in enumerate(files):
+        thumbnailer.thumbnail(filepath, os.path.join(dir_out, "%d.png" % i), **kwargs)
+    return len(files) / (time.time() - time_start)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=500, help="number of generated files")
+    args = parser.parse_args(sys.argv[1:])
+
+    thumbnailer = thumbnailer_import()
+    random.seed(0)
+
+    dir_temp = tempfile.mkdtemp()
+    # keep the users cache untouched
+    os.environ["XDG_CACHE_HOME"] = os.path.join(dir_temp, "cache")
+    try:
+        dir_in = os.path.join(dir_temp, "in")
+        dir_out = os.path.join(dir_temp, "out")
+        os.makedirs(dir_in)
+        os.makedirs(dir_out)
+
+        test_truncated(thumbnailer, dir_temp)
+        test_cache(thumbnailer, dir_temp)
+
+        files = []
+        for i in range(args.files):
+            filepath = os.path.join(dir_in, "%d.blend" % i)
+            write_blend(filepath, use_compress=(i % 2 == 1))
+            files.append(filepath)
+
+        benchmark_png_rows(thumbnailer)
+
+        print("%d files (half of them compressed)" % len(files))
+        print("  level 9, no cache:  %8.1f thumbnails/sec" %
+              run(thumbnailer, files, dir_out, compress_level=9, use_cache=False))
+        print("  default, no cache:  %8.1f thumbnails/sec" %
+              run(thumbnailer, files, dir_out, use_cache=False))
+        print("  default, cold cache:%8.1f thumbnails/sec" %
+              run(thumbnailer, files, dir_out))
+        print("  default, warm cache:%8.1f thumbnails/sec" %
+              run(thumbnailer, files, dir_out))
+    finally:
+        shutil.rmtree(dir_temp)
+
+
+if __name__ == "__main__":
+    main()